@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+"""
+Compare the document preset (1-bit CCITT Group 4 pages) with the default
+Flate page encoding.
+
+Runs on a synthetic A4 text scan plus every image in IMAGE_DIR, and
+reports page stream size and encode time for both paths.
+
+Usage (from backend/):
+    python benchmarks/bilevel.py [IMAGE_DIR] [--repeat 3]
+"""
+
+import argparse
+import io
+import math
+import sys
+import time
+from pathlib import Path
+
+from PIL import Image, ImageDraw, ImageFilter, ImageFont
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from benchmarks.resampling import DEFAULT_IMAGE_DIR, load_images
+from services.converter import ImageToPDFConverter
+from services.image_handle import ImageHandle
+
+
+def text_scan() -> bytes:
+    """A4 page at the target resolution with text on slightly uneven paper."""
+    img = Image.new("RGB", (2100, 2970), (236, 232, 226))
+    draw = ImageDraw.Draw(img)
+    draw.rectangle((0, 0, 2100, 700), fill=(222, 218, 212))
+    font = ImageFont.load_default(size=28)
+    line = "The quick brown fox jumps over the lazy dog. 0123456789 " * 2
+    for y in range(150, 2800, 42):
+        draw.text((120, y), line, fill=(35, 35, 40), font=font)
+    img = img.filter(ImageFilter.GaussianBlur(0.6))
+    img_bytes = io.BytesIO()
+    img.save(img_bytes, format="JPEG", quality=85)
+    return img_bytes.getvalue()
+
+
+def encode(converter, name: str, data: bytes, bilevel: bool, repeat: int):
+    """Best time and stream size for one page encoding."""
+    best = math.inf
+    for _ in range(repeat):
+        handle = ImageHandle(data, name)
+        start = time.perf_counter()
+        page = converter.prepare_page(handle, resampling="box" if bilevel else None, bilevel=bilevel)
+        best = min(best, time.perf_counter() - start)
+    return best, len(page.data), page
+
+
+def run(image_dir: Path, repeat: int):
+    converter = ImageToPDFConverter()
+    # Compare against decoded Flate pages, not sources embedded as-is
+    converter.jpeg_passthrough = False
+    converter.native_passthrough = False
+    images = [("text_scan.jpg", text_scan())] + load_images(image_dir)
+
+    print(f"Best of {repeat} runs")
+    print(f"{'image':<32} {'encoding':<14} {'size':>11} {'bytes':>10} {'ms':>9}")
+    for name, data in images:
+        for bilevel in (False, True):
+            seconds, nbytes, page = encode(converter, name, data, bilevel, repeat)
+            encoding = "document/G4" if bilevel else f"{page.format.name}/{page.color.name}"
+            print(
+                f"{name[:32]:<32} {encoding:<14} {page.width:>5}x{page.height:<5} "
+                f"{nbytes:>10} {seconds * 1000:>9.1f}"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("image_dir", nargs="?", type=Path, default=DEFAULT_IMAGE_DIR)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    run(args.image_dir, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
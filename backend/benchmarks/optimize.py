@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+"""
+Measure the cost and savings of output optimization (the compact preset).
+
+For a batch of many small pages, a batch of the images in IMAGE_DIR and the
+same batches encrypted, reports the time spent writing pages, the time
+spent in the finalization pass and the output size with and without
+optimization.
+
+Usage (from backend/):
+    python benchmarks/optimize.py [IMAGE_DIR] [--pages 200] [--repeat 3]
+"""
+
+import argparse
+import io
+import math
+import sys
+import time
+from pathlib import Path
+
+from PIL import Image, ImageDraw
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from benchmarks.resampling import DEFAULT_IMAGE_DIR, load_images
+from services.converter import ImageToPDFConverter, OutputOptions
+from services.image_handle import ImageHandle
+
+
+def small_pages(count: int) -> list[tuple[str, bytes]]:
+    """Receipt-sized PNG pages, where per-page objects dominate the output."""
+    pages = []
+    for index in range(count):
+        img = Image.new("L", (320, 480), 255)
+        ImageDraw.Draw(img).text((20, 20), f"Receipt {index}", fill=0)
+        img_bytes = io.BytesIO()
+        img.save(img_bytes, format="PNG")
+        pages.append((f"receipt_{index}.png", img_bytes.getvalue()))
+    return pages
+
+
+def measure(converter, images, password: str, optimize: bool, repeat: int):
+    """Best write and finalize times, and the finished size."""
+    best_write = best_finalize = math.inf
+    for _ in range(repeat):
+        output = io.BytesIO()
+        options = converter._page_options(True, True)
+        start = time.perf_counter()
+        handles = [ImageHandle(data, name) for name, data in images]
+        converter._write_pdf(handles, output, options)
+        written = time.perf_counter()
+        output_options = OutputOptions(password, optimize)
+        pdf_bytes = converter._finalize_in_memory(output, output_options)
+        best_write = min(best_write, written - start)
+        best_finalize = min(best_finalize, time.perf_counter() - written)
+    return best_write, best_finalize, len(pdf_bytes)
+
+
+def run(image_dir: Path, pages: int, repeat: int):
+    converter = ImageToPDFConverter()
+    batches = [(f"{pages} small pages", small_pages(pages))]
+    images = load_images(image_dir)
+    if images:
+        batches.append((f"{len(images)} images from {image_dir.name}", images))
+
+    print(f"Best of {repeat} runs")
+    print(f"{'batch':<32} {'output':<20} {'write ms':>9} {'final ms':>9} {'bytes':>11} {'saved':>7}")
+    for name, batch in batches:
+        for password in (None, "secret"):
+            baseline = None
+            for optimize in (False, True):
+                write, finalize, size = measure(converter, batch, password, optimize, repeat)
+                if baseline is None:
+                    baseline = size
+                label = ("compact" if optimize else "default") + (", encrypted" if password else "")
+                print(
+                    f"{name[:32]:<32} {label:<20} {write * 1000:>9.1f} {finalize * 1000:>9.1f} "
+                    f"{size:>11} {1 - size / baseline:>7.1%}"
+                )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("image_dir", nargs="?", type=Path, default=DEFAULT_IMAGE_DIR)
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    run(args.image_dir, args.pages, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+"""
+Compare palette reduction with the default RGB page encoding.
+
+Runs on a synthetic UI screenshot and bar chart plus every image in
+IMAGE_DIR, and reports page stream size and encode time with and without
+palette reduction. Photos keep more than 256 colors and are left as RGB.
+
+Usage (from backend/):
+    python benchmarks/palette.py [IMAGE_DIR] [--repeat 3]
+"""
+
+import argparse
+import io
+import math
+import sys
+import time
+from pathlib import Path
+
+from PIL import Image, ImageDraw
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from benchmarks.resampling import DEFAULT_IMAGE_DIR, load_images
+from services.converter import ImageToPDFConverter
+from services.image_handle import ImageHandle
+
+
+def screenshot() -> bytes:
+    """A UI screenshot: flat panels, buttons and text, no antialiasing."""
+    img = Image.new("RGB", (1920, 1080), (245, 246, 248))
+    draw = ImageDraw.Draw(img)
+    draw.rectangle((0, 0, 1920, 56), fill=(32, 41, 56))
+    draw.rectangle((0, 56, 280, 1080), fill=(226, 230, 236))
+    for row in range(12):
+        y = 90 + row * 70
+        draw.rectangle((320, y, 1880, y + 54), fill="white", outline=(210, 214, 220))
+        draw.text((340, y + 18), f"Item {row}  status: ok  updated 2 min ago", fill=(40, 40, 40))
+        draw.rectangle((1760, y + 12, 1860, y + 42), fill=(37, 99, 235))
+    img_bytes = io.BytesIO()
+    img.save(img_bytes, format="PNG")
+    return img_bytes.getvalue()
+
+
+def chart() -> bytes:
+    """A bar chart with axes, gridlines and a legend."""
+    img = Image.new("RGB", (1600, 1000), "white")
+    draw = ImageDraw.Draw(img)
+    colors = [(228, 26, 28), (55, 126, 184), (77, 175, 74), (152, 78, 163)]
+    for y in range(100, 900, 80):
+        draw.line((120, y, 1550, y), fill=(225, 225, 225))
+    for index in range(24):
+        height = 100 + (index * 137) % 700
+        draw.rectangle(
+            (140 + index * 58, 900 - height, 180 + index * 58, 900), fill=colors[index % 4]
+        )
+    draw.line((120, 60, 120, 900), fill="black", width=2)
+    draw.line((120, 900, 1550, 900), fill="black", width=2)
+    img_bytes = io.BytesIO()
+    img.save(img_bytes, format="PNG")
+    return img_bytes.getvalue()
+
+
+def encode(converter, name: str, data: bytes, palette: bool, repeat: int):
+    """Best time and stream size for one page encoding."""
+    best = math.inf
+    for _ in range(repeat):
+        handle = ImageHandle(data, name)
+        start = time.perf_counter()
+        page = converter.prepare_page(handle, palette=palette)
+        best = min(best, time.perf_counter() - start)
+    return best, len(page.data), page
+
+
+def run(image_dir: Path, repeat: int):
+    converter = ImageToPDFConverter()
+    # Compare decoded pages, not sources embedded as-is
+    converter.jpeg_passthrough = False
+    converter.native_passthrough = False
+    images = [("screenshot.png", screenshot()), ("chart.png", chart())] + load_images(image_dir)
+
+    print(f"Best of {repeat} runs")
+    print(f"{'image':<32} {'encoding':<14} {'size':>11} {'bytes':>10} {'ms':>9}")
+    for name, data in images:
+        for palette in (False, True):
+            seconds, nbytes, page = encode(converter, name, data, palette, repeat)
+            encoding = f"{page.color.name}/{page.depth}-bit"
+            print(
+                f"{name[:32]:<32} {encoding:<14} {page.width:>5}x{page.height:<5} "
+                f"{nbytes:>10} {seconds * 1000:>9.1f}"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("image_dir", nargs="?", type=Path, default=DEFAULT_IMAGE_DIR)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    run(args.image_dir, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
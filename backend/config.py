@@ -31,11 +31,60 @@ class Settings:
 
     # Image processing
     SUPPORTED_FORMATS = {"jpeg", "jpg", "png", "bmp", "tiff", "tif"}
-    MAX_IMAGE_DIMENSION = 20000  # pixels
+    MAX_IMAGE_DIMENSION = int(os.getenv("MAX_IMAGE_DIMENSION", 20000))  # pixels
+    # Decoded pixel memory (width x height x bands), checked from headers
+    # before decoding: all pages of one request, and all pages being
+    # decoded at once in this process
+    MAX_REQUEST_PIXEL_BYTES = int(os.getenv("MAX_REQUEST_PIXEL_BYTES", 4 * 1024 ** 3))  # 4GB
+    MAX_INFLIGHT_PIXEL_BYTES = int(os.getenv("MAX_INFLIGHT_PIXEL_BYTES", 1024 ** 3))  # 1GB
     TARGET_PDF_WIDTH = 2100  # A4 width in pixels
     TARGET_PDF_HEIGHT = 2970  # A4 height in pixels
     JPEG_QUALITY = 95
     PNG_QUALITY = 95
+    # Embed baseline gray, RGB and CMYK JPEGs as-is instead of decoding and
+    # re-encoding them
+    JPEG_PASSTHROUGH = os.getenv("JPEG_PASSTHROUGH", "True").lower() == "true"
+    # Embed other encodings PDF can carry as-is instead of decoding them:
+    # PNG data without alpha or interlacing, Group 4 fax TIFFs and
+    # JPEG-compressed TIFFs
+    NATIVE_PASSTHROUGH = os.getenv("NATIVE_PASSTHROUGH", "True").lower() == "true"
+    # Resampling for downscaled pages: nearest, bilinear, box, lanczos, or a
+    # preset (fast, photo)
+    RESAMPLING = os.getenv("RESAMPLING", "lanczos").lower()
+    # Physical page layout. With a page size (a3, a4, a5, letter, legal, or
+    # WIDTHxHEIGHT with a unit such as 210x297mm), images are scaled onto
+    # pages of that size inside the margin (mm without a unit) by fit mode
+    # (into, fill, exact, shrink, enlarge), and pixels are only resampled
+    # when they would print above MAX_DPI (0 for no cap). Without one,
+    # pages are resized into the TARGET_PDF pixel box
+    PAGE_SIZE = os.getenv("PAGE_SIZE", "")
+    PAGE_MARGIN = os.getenv("PAGE_MARGIN", "0")
+    PAGE_FIT = os.getenv("PAGE_FIT", "into").lower()
+    MAX_DPI = int(os.getenv("MAX_DPI", 0))
+    # Store near-gray pages as DeviceGray; tolerance is the largest allowed
+    # chroma deviation (Cb/Cr distance from neutral, 0-255 scale)
+    GRAYSCALE_DETECTION = os.getenv("GRAYSCALE_DETECTION", "True").lower() == "true"
+    GRAYSCALE_TOLERANCE = int(os.getenv("GRAYSCALE_TOLERANCE", 6))
+    # Store RGB pages with at most 256 colors (screenshots, charts) as
+    # palette images, losslessly; also enabled by the compact preset
+    PALETTE_REDUCTION = os.getenv("PALETTE_REDUCTION", "False").lower() == "true"
+    # Page colors: "preserve" keeps CMYK pages as CMYK and embeds ICC
+    # profiles; "srgb" converts CMYK and ICC-tagged pages to sRGB for screens
+    COLOR_OUTPUT = os.getenv("COLOR_OUTPUT", "preserve")
+
+    # Page pipeline: number of pages preprocessed concurrently and whether
+    # workers are threads or processes ("thread" or "process")
+    PAGE_WORKERS = int(os.getenv("PAGE_WORKERS", 1))
+    PAGE_WORKER_MODE = os.getenv("PAGE_WORKER_MODE", "thread").lower()
+    # PDFs of at least this many pages, counting every frame of multi-frame
+    # images, or this much encoded input are streamed to disk page by page
+    STREAMING_PAGE_THRESHOLD = int(os.getenv("STREAMING_PAGE_THRESHOLD", 50))
+    STREAMING_BYTES_THRESHOLD = int(os.getenv("STREAMING_BYTES_THRESHOLD", 100 * 1024 * 1024))  # 100MB
+    # Conversions run on a thread pool off the event loop, so health checks
+    # and downloads stay responsive: at most CONVERSION_WORKERS at once, with
+    # up to CONVERSION_QUEUE_DEPTH more waiting; requests beyond that get 503
+    CONVERSION_WORKERS = int(os.getenv("CONVERSION_WORKERS", 2))
+    CONVERSION_QUEUE_DEPTH = int(os.getenv("CONVERSION_QUEUE_DEPTH", 8))
 
     # CORS
     CORS_ORIGINS = [
@@ -52,6 +101,31 @@ class Settings:
     # PDF settings
     PDF_COMPRESSION_ENABLED = True
     PDF_COMPRESSION_LEVEL = 6  # 0-9
+    # Output optimization, also enabled by the compact and document presets:
+    # object streams and compressed streams, applied when the PDF is
+    # finalized. Decode level "generalized" also re-encodes LZW, ASCII and
+    # run-length streams with Flate; "none" copies every stream as is
+    PDF_OPTIMIZE = os.getenv("PDF_OPTIMIZE", "False").lower() == "true"
+    PDF_OPTIMIZE_DECODE_LEVEL = os.getenv("PDF_OPTIMIZE_DECODE_LEVEL", "generalized").lower()
+    # PDFs of at least this size are linearized (fast web view) so browser
+    # viewers can show the first page before the download completes;
+    # smaller ones only on request. 0 disables automatic linearization
+    LINEARIZE_THRESHOLD_BYTES = int(os.getenv("LINEARIZE_THRESHOLD_BYTES", 50 * 1024 * 1024))  # 50MB
+
+    # Conversion cache: finished PDFs keyed by input hash and options
+    CACHE_ENABLED = os.getenv("CACHE_ENABLED", "False").lower() == "true"
+    CACHE_DIR = Path(os.getenv("CACHE_DIR", "./cache"))
+    CACHE_MEMORY_BYTES = int(os.getenv("CACHE_MEMORY_BYTES", 64 * 1024 * 1024))  # 64MB
+    CACHE_DISK_BYTES = int(os.getenv("CACHE_DISK_BYTES", 1024 * 1024 * 1024))  # 1GB
+    CACHE_TTL_SECONDS = int(os.getenv("CACHE_TTL_SECONDS", 24 * 60 * 60))
+
+    # Page cache: encoded page streams reused across requests
+    PAGE_CACHE_ENABLED = os.getenv("PAGE_CACHE_ENABLED", "False").lower() == "true"
+    PAGE_CACHE_BYTES = int(os.getenv("PAGE_CACHE_BYTES", 256 * 1024 * 1024))  # 256MB
+
+    # Image sessions: uploads kept for transforms and conversion by id
+    SESSION_STORE_BYTES = int(os.getenv("SESSION_STORE_BYTES", 512 * 1024 * 1024))  # 512MB
+    SESSION_TTL_SECONDS = int(os.getenv("SESSION_TTL_SECONDS", 60 * 60))
 
     # Cleanup
     CLEANUP_ON_STARTUP = True
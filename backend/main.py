@@ -9,7 +9,7 @@ from pathlib import Path
 backend_dir = Path(__file__).parent
 sys.path.insert(0, str(backend_dir))
 
-from routes_enhanced import router
+from routes_enhanced import router, converter, conversions
 from services.utils import setup_logging
 from config import settings
 
@@ -50,6 +50,8 @@ async def startup_event():
 async def shutdown_event():
     """Cleanup on shutdown."""
     logger.info(f"Shutting down {settings.APP_NAME}")
+    conversions.shutdown()
+    converter.close()
 
 
 @app.get("/")
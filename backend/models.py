@@ -16,7 +16,17 @@ class ConversionRequest(BaseModel):
     password: Optional[str] = Field(default=None, description="PDF password protection")
     resize: bool = Field(default=True, description="Resize to fit page")
     compression: bool = Field(default=True, description="Enable compression")
-    orientation: str = Field(default="portrait", description="Portrait or landscape")
+    resampling: Optional[str] = Field(default=None, description="Resampling strategy or preset")
+    preset: Optional[str] = Field(default=None, description="Page preset, e.g. document")
+    orientation: Optional[str] = Field(
+        default=None, description="Turn pages to portrait or landscape; default keeps each image's"
+    )
+    page_size: Optional[str] = Field(
+        default=None, description="Page size, e.g. a4, letter or 210x297mm; default sizes pages from their images"
+    )
+    margin: Optional[str] = Field(default=None, description="Page margin, e.g. 10mm or 0.5in")
+    fit: Optional[str] = Field(default=None, description="Fit mode: into, fill, exact, shrink or enlarge")
+    max_dpi: Optional[int] = Field(default=None, description="Resample only above this resolution on the page")
     encrypt: bool = Field(default=False, description="Encrypt PDF")
     filename: Optional[str] = Field(default=None, description="Custom output filename")
     individual_files: bool = Field(default=False, description="Create separate PDFs for each image")
@@ -37,6 +47,9 @@ class ConversionResponse(BaseModel):
     file_paths: Optional[List[str]] = None  # For individual files
     file_size: Optional[int] = None
     file_sizes: Optional[List[int]] = None  # For individual files
+    # Per page: number, "passthrough" or "reencode", and the PDF filter; not
+    # included for results served from the conversion cache
+    pages: Optional[List[dict]] = None
     error_details: Optional[str] = None
 
 
@@ -6,14 +6,29 @@ from pathlib import Path
 from datetime import datetime
 
 from models import ConversionRequest, ConversionResponse, HealthResponse, ImageTransformRequest
-from services.converter import ImageToPDFConverter
+from services.budget import PixelBudgetExceeded
+from services.cache import ConversionCache
+from services.color import transforms as color_transforms
+from services.converter import (
+    ImageToPDFConverter,
+    resolve_orientation,
+    resolve_preset,
+    resolve_resampling,
+)
+from services.executor import ConversionExecutor, ConversionQueueFull
+from services.image_handle import ImageHandle
+from services.sessions import ImageSession, ImageSessionStore
 from services.utils import get_file_size_mb, is_supported_image
 from auth import get_current_user, auth_manager
+from config import settings
 from security import verify_api_key, RequestValidator, api_key_manager
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 converter = ImageToPDFConverter()
+conversion_cache = ConversionCache.from_settings(settings) if settings.CACHE_ENABLED else None
+image_sessions = ImageSessionStore.from_settings(settings)
+conversions = ConversionExecutor.from_settings(settings)
 
 
 @router.get("/health", response_model=HealthResponse)
@@ -97,6 +112,151 @@ async def generate_api_key(current_user: dict = Depends(get_current_user)):
 # CONVERSION ENDPOINTS (ENHANCED)
 # ============================================================================
 
+def _pdf_metadata(title: Optional[str], author: Optional[str], password: Optional[str]) -> dict:
+    """Document metadata from the request's form fields."""
+    metadata = {}
+    if title:
+        metadata["title"] = title
+    if author:
+        metadata["author"] = author
+    if password:
+        metadata["password"] = password
+    return metadata
+
+
+def _pdf_filename(filename: Optional[str], default_stem: str) -> str:
+    """Custom output filename, or default_stem with a timestamp."""
+    if filename:
+        pdf_filename = RequestValidator.validate_filename(filename)
+        if not pdf_filename.endswith(".pdf"):
+            pdf_filename += ".pdf"
+        return pdf_filename
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    return f"{default_stem}_{timestamp}.pdf"
+
+
+def _streams(image_files: List[ImageHandle]) -> bool:
+    """Whether a PDF of these images is large enough to stream to disk."""
+    return (
+        sum(handle.n_pages for handle in image_files) >= settings.STREAMING_PAGE_THRESHOLD
+        or sum(handle.nbytes for handle in image_files) >= settings.STREAMING_BYTES_THRESHOLD
+    )
+
+
+def _write_pdf(
+    image_files: List[ImageHandle],
+    pdf_filename: str,
+    metadata: dict,
+    encrypt: bool,
+    password: Optional[str],
+    report: list = None,
+    **page_options,
+) -> tuple[Path, int]:
+    """Convert images into one PDF named pdf_filename in the output directory.
+
+    Serves identical earlier conversions from the conversion cache and
+    streams large PDFs to disk. Returns the PDF path and size; the
+    per-page report is only filled when the PDF is converted afresh.
+    """
+    pdf_path = converter.output_dir / pdf_filename
+
+    # Reuse an identical earlier conversion if cached
+    cache_key = None
+    if conversion_cache is not None:
+        cache_key = conversion_cache.make_key(
+            image_files,
+            settings=converter.output_settings(),
+            metadata=metadata,
+            encrypt=encrypt,
+            **page_options,
+        )
+        file_size = conversion_cache.lookup(cache_key, pdf_path)
+        if file_size is not None:
+            logger.info(f"Served {pdf_filename} from conversion cache")
+            return pdf_path, file_size
+
+    # Encrypt if requested, in the same pass as the rest of the output
+    encryption_password = (password or "default") if encrypt else None
+
+    if _streams(image_files):
+        # Stream large PDFs to disk page by page
+        pdf_path, msg = converter.convert_multiple_to_file(
+            image_files,
+            pdf_path,
+            metadata=metadata,
+            password=encryption_password,
+            report=report,
+            **page_options,
+        )
+
+        file_size = pdf_path.stat().st_size
+        if cache_key is not None:
+            conversion_cache.store(cache_key, pdf_path)
+    else:
+        # Combine into single PDF in memory
+        pdf_bytes, msg = converter.convert_multiple(
+            image_files,
+            metadata=metadata,
+            password=encryption_password,
+            report=report,
+            **page_options,
+        )
+
+        pdf_path = converter.save_pdf(pdf_bytes, pdf_filename)
+        file_size = len(pdf_bytes)
+        if cache_key is not None:
+            conversion_cache.store(cache_key, pdf_path, pdf_bytes)
+
+    return pdf_path, file_size
+
+
+def _convert_combined(
+    image_files: List[ImageHandle],
+    filename: Optional[str],
+    metadata: dict,
+    encrypt: bool,
+    password: Optional[str],
+    report: list = None,
+    **page_options,
+) -> tuple[Path, int]:
+    """Convert images into one PDF in the output directory, see _write_pdf()."""
+    pdf_filename = _pdf_filename(filename, "combined")
+    return _write_pdf(image_files, pdf_filename, metadata, encrypt, password, report, **page_options)
+
+
+def _convert_individual(
+    image_files: List[ImageHandle],
+    filename: Optional[str],
+    metadata: dict,
+    encrypt: bool,
+    password: Optional[str],
+    **page_options,
+) -> tuple[List[str], List[int], list]:
+    """Convert each image into its own PDF in the output directory, see _write_pdf().
+
+    Returns the PDF paths, their sizes and the per-page report, with each
+    entry naming its PDF.
+    """
+    file_paths = []
+    file_sizes = []
+    pages = []
+
+    for handle in image_files:
+        # Custom filenames get the image's name appended
+        stem = Path(handle.filename).stem
+        pdf_filename = _pdf_filename(filename and f"{filename}_{stem}", stem)
+
+        report = []
+        pdf_path, file_size = _write_pdf(
+            [handle], pdf_filename, metadata, encrypt, password, report, **page_options
+        )
+        file_paths.append(str(pdf_path))
+        file_sizes.append(file_size)
+        pages.extend(dict(entry, file=pdf_path.name) for entry in report)
+
+    return file_paths, file_sizes, pages
+
+
 @router.post("/convert", response_model=ConversionResponse)
 async def convert_multiple(
     files: List[UploadFile] = File(...),
@@ -106,6 +266,14 @@ async def convert_multiple(
     encrypt: bool = Form(False),
     resize: bool = Form(True),
     compression: bool = Form(True),
+    resampling: Optional[str] = Form(None),
+    preset: Optional[str] = Form(None),
+    orientation: Optional[str] = Form(None),
+    page_size: Optional[str] = Form(None),
+    margin: Optional[str] = Form(None),
+    fit: Optional[str] = Form(None),
+    max_dpi: Optional[int] = Form(None),
+    linearize: bool = Form(False),
     filename: Optional[str] = Form(None),
     individual_files: bool = Form(False),
     x_api_key: str = Header(None),
@@ -124,6 +292,17 @@ async def convert_multiple(
         if not files or len(files) == 0:
             raise HTTPException(status_code=400, detail="No files provided")
 
+        try:
+            if resampling:
+                resampling = resolve_resampling(resampling)
+            if preset:
+                resolve_preset(preset)
+            if orientation:
+                orientation = resolve_orientation(orientation)
+            layout = converter.page_layout(page_size, margin, fit, max_dpi)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
         # Validate all files
         image_files = []
         for file in files:
@@ -133,93 +312,81 @@ async def convert_multiple(
                     detail=f"Unsupported file format: {file.filename}",
                 )
 
-            content = await file.read()
-            valid, msg = converter.validate_image(content, file.filename)
+            # Keep the upload in its spooled file; pages are read when converted
+            handle = ImageHandle(file.file, file.filename)
+            valid, msg = converter.validate_image(handle)
             if not valid:
                 raise HTTPException(status_code=400, detail=f"{file.filename}: {msg}")
 
-            image_files.append((content, file.filename))
+            image_files.append(handle)
+
+        # Reject decompression bombs from their headers, before decoding
+        try:
+            converter.check_pixel_budget(image_files)
+        except PixelBudgetExceeded as e:
+            raise HTTPException(status_code=413, detail=str(e))
 
-        metadata = {}
-        if title:
-            metadata["title"] = title
-        if author:
-            metadata["author"] = author
-        if password:
-            metadata["password"] = password
+        metadata = _pdf_metadata(title, author, password)
 
         # Convert
         if individual_files:
             # Create separate PDF for each image
-            file_paths = []
-            file_sizes = []
-            
-            for image_content, image_name in image_files:
-                pdf_bytes, msg = converter.convert_single(
-                    image_content,
-                    image_name,
-                    metadata=metadata,
-                    resize=resize,
-                    compression=compression,
-                )
-
-                # Encrypt if requested
-                if encrypt:
-                    pdf_bytes = converter.encrypt_pdf(pdf_bytes, password or "default")
-
-                # Save with custom or auto filename
-                if filename:
-                    base_name = RequestValidator.validate_filename(filename)
-                    pdf_filename = f"{base_name}_{Path(image_name).stem}.pdf"
-                else:
-                    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                    pdf_filename = f"{Path(image_name).stem}_{timestamp}.pdf"
-
-                pdf_path = converter.save_pdf(pdf_bytes, pdf_filename)
-                file_paths.append(str(pdf_path))
-                file_sizes.append(len(pdf_bytes))
+            file_paths, file_sizes, pages = await conversions.run(
+                _convert_individual,
+                image_files,
+                filename,
+                metadata,
+                encrypt,
+                password,
+                resize=resize,
+                compression=compression,
+                resampling=resampling,
+                preset=preset,
+                orientation=orientation,
+                layout=layout,
+                linearize=linearize,
+            )
 
             return ConversionResponse(
                 success=True,
                 message=f"Successfully converted {len(files)} images to {len(file_paths)} PDF(s)",
                 file_paths=file_paths,
                 file_sizes=file_sizes,
+                pages=pages or None,
             )
         else:
-            # Combine into single PDF
-            pdf_bytes, msg = converter.convert_multiple(
+            report = []
+            pdf_path, file_size = await conversions.run(
+                _convert_combined,
                 image_files,
-                metadata=metadata,
+                filename,
+                metadata,
+                encrypt,
+                password,
+                report,
                 resize=resize,
                 compression=compression,
+                resampling=resampling,
+                preset=preset,
+                orientation=orientation,
+                layout=layout,
+                linearize=linearize,
             )
 
-            # Encrypt if requested
-            if encrypt:
-                pdf_bytes = converter.encrypt_pdf(pdf_bytes, password or "default")
-
-            # Save with custom or auto filename
-            if filename:
-                pdf_filename = RequestValidator.validate_filename(filename)
-                if not pdf_filename.endswith(".pdf"):
-                    pdf_filename += ".pdf"
-            else:
-                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                pdf_filename = f"combined_{timestamp}.pdf"
-
-            pdf_path = converter.save_pdf(pdf_bytes, pdf_filename)
-
-            logger.info(f"Successfully converted {len(files)} images to {pdf_filename}")
+            logger.info(f"Successfully converted {len(files)} images to {pdf_path.name}")
 
             return ConversionResponse(
                 success=True,
                 message="Successfully converted images to PDF",
                 file_path=str(pdf_path),
-                file_size=len(pdf_bytes),
+                file_size=file_size,
+                pages=report or None,
             )
 
     except HTTPException:
         raise
+    except ConversionQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         logger.error(f"Error converting images: {e}")
         return ConversionResponse(
@@ -238,6 +405,14 @@ async def convert_single(
     encrypt: bool = Form(False),
     resize: bool = Form(True),
     compression: bool = Form(True),
+    resampling: Optional[str] = Form(None),
+    preset: Optional[str] = Form(None),
+    orientation: Optional[str] = Form(None),
+    page_size: Optional[str] = Form(None),
+    margin: Optional[str] = Form(None),
+    fit: Optional[str] = Form(None),
+    max_dpi: Optional[int] = Form(None),
+    linearize: bool = Form(False),
     filename: Optional[str] = Form(None),
     x_api_key: str = Header(None),
 ):
@@ -249,6 +424,17 @@ async def convert_single(
         if not file:
             raise HTTPException(status_code=400, detail="No file provided")
 
+        try:
+            if resampling:
+                resampling = resolve_resampling(resampling)
+            if preset:
+                resolve_preset(preset)
+            if orientation:
+                orientation = resolve_orientation(orientation)
+            layout = converter.page_layout(page_size, margin, fit, max_dpi)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
         if not is_supported_image(file.filename):
             raise HTTPException(
                 status_code=400,
@@ -256,40 +442,37 @@ async def convert_single(
             )
 
         content = await file.read()
-        valid, msg = converter.validate_image(content, file.filename)
+        handle = ImageHandle(content, file.filename)
+        valid, msg = converter.validate_image(handle)
         if not valid:
             raise HTTPException(status_code=400, detail=msg)
 
-        metadata = {}
-        if title:
-            metadata["title"] = title
-        if author:
-            metadata["author"] = author
-        if password:
-            metadata["password"] = password
-
-        pdf_bytes, msg = converter.convert_single(
-            content,
-            file.filename,
-            metadata=metadata,
-            resize=resize,
-            compression=compression,
-        )
+        try:
+            converter.check_pixel_budget([handle])
+        except PixelBudgetExceeded as e:
+            raise HTTPException(status_code=413, detail=str(e))
 
-        # Encrypt if requested
-        if encrypt:
-            pdf_bytes = converter.encrypt_pdf(pdf_bytes, password or "default")
+        metadata = _pdf_metadata(title, author, password)
 
-        # Save with custom filename
-        if filename:
-            pdf_filename = RequestValidator.validate_filename(filename)
-            if not pdf_filename.endswith(".pdf"):
-                pdf_filename += ".pdf"
-        else:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            pdf_filename = f"{Path(file.filename).stem}_{timestamp}.pdf"
+        pdf_filename = _pdf_filename(filename, Path(file.filename).stem)
 
-        pdf_path = converter.save_pdf(pdf_bytes, pdf_filename)
+        report = []
+        pdf_path, file_size = await conversions.run(
+            _write_pdf,
+            [handle],
+            pdf_filename,
+            metadata,
+            encrypt,
+            password,
+            report,
+            resize=resize,
+            compression=compression,
+            resampling=resampling,
+            preset=preset,
+            orientation=orientation,
+            layout=layout,
+            linearize=linearize,
+        )
 
         logger.info(f"Successfully converted {file.filename} to {pdf_filename}")
 
@@ -297,11 +480,14 @@ async def convert_single(
             success=True,
             message="Successfully converted image to PDF",
             file_path=str(pdf_path),
-            file_size=len(pdf_bytes),
+            file_size=file_size,
+            pages=report or None,
         )
 
     except HTTPException:
         raise
+    except ConversionQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         logger.error(f"Error converting image: {e}")
         return ConversionResponse(
@@ -311,6 +497,227 @@ async def convert_single(
         )
 
 
+@router.get("/cache/stats")
+async def cache_stats(x_api_key: str = Header(None)):
+    """Conversion cache, page cache and color transform cache counters."""
+    if x_api_key and not api_key_manager.validate_key(x_api_key):
+        raise HTTPException(status_code=401, detail="Invalid API key")
+
+    response = {"success": True, "enabled": conversion_cache is not None}
+    if conversion_cache is not None:
+        response["stats"] = conversion_cache.stats()
+    if converter.page_cache is not None:
+        response["page_stats"] = converter.page_cache.stats()
+    response["color_transform_stats"] = color_transforms.stats()
+    return response
+
+
+# ============================================================================
+# IMAGE SESSION ENDPOINTS
+# ============================================================================
+
+def _get_session(image_id: str) -> ImageSession:
+    session = image_sessions.get(image_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Image not found or expired")
+    return session
+
+
+def _session_info(session: ImageSession) -> dict:
+    """Image id, recorded ops and the size the ops will produce."""
+    handle = session.handle()
+    width, height = converter.output_size(handle)
+    return {
+        "success": True,
+        "image_id": session.image_id,
+        "filename": session.filename,
+        "format": handle.format,
+        "width": width,
+        "height": height,
+        "ops": [list(op) for op in session.ops],
+    }
+
+
+@router.post("/images")
+async def upload_image(
+    file: UploadFile = File(...),
+    x_api_key: str = Header(None),
+):
+    """Upload an image once and get an image id for transforms and conversion."""
+    if x_api_key and not api_key_manager.validate_key(x_api_key):
+        raise HTTPException(status_code=401, detail="Invalid API key")
+
+    if not is_supported_image(file.filename):
+        raise HTTPException(status_code=400, detail=f"Unsupported file format: {file.filename}")
+
+    content = await file.read()
+    handle = ImageHandle(content, file.filename)
+    valid, msg = converter.validate_image(handle)
+    if not valid:
+        raise HTTPException(status_code=400, detail=msg)
+
+    try:
+        converter.check_pixel_budget([handle])
+        session = image_sessions.add(content, file.filename)
+    except ValueError as e:
+        # Over the pixel budget or larger than the session store
+        raise HTTPException(status_code=413, detail=str(e))
+
+    return _session_info(session)
+
+
+@router.get("/images/{image_id}")
+async def get_image(image_id: str, x_api_key: str = Header(None)):
+    """Show an uploaded image and its recorded transforms."""
+    if x_api_key and not api_key_manager.validate_key(x_api_key):
+        raise HTTPException(status_code=401, detail="Invalid API key")
+
+    return _session_info(_get_session(image_id))
+
+
+@router.post("/images/{image_id}/rotate")
+async def rotate_session_image(
+    image_id: str,
+    angle: int = Form(90),
+    x_api_key: str = Header(None),
+):
+    """Record a counter-clockwise rotation, applied when the image is converted."""
+    if x_api_key and not api_key_manager.validate_key(x_api_key):
+        raise HTTPException(status_code=401, detail="Invalid API key")
+
+    if angle not in [0, 90, 180, 270]:
+        raise HTTPException(status_code=400, detail="Angle must be 0, 90, 180, or 270")
+
+    session = _get_session(image_id)
+    session.record(("rotate", angle))
+    return _session_info(session)
+
+
+@router.post("/images/{image_id}/crop")
+async def crop_session_image(
+    image_id: str,
+    left: int = Form(0),
+    top: int = Form(0),
+    right: int = Form(0),
+    bottom: int = Form(0),
+    x_api_key: str = Header(None),
+):
+    """Record a crop of pixels from each side, applied when the image is converted."""
+    if x_api_key and not api_key_manager.validate_key(x_api_key):
+        raise HTTPException(status_code=401, detail="Invalid API key")
+
+    if min(left, top, right, bottom) < 0:
+        raise HTTPException(status_code=400, detail="Crop margins must not be negative")
+
+    session = _get_session(image_id)
+    session.record(("crop", left, top, right, bottom))
+    return _session_info(session)
+
+
+@router.delete("/images/{image_id}")
+async def delete_image(image_id: str, x_api_key: str = Header(None)):
+    """Discard an uploaded image."""
+    if x_api_key and not api_key_manager.validate_key(x_api_key):
+        raise HTTPException(status_code=401, detail="Invalid API key")
+
+    if not image_sessions.delete(image_id):
+        raise HTTPException(status_code=404, detail="Image not found or expired")
+    return {"success": True, "message": "Image deleted"}
+
+
+@router.post("/images/convert", response_model=ConversionResponse)
+async def convert_session_images(
+    image_ids: List[str] = Form(...),
+    title: Optional[str] = Form(None),
+    author: Optional[str] = Form(None),
+    password: Optional[str] = Form(None),
+    encrypt: bool = Form(False),
+    resize: bool = Form(True),
+    compression: bool = Form(True),
+    resampling: Optional[str] = Form(None),
+    preset: Optional[str] = Form(None),
+    orientation: Optional[str] = Form(None),
+    page_size: Optional[str] = Form(None),
+    margin: Optional[str] = Form(None),
+    fit: Optional[str] = Form(None),
+    max_dpi: Optional[int] = Form(None),
+    linearize: bool = Form(False),
+    crop_pixels: bool = Form(False),
+    filename: Optional[str] = Form(None),
+    x_api_key: str = Header(None),
+):
+    """Convert uploaded images, in the given order, to one PDF.
+
+    Each image is decoded once, with its recorded transforms applied on the
+    way to the page. JPEGs that need no decoding keep their original stream,
+    with crops set as the page's crop box; crop_pixels removes the
+    cropped-away pixels instead.
+    """
+    try:
+        if x_api_key and not api_key_manager.validate_key(x_api_key):
+            raise HTTPException(status_code=401, detail="Invalid API key")
+
+        try:
+            if resampling:
+                resampling = resolve_resampling(resampling)
+            if preset:
+                resolve_preset(preset)
+            if orientation:
+                orientation = resolve_orientation(orientation)
+            layout = converter.page_layout(page_size, margin, fit, max_dpi)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+        image_files = [_get_session(image_id).handle() for image_id in image_ids]
+
+        try:
+            converter.check_pixel_budget(image_files)
+        except PixelBudgetExceeded as e:
+            raise HTTPException(status_code=413, detail=str(e))
+
+        metadata = _pdf_metadata(title, author, password)
+
+        report = []
+        pdf_path, file_size = await conversions.run(
+            _convert_combined,
+            image_files,
+            filename,
+            metadata,
+            encrypt,
+            password,
+            report,
+            resize=resize,
+            compression=compression,
+            resampling=resampling,
+            preset=preset,
+            orientation=orientation,
+            layout=layout,
+            linearize=linearize,
+            crop_pixels=crop_pixels,
+        )
+        logger.info(f"Successfully converted {len(image_files)} session images to {pdf_path.name}")
+
+        return ConversionResponse(
+            success=True,
+            message="Successfully converted images to PDF",
+            file_path=str(pdf_path),
+            file_size=file_size,
+            pages=report or None,
+        )
+
+    except HTTPException:
+        raise
+    except ConversionQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error converting session images: {e}")
+        return ConversionResponse(
+            success=False,
+            message="Conversion failed",
+            error_details=str(e),
+        )
+
+
 # ============================================================================
 # IMAGE TRANSFORMATION ENDPOINTS
 # ============================================================================
@@ -330,7 +737,7 @@ async def rotate_image(
             raise HTTPException(status_code=400, detail="Angle must be 0, 90, 180, or 270")
 
         content = await file.read()
-        rotated = converter.rotate_image(content, angle)
+        rotated = await conversions.run(converter.rotate_image, content, angle)
 
         return {
             "success": True,
@@ -339,6 +746,10 @@ async def rotate_image(
         }
     except HTTPException:
         raise
+    except PixelBudgetExceeded as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ConversionQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         logger.error(f"Error rotating image: {e}")
         return {
@@ -363,7 +774,7 @@ async def crop_image(
             raise HTTPException(status_code=401, detail="Invalid API key")
 
         content = await file.read()
-        cropped = converter.crop_image(content, left, top, right, bottom)
+        cropped = await conversions.run(converter.crop_image, content, left, top, right, bottom)
 
         return {
             "success": True,
@@ -372,6 +783,10 @@ async def crop_image(
         }
     except HTTPException:
         raise
+    except PixelBudgetExceeded as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ConversionQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         logger.error(f"Error cropping image: {e}")
         return {
@@ -388,9 +803,15 @@ async def crop_image(
 @router.get("/download/{filename}")
 async def download_pdf(
     filename: str,
+    inline: bool = False,
     x_api_key: str = Header(None),
 ):
-    """Download a converted PDF file."""
+    """Download a converted PDF file.
+
+    Range requests are supported, so viewers can render the first page of a
+    linearized PDF from its prefix. With inline, browsers open the PDF in
+    their viewer instead of saving it.
+    """
     try:
         if x_api_key and not api_key_manager.validate_key(x_api_key):
             raise HTTPException(status_code=401, detail="Invalid API key")
@@ -406,6 +827,7 @@ async def download_pdf(
             path=file_path,
             filename=filename,
             media_type="application/pdf",
+            content_disposition_type="inline" if inline else "attachment",
         )
 
     except HTTPException:
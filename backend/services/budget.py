@@ -0,0 +1,40 @@
+import threading
+
+
+class PixelBudgetExceeded(ValueError):
+    """An image or request needs more decoded pixel memory than allowed."""
+
+
+class PixelBudget:
+    """Decoded pixel bytes in flight across all concurrent requests.
+
+    Pages reserve their decoded size before they are decoded and release it
+    when done; a reservation waits while the budget is in use by other
+    pages. A single page larger than the whole budget is rejected.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._in_flight = 0
+        self._condition = threading.Condition()
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def acquire(self, nbytes: int):
+        """Reserve nbytes, waiting until they fit in the budget."""
+        if nbytes > self.max_bytes:
+            raise PixelBudgetExceeded(
+                f"Image needs {nbytes // (1024 * 1024)} MB of pixel memory, "
+                f"more than the {self.max_bytes // (1024 * 1024)} MB budget"
+            )
+        with self._condition:
+            self._condition.wait_for(lambda: self._in_flight + nbytes <= self.max_bytes)
+            self._in_flight += nbytes
+
+    def release(self, nbytes: int):
+        """Return a reservation made by acquire()."""
+        with self._condition:
+            self._in_flight -= nbytes
+            self._condition.notify_all()
@@ -0,0 +1,260 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import List, Optional
+
+from services.image_handle import ImageHandle
+
+logger = logging.getLogger(__name__)
+
+
+class ConversionCache:
+    """Content-addressed cache of finished PDFs.
+
+    Keys hash the ordered input images plus every output-affecting option,
+    request options and server settings alike, since the disk tier
+    outlives configuration changes.
+    Entries live in a memory tier and a disk tier, each bounded in bytes
+    and evicted least recently used first; entries older than ttl_seconds
+    are treated as misses.
+    """
+
+    def __init__(
+        self,
+        cache_dir: Path,
+        max_memory_bytes: int,
+        max_disk_bytes: int,
+        ttl_seconds: int,
+    ):
+        self.cache_dir = Path(cache_dir)
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self.ttl_seconds = ttl_seconds
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+        self._lock = threading.Lock()
+        # key -> (pdf bytes, stored at)
+        self._memory = OrderedDict()
+        self._memory_bytes = 0
+        # key -> (size, stored at), oldest first
+        self._disk = OrderedDict()
+        self._disk_bytes = 0
+        self._stats = {"hits": 0, "misses": 0, "memory_hits": 0, "disk_hits": 0, "evictions": 0}
+        self._load_disk_index()
+
+    @classmethod
+    def from_settings(cls, settings) -> "ConversionCache":
+        return cls(
+            settings.CACHE_DIR,
+            settings.CACHE_MEMORY_BYTES,
+            settings.CACHE_DISK_BYTES,
+            settings.CACHE_TTL_SECONDS,
+        )
+
+    @staticmethod
+    def make_key(handles: List[ImageHandle], **options) -> str:
+        """Hash the ordered input images, their transform ops and the output options."""
+        sha = hashlib.sha256()
+        for handle in handles:
+            sha.update(handle.digest.encode())
+            if handle.ops:
+                sha.update(json.dumps(handle.ops).encode())
+        sha.update(json.dumps(options, sort_keys=True, default=str).encode())
+        return sha.hexdigest()
+
+    def _load_disk_index(self):
+        """Rebuild the disk index from cached files, oldest first."""
+        entries = []
+        for path in self.cache_dir.glob("*.pdf"):
+            stat = path.stat()
+            entries.append((stat.st_mtime, path.stem, stat.st_size))
+        for mtime, key, size in sorted(entries):
+            self._disk[key] = (size, mtime)
+            self._disk_bytes += size
+
+    def _disk_path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.pdf"
+
+    def _expired(self, stored_at: float) -> bool:
+        return time.time() - stored_at > self.ttl_seconds
+
+    def lookup(self, key: str, output_path: Path) -> Optional[int]:
+        """Write the cached PDF for key to output_path and return its size.
+
+        Returns None on a miss.
+        """
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and self._expired(entry[1]):
+                self._drop_memory(key)
+                entry = None
+            if entry is not None:
+                self._memory.move_to_end(key)
+                self._stats["hits"] += 1
+                self._stats["memory_hits"] += 1
+                data = entry[0]
+            else:
+                data = None
+                disk_entry = self._disk.get(key)
+                if disk_entry is not None and self._expired(disk_entry[1]):
+                    self._drop_disk(key)
+                    disk_entry = None
+                if disk_entry is None:
+                    self._stats["misses"] += 1
+                    return None
+                self._disk.move_to_end(key)
+                self._stats["hits"] += 1
+                self._stats["disk_hits"] += 1
+
+        if data is not None:
+            with open(output_path, "wb") as f:
+                f.write(data)
+            return len(data)
+
+        try:
+            shutil.copyfile(self._disk_path(key), output_path)
+        except OSError as e:
+            logger.warning(f"Cached PDF {key} could not be copied: {e}")
+            with self._lock:
+                self._drop_disk(key)
+            return None
+        return output_path.stat().st_size
+
+    def store(self, key: str, pdf_path: Path, pdf_bytes: bytes = None):
+        """Add a finished PDF to the cache.
+
+        The file is copied to the disk tier; pdf_bytes, when the caller
+        already holds them, are also kept in the memory tier.
+        """
+        size = pdf_path.stat().st_size
+        stored_at = time.time()
+
+        if size <= self.max_disk_bytes:
+            try:
+                shutil.copyfile(pdf_path, self._disk_path(key))
+            except OSError as e:
+                logger.warning(f"Could not cache PDF {key}: {e}")
+            else:
+                with self._lock:
+                    self._drop_disk(key, delete=False)
+                    self._disk[key] = (size, stored_at)
+                    self._disk_bytes += size
+                    self._evict_disk()
+
+        if pdf_bytes is not None and len(pdf_bytes) <= self.max_memory_bytes:
+            with self._lock:
+                self._drop_memory(key)
+                self._memory[key] = (pdf_bytes, stored_at)
+                self._memory_bytes += len(pdf_bytes)
+                self._evict_memory()
+
+    def _drop_memory(self, key: str):
+        entry = self._memory.pop(key, None)
+        if entry is not None:
+            self._memory_bytes -= len(entry[0])
+
+    def _drop_disk(self, key: str, delete: bool = True):
+        entry = self._disk.pop(key, None)
+        if entry is not None:
+            self._disk_bytes -= entry[0]
+        if delete:
+            try:
+                os.unlink(self._disk_path(key))
+            except FileNotFoundError:
+                pass
+
+    def _evict_memory(self):
+        while self._memory_bytes > self.max_memory_bytes:
+            key = next(iter(self._memory))
+            self._drop_memory(key)
+            self._stats["evictions"] += 1
+
+    def _evict_disk(self):
+        while self._disk_bytes > self.max_disk_bytes:
+            key = next(iter(self._disk))
+            self._drop_disk(key)
+            self._stats["evictions"] += 1
+
+    def stats(self) -> dict:
+        """Hit/miss counters and current tier sizes."""
+        with self._lock:
+            return dict(
+                self._stats,
+                memory_entries=len(self._memory),
+                memory_bytes=self._memory_bytes,
+                disk_entries=len(self._disk),
+                disk_bytes=self._disk_bytes,
+            )
+
+
+class PageCache:
+    """Size-bounded LRU cache of encoded page streams across requests.
+
+    Keys combine the image hash with the preprocessing parameters, so a
+    page seen before (cover sheets, letterheads, repeated photos) is
+    reassembled without preprocessing it again. The preprocessing time
+    each hit avoided is added to ``time_saved_seconds``.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        # key -> (page, page bytes, preprocessing seconds)
+        self._pages = OrderedDict()
+        self._bytes = 0
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "time_saved_seconds": 0.0}
+
+    @staticmethod
+    def make_key(digest: str, **params) -> str:
+        """Hash an image digest together with its preprocessing parameters."""
+        sha = hashlib.sha256(digest.encode())
+        sha.update(json.dumps(params, sort_keys=True, default=str).encode())
+        return sha.hexdigest()
+
+    @staticmethod
+    def _page_size(page) -> int:
+        return len(page.data) + len(page.smask or b"") + len(page.iccp or b"")
+
+    def get(self, key: str):
+        """Return the cached page for key, or None."""
+        with self._lock:
+            entry = self._pages.get(key)
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            self._pages.move_to_end(key)
+            self._stats["hits"] += 1
+            self._stats["time_saved_seconds"] += entry[2]
+            return entry[0]
+
+    def put(self, key: str, page, elapsed: float):
+        """Cache a page that took elapsed seconds to preprocess."""
+        size = self._page_size(page)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._pages.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._pages[key] = (page, size, elapsed)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, evicted_size, _) = self._pages.popitem(last=False)
+                self._bytes -= evicted_size
+                self._stats["evictions"] += 1
+
+    def stats(self) -> dict:
+        """Hit/miss counters, saved preprocessing time and current size."""
+        with self._lock:
+            return dict(
+                self._stats,
+                time_saved_seconds=round(self._stats["time_saved_seconds"], 3),
+                entries=len(self._pages),
+                bytes=self._bytes,
+            )
@@ -0,0 +1,94 @@
+import hashlib
+import io
+import logging
+import threading
+from collections import OrderedDict
+
+from PIL import Image, ImageCms
+
+logger = logging.getLogger(__name__)
+
+# Built transforms kept per process. Building one parses both profiles and
+# precomputes lookup tables, which costs far more than applying it to a page.
+MAX_TRANSFORMS = 32
+
+RENDERING_INTENT = ImageCms.Intent.PERCEPTUAL
+
+# ICC profile colorspace signature (header bytes 16-20) -> Pillow modes
+# whose pixels the profile describes
+ICC_COLORSPACE_MODES = {
+    b"GRAY": ("L",),
+    b"RGB ": ("RGB", "P"),
+    b"CMYK": ("CMYK",),
+}
+
+_SRGB = ImageCms.ImageCmsProfile(ImageCms.createProfile("sRGB"))
+
+
+def profile_matches(icc: bytes, mode: str) -> bool:
+    """Whether an ICC profile describes pixels of the given mode."""
+    return mode in ICC_COLORSPACE_MODES.get(bytes(icc[16:20]), ())
+
+
+class TransformCache:
+    """LRU cache of built ImageCms transforms to sRGB.
+
+    Keys are the source profile's hash and the input and output modes, so
+    every page of a batch tagged with the same profile shares one transform.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._transforms = OrderedDict()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def get(self, icc: bytes, in_mode: str, out_mode: str = "RGB") -> ImageCms.ImageCmsTransform:
+        """The transform from the profile icc to sRGB, built on first use."""
+        key = (hashlib.sha256(icc).hexdigest(), in_mode, out_mode)
+        with self._lock:
+            transform = self._transforms.get(key)
+            if transform is not None:
+                self._transforms.move_to_end(key)
+                self._stats["hits"] += 1
+                return transform
+            self._stats["misses"] += 1
+
+        # Built outside the lock; two threads missing together both build
+        source = ImageCms.ImageCmsProfile(io.BytesIO(icc))
+        transform = ImageCms.buildTransform(source, _SRGB, in_mode, out_mode, RENDERING_INTENT)
+        with self._lock:
+            self._transforms[key] = transform
+            while len(self._transforms) > self.max_entries:
+                self._transforms.popitem(last=False)
+                self._stats["evictions"] += 1
+        return transform
+
+    def stats(self) -> dict:
+        """Hit/miss counters and the number of transforms held."""
+        with self._lock:
+            return dict(self._stats, entries=len(self._transforms))
+
+
+transforms = TransformCache(MAX_TRANSFORMS)
+
+
+def to_rgb(img: Image.Image) -> Image.Image:
+    """Convert an image to sRGB through its embedded ICC profile.
+
+    Images without a usable profile are converted naively by Pillow.
+    """
+    if img.mode == "P":
+        # Palette profiles describe the palette's RGB entries
+        img = img.convert("RGB")
+    icc = img.info.get("icc_profile")
+    if icc and profile_matches(icc, img.mode):
+        try:
+            converted = ImageCms.applyTransform(img, transforms.get(icc, img.mode))
+        except (ImageCms.PyCMSError, OSError) as e:
+            logger.debug(f"Cannot convert through the embedded ICC profile: {e}")
+        else:
+            # The pixels are sRGB now, not in the source profile
+            converted.info.pop("icc_profile", None)
+            return converted
+    return img if img.mode == "RGB" else img.convert("RGB")
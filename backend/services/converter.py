@@ -1,13 +1,199 @@
 import io
+import math
 import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Future,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
+)
+from itertools import islice
 from pathlib import Path
-from typing import List
-from PIL import Image
+from typing import BinaryIO, Iterator, List, Union
 import img2pdf
+from PIL import Image, ImageChops, ImageFilter, TiffImagePlugin
 import logging
 
+from services.budget import PixelBudget, PixelBudgetExceeded
+from services.cache import PageCache
+from services.color import profile_matches, to_rgb
+from services.image_handle import ImageHandle, as_handle
+from services.layout import PageLayout, page_layout
+from services.pdf_writer import PageImage, PDFStreamWriter
+
 logger = logging.getLogger(__name__)
 
+# EXIF orientation tag
+ORIENTATION_TAG = 0x0112
+
+# EXIF orientation -> (mirrored left to right, then clockwise rotation)
+EXIF_ORIENTATIONS = {
+    1: (False, 0),
+    2: (True, 0),
+    3: (False, 180),
+    4: (True, 180),
+    5: (True, 270),
+    6: (False, 90),
+    7: (True, 90),
+    8: (False, 270),
+}
+
+# Page orientations a request can ask for
+ORIENTATIONS = ("portrait", "landscape")
+
+# Clockwise page rotation that turns a page to the other orientation; the
+# top of the image ends up on the left, as for landscape pages in books
+ORIENTATION_TURN = 270
+
+# JPEG color modes that PDF can carry directly as a DCT stream; Adobe
+# CMYK JPEGs, stored inverted, get a /Decode array
+PASSTHROUGH_JPEG_MODES = {"L", "RGB", "CMYK"}
+
+# PNG color types whose IDAT data PDF can carry directly, with PNG
+# predictors, at up to 8 bits per sample: gray, RGB and palette (no alpha)
+PASSTHROUGH_PNG_COLOR_TYPES = {0, 2, 3}
+
+# TIFF photometric interpretations embedded as-is, by compression: fax
+# strips are white- or black-is-zero, JPEG strips gray, RGB or YCbCr
+PASSTHROUGH_TIFF_PHOTOMETRICS = {"group4": {0, 1}, "jpeg": {1, 2, 6}}
+
+# Passthrough kind -> PageImage builder copying the source's encoded data
+PASSTHROUGH_BUILDERS = {
+    "jpeg": PageImage.from_jpeg,
+    "png": PageImage.from_png,
+    "ccitt": PageImage.from_ccitt_tiff,
+    "tiff-jpeg": PageImage.from_tiff_jpeg,
+}
+
+# Modes PDF embeds directly, without conversion; palette images are
+# stored with an Indexed colorspace
+PDF_NATIVE_MODES = {"1", "L", "RGB", "CMYK", "P"}
+
+# Page color handling, see COLOR_OUTPUT in config.py
+COLOR_OUTPUTS = ("preserve", "srgb")
+
+# Most colors an RGB page may have to be stored as a palette image by
+# palette reduction (the limit of PDF's Indexed colorspace)
+PALETTE_MAX_COLORS = 256
+
+# Lossless transposes for rotate ops, counter-clockwise like Image.rotate
+ROTATE_TRANSPOSES = {
+    90: Image.Transpose.ROTATE_90,
+    180: Image.Transpose.ROTATE_180,
+    270: Image.Transpose.ROTATE_270,
+}
+
+# Longest side of the downsampled copy used for grayscale detection
+GRAYSCALE_SAMPLE_SIZE = 512
+
+# Adaptive threshold for bilevel pages: a pixel is ink when it is darker
+# than the mean of its neighbourhood (box radius in pixels) by more than
+# the offset, or darker than the dark level outright
+THRESHOLD_RADIUS = 15
+THRESHOLD_OFFSET = 12
+THRESHOLD_DARK_LEVEL = 80
+
+# Minimum ratio between the reduced image and the final size
+REDUCE_GAP = 2
+
+# Resampling strategies: resize filter and the reducing gap for the integer
+# reduce() step before it (None skips reduce)
+RESAMPLING_STRATEGIES = {
+    "nearest": (Image.Resampling.NEAREST, None),
+    "bilinear": (Image.Resampling.BILINEAR, REDUCE_GAP),
+    "box": (Image.Resampling.BOX, 1),
+    "lanczos": (Image.Resampling.LANCZOS, REDUCE_GAP),
+}
+
+# Named presets mapping to a resampling strategy
+RESAMPLING_PRESETS = {
+    "fast": "box",
+    "photo": "lanczos",
+}
+
+
+# Named presets: option defaults applied before the request's own
+PRESETS = {
+    # Text and forms scans: 1-bit pages stored as CCITT Group 4
+    "document": {"bilevel": True, "resampling": "box", "optimize": True},
+    # Smallest output for the same pages: graphics with few colors stored
+    # as palette images, and object streams and compressed streams when
+    # the PDF is finalized
+    "compact": {"optimize": True, "palette": True},
+}
+
+# Stream decode levels for output optimization; higher levels would decode
+# image filters (DCT, CCITT) and store the pixels Flate-encoded instead
+OPTIMIZE_DECODE_LEVELS = ("none", "generalized")
+
+
+def resolve_resampling(name: str) -> str:
+    """Resolve a resampling strategy or preset name to a strategy."""
+    name = name.lower()
+    name = RESAMPLING_PRESETS.get(name, name)
+    if name not in RESAMPLING_STRATEGIES:
+        choices = sorted(RESAMPLING_STRATEGIES) + sorted(RESAMPLING_PRESETS)
+        raise ValueError(f"Unknown resampling: {name} (choose from {', '.join(choices)})")
+    return name
+
+
+def resolve_preset(name: str) -> dict:
+    """Return the option defaults of a preset."""
+    preset = PRESETS.get(name.lower())
+    if preset is None:
+        raise ValueError(f"Unknown preset: {name} (choose from {', '.join(sorted(PRESETS))})")
+    return preset
+
+
+def resolve_orientation(name: str) -> str:
+    """Validate a requested page orientation."""
+    orientation = name.lower()
+    if orientation not in ORIENTATIONS:
+        raise ValueError(f"Unknown orientation: {name} (choose from {', '.join(ORIENTATIONS)})")
+    return orientation
+
+
+class PageOptions:
+    """Per-request options that control how each page is encoded."""
+
+    def __init__(
+        self,
+        resize: bool = True,
+        compression: bool = True,
+        resampling: str = "lanczos",
+        bilevel: bool = False,
+        orientation: str = None,
+        crop_pixels: bool = False,
+        layout: PageLayout = None,
+        palette: bool = False,
+    ):
+        self.resize = resize
+        self.compression = compression
+        self.resampling = resolve_resampling(resampling)
+        self.bilevel = bilevel
+        self.orientation = resolve_orientation(orientation) if orientation else None
+        self.crop_pixels = crop_pixels
+        self.layout = layout
+        self.palette = palette
+
+
+class OutputOptions:
+    """Per-request options applied when a written PDF is finalized."""
+
+    def __init__(self, password: str = None, optimize: bool = False, linearize: bool = False):
+        self.password = password
+        self.optimize = optimize
+        self.linearize = linearize
+
+    @property
+    def needed(self) -> bool:
+        """Whether the finalization pass has anything to do."""
+        return bool(self.password) or self.optimize or self.linearize
+
 
 class ImageToPDFConverter:
     """Convert images to PDF with preprocessing and metadata support."""
@@ -25,45 +211,181 @@ class ImageToPDFConverter:
         self.output_dir = config.OUTPUT_DIR
         self.target_width = config.TARGET_PDF_WIDTH
         self.target_height = config.TARGET_PDF_HEIGHT
+        self.layout = self.page_layout()
+        self.jpeg_passthrough = config.JPEG_PASSTHROUGH
+        self.native_passthrough = config.NATIVE_PASSTHROUGH
+        self.compress_level = config.PDF_COMPRESSION_LEVEL
+        self.optimize = config.PDF_OPTIMIZE
+        self.linearize_threshold = config.LINEARIZE_THRESHOLD_BYTES
+        self.optimize_decode_level = config.PDF_OPTIMIZE_DECODE_LEVEL
+        if self.optimize_decode_level not in OPTIMIZE_DECODE_LEVELS:
+            raise ValueError(
+                f"Unknown decode level: {self.optimize_decode_level} "
+                f"(choose from {', '.join(OPTIMIZE_DECODE_LEVELS)})"
+            )
+        self.resampling = resolve_resampling(config.RESAMPLING)
+        self.grayscale_detection = config.GRAYSCALE_DETECTION
+        self.grayscale_tolerance = config.GRAYSCALE_TOLERANCE
+        self.palette_reduction = config.PALETTE_REDUCTION
+        self.color_output = config.COLOR_OUTPUT
+        if self.color_output not in COLOR_OUTPUTS:
+            raise ValueError(
+                f"Unknown color output: {self.color_output} "
+                f"(choose from {', '.join(COLOR_OUTPUTS)})"
+            )
+        self.page_workers = config.PAGE_WORKERS
+        self.page_worker_mode = config.PAGE_WORKER_MODE
+        self._page_executor = None
+        # Guards creating the executor, as conversions run on several threads
+        self._page_executor_lock = threading.Lock()
+        self.page_cache = PageCache(config.PAGE_CACHE_BYTES) if config.PAGE_CACHE_ENABLED else None
+        self.pixel_budget = PixelBudget(config.MAX_INFLIGHT_PIXEL_BYTES)
+        self.max_request_pixel_bytes = config.MAX_REQUEST_PIXEL_BYTES
         self.output_dir.mkdir(exist_ok=True)
 
-    def validate_image(self, image_data: bytes, filename: str) -> tuple[bool, str]:
-        """Validate image format and integrity."""
-        try:
-            img = Image.open(io.BytesIO(image_data))
-            img.verify()
+    def __getstate__(self):
+        # The executor, page cache and pixel budget stay in the parent when
+        # pages go to worker processes
+        state = self.__dict__.copy()
+        state["_page_executor"] = None
+        state["_page_executor_lock"] = None
+        state["page_cache"] = None
+        state["pixel_budget"] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._page_executor_lock = threading.Lock()
+
+    def _get_page_executor(self):
+        """Create the shared page executor on first use."""
+        with self._page_executor_lock:
+            if self._page_executor is None:
+                if self.page_worker_mode == "process":
+                    self._page_executor = ProcessPoolExecutor(self.page_workers)
+                elif self.page_worker_mode == "thread":
+                    self._page_executor = ThreadPoolExecutor(
+                        self.page_workers, thread_name_prefix="page"
+                    )
+                else:
+                    raise ValueError(f"Unknown page worker mode: {self.page_worker_mode}")
+            return self._page_executor
+
+    def close(self):
+        """Shut down the page executor."""
+        with self._page_executor_lock:
+            executor, self._page_executor = self._page_executor, None
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+
+    def page_layout(
+        self, page_size: str = None, margin: str = None, fit: str = None, max_dpi: int = None
+    ) -> PageLayout:
+        """Page layout for a request, or None to size pages from their pixels.
 
-            # Re-open since verify() closes the file
-            img = Image.open(io.BytesIO(image_data))
+        Options not given fall back to PAGE_SIZE, PAGE_MARGIN, PAGE_FIT and
+        MAX_DPI.
+        """
+        return page_layout(
+            page_size or self.config.PAGE_SIZE,
+            margin or self.config.PAGE_MARGIN,
+            fit or self.config.PAGE_FIT,
+            self.config.MAX_DPI if max_dpi is None else max_dpi,
+        )
 
-            file_ext = Path(filename).suffix.lower().lstrip(".")
+    def validate_image(
+        self, image_data: Union[bytes, ImageHandle], filename: str = None
+    ) -> tuple[bool, str]:
+        """Validate image format and header, caching the result on the handle.
+
+        Pixel data is not decoded here; corrupt pixel data surfaces when the
+        image is decoded for preprocessing.
+        """
+        handle = as_handle(image_data, filename)
+        if handle.validation is None:
+            handle.validation = self._validate(handle)
+        return handle.validation
+
+    def _validate(self, handle: ImageHandle) -> tuple[bool, str]:
+        """Run the validation checks for a handle."""
+        try:
+            file_ext = Path(handle.filename).suffix.lower().lstrip(".")
             if file_ext not in self.SUPPORTED_FORMATS:
                 return False, f"Unsupported format: {file_ext}"
 
-            if len(image_data) > self.MAX_FILE_SIZE:
+            if handle.nbytes > self.MAX_FILE_SIZE:
                 return False, "File size exceeds maximum allowed"
 
+            # Parses the header only
+            handle.image
             return True, "Valid"
         except Exception as e:
             return False, str(e)
 
-    def rotate_image(self, image_data: bytes, angle: int) -> bytes:
+    def check_pixel_budget(self, handles: List[ImageHandle]):
+        """Reject oversized images and requests from their headers alone.
+
+        Each page, every frame of a multi-page image included, must be
+        within MAX_IMAGE_DIMENSION on both sides and fit the in-flight pixel
+        budget by itself, and all pages of the request together must fit
+        MAX_REQUEST_PIXEL_BYTES. Raises PixelBudgetExceeded before anything
+        is decoded. Images whose headers cannot be read are left to
+        validation.
+        """
+        total = 0
+        for handle in handles:
+            try:
+                for page in handle.frames(shared=True):
+                    total += self._check_page_pixels(page)
+            except PixelBudgetExceeded:
+                raise
+            except Exception:
+                continue
+
+        if total > self.max_request_pixel_bytes:
+            raise PixelBudgetExceeded(
+                f"Request needs {total // (1024 * 1024)} MB of pixel memory, more than "
+                f"the {self.max_request_pixel_bytes // (1024 * 1024)} MB per-request budget"
+            )
+
+    def _check_page_pixels(self, page: ImageHandle) -> int:
+        """Check one page's header against the limits and return its pixel bytes."""
+        width, height = page.size
+        if max(width, height) > self.MAX_IMAGE_SIZE:
+            raise PixelBudgetExceeded(
+                f"{page.label}: Image dimensions {width}x{height} exceed the "
+                f"maximum of {self.MAX_IMAGE_SIZE} pixels"
+            )
+        if page.pixel_bytes > self.pixel_budget.max_bytes:
+            raise PixelBudgetExceeded(
+                f"{page.label}: Image needs {page.pixel_bytes // (1024 * 1024)} MB "
+                f"of pixel memory, more than the "
+                f"{self.pixel_budget.max_bytes // (1024 * 1024)} MB budget"
+            )
+        return page.pixel_bytes
+
+    def rotate_image(self, image_data: Union[bytes, ImageHandle], angle: int) -> bytes:
         """Rotate image by specified angle."""
         try:
-            img = Image.open(io.BytesIO(image_data))
-            img = img.rotate(angle, expand=True)
-            
-            output = io.BytesIO()
-            img.save(output, format="PNG", optimize=True)
-            output.seek(0)
-            return output.getvalue()
+            handle = as_handle(image_data)
+            self.check_pixel_budget([handle])
+            nbytes = self._reserve_pixels(handle)
+            try:
+                img = handle.decode()
+                if angle % 360 in ROTATE_TRANSPOSES:
+                    img = img.transpose(ROTATE_TRANSPOSES[angle % 360])
+                elif angle % 360:
+                    img = img.rotate(angle, expand=True)
+                return self._to_png(img)
+            finally:
+                self.pixel_budget.release(nbytes)
         except Exception as e:
             logger.error(f"Error rotating image: {e}")
             raise
 
     def crop_image(
         self,
-        image_data: bytes,
+        image_data: Union[bytes, ImageHandle],
         left: int = 0,
         top: int = 0,
         right: int = 0,
@@ -71,182 +393,1105 @@ class ImageToPDFConverter:
     ) -> bytes:
         """Crop image by specified pixels."""
         try:
-            img = Image.open(io.BytesIO(image_data))
-            width, height = img.size
-            
-            # Calculate crop box
-            left = max(0, left)
-            top = max(0, top)
-            right = min(width, width - right)
-            bottom = min(height, height - bottom)
-            
-            if left < right and top < bottom:
-                img = img.crop((left, top, right, bottom))
-            
-            output = io.BytesIO()
-            img.save(output, format="PNG", optimize=True)
-            output.seek(0)
-            return output.getvalue()
+            handle = as_handle(image_data)
+            self.check_pixel_budget([handle])
+            nbytes = self._reserve_pixels(handle)
+            try:
+                img = handle.decode()
+                box = self._crop_box(img.size, left, top, right, bottom)
+                if box is not None:
+                    img = img.crop(box)
+
+                return self._to_png(img)
+            finally:
+                self.pixel_budget.release(nbytes)
         except Exception as e:
             logger.error(f"Error cropping image: {e}")
             raise
 
+    @staticmethod
+    def _crop_box(
+        size: tuple[int, int], left: int, top: int, right: int, bottom: int
+    ) -> tuple[int, int, int, int]:
+        """Crop box for margins cut from each side, or None if it is empty."""
+        width, height = size
+        left = max(0, left)
+        top = max(0, top)
+        right = min(width, width - right)
+        bottom = min(height, height - bottom)
+        if left < right and top < bottom:
+            return left, top, right, bottom
+        return None
+
+    @classmethod
+    def _plan_ops(
+        cls, size: tuple[int, int], ops: list, rotation: int = 0
+    ) -> tuple[tuple[int, int, int, int], int]:
+        """Reduce rotate and crop ops to one crop of the source and a rotation.
+
+        rotation is a clockwise rotation applied before the ops. Returns the
+        crop box in source pixels, or None for the whole image, and the
+        clockwise rotation the cropped source is displayed with.
+        """
+        turns = rotation // 90
+        width, height = size if turns % 2 == 0 else (size[1], size[0])
+        # Left, top, right, bottom margins cut from the source
+        margins = [0, 0, 0, 0]
+        for op in ops:
+            if op[0] == "rotate" and op[1] in ROTATE_TRANSPOSES:
+                # Rotate ops are counter-clockwise
+                turns -= op[1] // 90
+                if op[1] != 180:
+                    width, height = height, width
+            elif op[0] == "crop":
+                box = cls._crop_box((width, height), *op[1:])
+                if box is None:
+                    continue
+                cut = (box[0], box[1], width - box[2], height - box[3])
+                # Side i of the source is side i + turns of the rotated view
+                for side in range(4):
+                    margins[side] += cut[(side + turns) % 4]
+                width, height = box[2] - box[0], box[3] - box[1]
+
+        box = None
+        if any(margins):
+            box = (margins[0], margins[1], size[0] - margins[2], size[1] - margins[3])
+        return box, turns % 4 * 90
+
+    def _orient(
+        self, handle: ImageHandle, orientation: str = None
+    ) -> tuple[bool, tuple[int, int, int, int], int]:
+        """How a page is cut from its image and turned, judged from the header.
+
+        Combines the EXIF orientation, the handle's recorded ops and the
+        requested page orientation into (mirrored, crop box, clockwise
+        rotation). Only the mirror and crop touch pixels; the rotation is
+        set on the PDF page.
+        """
+        try:
+            img = handle.image
+            # PNG's getexif() decodes the image to look for EXIF after the
+            # pixel data; EXIF ahead of it is already in info
+            if img.format == "PNG" and "exif" not in img.info:
+                value = 1
+            else:
+                value = img.getexif().get(ORIENTATION_TAG, 1)
+        except Exception:
+            value = 1
+        mirrored, rotation = EXIF_ORIENTATIONS.get(value, (False, 0))
+        box, rotation = self._plan_ops(handle.size, handle.ops, rotation)
+
+        if orientation:
+            width, height = self._displayed_size(handle.size, box, rotation)
+            if (width > height) != (orientation == "landscape") and width != height:
+                rotation = (rotation + ORIENTATION_TURN) % 360
+        return mirrored, box, rotation
+
+    @staticmethod
+    def _displayed_size(
+        size: tuple[int, int], box: tuple[int, int, int, int], rotation: int
+    ) -> tuple[int, int]:
+        if box is not None:
+            size = (box[2] - box[0], box[3] - box[1])
+        return size if rotation in (0, 180) else (size[1], size[0])
+
+    @staticmethod
+    def _source_dpi(handle: ImageHandle) -> tuple[float, float]:
+        """Resolution from the image header, or img2pdf's default without one."""
+        dpi = handle.image.info.get("dpi")
+        if not dpi or not all(dpi):
+            return (img2pdf.default_dpi, img2pdf.default_dpi)
+        return float(dpi[0]), float(dpi[1])
+
+    def _layout_size(
+        self,
+        handle: ImageHandle,
+        box: tuple[int, int, int, int],
+        rotation: int,
+        layout: PageLayout,
+    ) -> tuple[int, int]:
+        """Size of the cut source, in source orientation, capped at max_dpi."""
+        size = self._displayed_size(handle.size, box, rotation)
+        dpi = self._source_dpi(handle)
+        # The layout places the page as displayed
+        if rotation in (90, 270):
+            return layout.max_pixels(size, dpi[::-1])[::-1]
+        return layout.max_pixels(size, dpi)
+
+    def output_size(self, image_data: Union[bytes, ImageHandle]) -> tuple[int, int]:
+        """Size of an image as displayed on its page, before resizing."""
+        handle = as_handle(image_data)
+        _, box, rotation = self._orient(handle)
+        return self._displayed_size(handle.size, box, rotation)
+
+    @staticmethod
+    def _cut_source(
+        img: Image.Image,
+        mirrored: bool,
+        box: tuple[int, int, int, int],
+        source_size: tuple[int, int],
+    ) -> Image.Image:
+        """Mirror and crop decoded pixels.
+
+        The box is in source pixels and is scaled to images decoded at a
+        reduced DCT scale.
+        """
+        if mirrored:
+            img = img.transpose(Image.Transpose.FLIP_LEFT_RIGHT)
+        if box is not None:
+            scale_x = img.width / source_size[0]
+            scale_y = img.height / source_size[1]
+            img = img.crop((
+                round(box[0] * scale_x),
+                round(box[1] * scale_y),
+                round(box[2] * scale_x),
+                round(box[3] * scale_y),
+            ))
+        return img
+
+    @staticmethod
+    def _rotate_pixels(img: Image.Image, rotation: int) -> Image.Image:
+        """Rotate pixels clockwise by a multiple of 90 degrees."""
+        if not rotation:
+            return img
+        return img.transpose(ROTATE_TRANSPOSES[360 - rotation])
+
     def preprocess_image(
         self,
-        image_data: bytes,
+        image_data: Union[bytes, ImageHandle],
         resize: bool = True,
         target_width: int = None,
         target_height: int = None,
+        resampling: str = None,
     ) -> bytes:
-        """Preprocess image: resize, normalize format, convert RGBA to RGB."""
+        """Preprocess image: resize, normalize mode, flatten transparency onto white."""
+        try:
+            handle = as_handle(image_data)
+            self.check_pixel_budget([handle])
+            nbytes = self._reserve_pixels(handle)
+            try:
+                img = self._preprocess(handle, resize, target_width, target_height, resampling)
+                img = self._rotate_pixels(img, self._orient(handle)[2])
+                return self._to_png(img)
+            finally:
+                self.pixel_budget.release(nbytes)
+        except Exception as e:
+            logger.error(f"Error preprocessing image: {e}")
+            raise
+
+    def _preprocess(
+        self,
+        handle: ImageHandle,
+        resize: bool = True,
+        target_width: int = None,
+        target_height: int = None,
+        resampling: str = None,
+        orientation: str = None,
+        layout: PageLayout = None,
+        palette: bool = False,
+    ) -> Image.Image:
+        """Decode, resize and normalize an image to a PDF-native mode.
+
+        Pixels keep the source orientation; the rotation from _orient() is
+        left to the PDF page. With a page layout, resizing only caps the
+        pixels at the layout's max_dpi instead of fitting the target box.
+        With palette, RGB pages with few colors become palette images.
+        """
+        if target_width is None:
+            target_width = self.target_width
+        if target_height is None:
+            target_height = self.target_height
+        resampling = resolve_resampling(resampling or self.resampling)
+
+        # Downscale while decoding: JPEGs are decoded at 1/2, 1/4 or 1/8
+        # scale, then reduced by an integer factor before resampling. The
+        # source is mirrored and cropped on the way.
+        mirrored, box, rotation = self._orient(handle, orientation)
+        if resize:
+            source_size = self._displayed_size(handle.size, box, 0)
+            if layout is not None:
+                size = self._layout_size(handle, box, rotation, layout)
+            else:
+                # Pages displayed sideways fit the target box turned sideways
+                if rotation in (90, 270):
+                    target_width, target_height = target_height, target_width
+                size = self._fit_size(source_size, (target_width, target_height))
+            scale = size[0] / source_size[0]
+            draft_size = (math.ceil(handle.size[0] * scale), math.ceil(handle.size[1] * scale))
+            img = handle.decode(draft_size=draft_size)
+            img = self._cut_source(img, mirrored, box, handle.size)
+            img = self._downscale(img, size, resampling)
+        else:
+            img = self._cut_source(handle.decode(), mirrored, box, handle.size)
+
+        img = self._normalize_mode(img)
+        if self._converts_to_srgb(img):
+            img = to_rgb(img)
+
+        # Near-gray color pages are stored with one channel instead of three
+        if self.grayscale_detection and img.mode == "RGB" and self._is_grayscale(img):
+            img = img.convert("L")
+
+        if palette and img.mode == "RGB":
+            img = self._reduce_palette(img)
+
+        return img
+
+    @classmethod
+    def _reduce_palette(cls, img: Image.Image) -> Image.Image:
+        """Store an RGB image with few colors as a palette image, losslessly.
+
+        Images with more than PALETTE_MAX_COLORS colors are returned as-is.
+        Counting stops at the first color over the limit. Pixels are first
+        mapped by quantize() against a palette of exactly the image's
+        colors; its color cache has reduced precision and can merge colors
+        a level or two apart, so a result that differs from the image is
+        redone with median cut, which maps pixels exactly when there are
+        no more colors than palette entries. All passes run in Pillow's C
+        code, and an image neither maps exactly stays RGB.
+        """
+        colors = img.getcolors(PALETTE_MAX_COLORS)
+        if colors is None:
+            return img
+        # Most frequent colors first
+        colors.sort(reverse=True)
+        palette = Image.new("P", (1, 1))
+        palette.putpalette([channel for _, color in colors for channel in color])
+        reduced = img.quantize(palette=palette, dither=Image.Dither.NONE)
+        if cls._same_pixels(reduced, img):
+            return reduced
+
+        reduced = img.quantize(len(colors), Image.Quantize.MEDIANCUT, dither=Image.Dither.NONE)
+        if cls._same_pixels(reduced, img):
+            return reduced
+        logger.debug("Palette reduction would change colors, keeping RGB")
+        return img
+
+    @staticmethod
+    def _same_pixels(reduced: Image.Image, img: Image.Image) -> bool:
+        """Whether a palette image shows exactly the pixels of an RGB image."""
+        return ImageChops.difference(reduced.convert("RGB"), img).getbbox() is None
+
+    def _converts_to_srgb(self, img: Image.Image) -> bool:
+        """Whether COLOR_OUTPUT asks for this image's colors in sRGB.
+
+        CMYK images and color images tagged with an RGB ICC profile are
+        converted; gray images keep their colorspace.
+        """
+        if self.color_output != "srgb":
+            return False
+        if img.mode == "CMYK":
+            return True
+        icc = img.info.get("icc_profile")
+        return bool(icc) and img.mode in ("RGB", "P") and profile_matches(icc, img.mode)
+
+    def _is_grayscale(self, img: Image.Image) -> bool:
+        """Check whether an RGB image has no chroma beyond the tolerance.
+
+        Runs on a box-filtered copy at most GRAYSCALE_SAMPLE_SIZE pixels on
+        its longest side, so JPEG noise is averaged out while colored
+        marks such as stamps or highlights still register.
+        """
+        size = self._fit_size(img.size, (GRAYSCALE_SAMPLE_SIZE, GRAYSCALE_SAMPLE_SIZE))
+        sample = img.resize(size, Image.Resampling.BOX) if size != img.size else img
+        _, cb, cr = sample.convert("YCbCr").getextrema()
+        return all(abs(value - 128) <= self.grayscale_tolerance for value in cb + cr)
+
+    @classmethod
+    def _normalize_mode(cls, img: Image.Image) -> Image.Image:
+        """Flatten transparency onto white and convert to a PDF-native mode.
+
+        Images already in a PDF-native mode are returned as-is. Alpha is
+        flattened with a single paste onto a white page, using the image
+        itself as the mask; gray images with alpha stay gray, and palette
+        images stay palette images. ICC profiles carry over.
+        """
+        if img.mode == "P" and img.has_transparency_data:
+            return cls._flatten_palette(img)
+        if img.mode in PDF_NATIVE_MODES:
+            return img
+
+        has_alpha = img.mode in ("RGBA", "RGBa", "LA", "La", "PA")
+        if not has_alpha:
+            return img.convert("RGB")
+
+        if img.mode in ("LA", "La"):
+            flat_mode, white = "L", 255
+            if img.mode == "La":
+                img = img.convert("LA")
+        else:
+            flat_mode, white = "RGB", (255, 255, 255)
+            if img.mode != "RGBA":
+                img = img.convert("RGBA")
+
+        flat = Image.new(flat_mode, img.size, white)
+        flat.paste(img, mask=img)
+        if "icc_profile" in img.info:
+            flat.info["icc_profile"] = img.info["icc_profile"]
+        return flat
+
+    @staticmethod
+    def _flatten_palette(img: Image.Image) -> Image.Image:
+        """Flatten a palette image's transparency onto white, in its palette.
+
+        Each palette entry is blended with white by its alpha, so pixels
+        keep their indices and only the palette changes.
+        """
+        transparency = img.info.get("transparency")
+        if isinstance(transparency, int):
+            alphas = {transparency: 0}
+        elif isinstance(transparency, bytes):
+            alphas = dict(enumerate(transparency))
+        else:
+            alphas = {}
+
+        entries = img.getpalette("RGBA")
+        flat = []
+        for index in range(len(entries) // 4):
+            *rgb, alpha = entries[index * 4:index * 4 + 4]
+            alpha = min(alpha, alphas.get(index, 255))
+            flat.extend((value * alpha + 255 * (255 - alpha) + 127) // 255 for value in rgb)
+
+        img = img.copy()
+        img.info.pop("transparency", None)
+        img.putpalette(flat)
+        return img
+
+    @staticmethod
+    def _threshold(img: Image.Image) -> Image.Image:
+        """Adaptive threshold to a 1-bit image.
+
+        The local mean comes from a box blur, so the whole threshold runs as
+        a few full-frame Pillow operations; uneven lighting and shaded form
+        fields turn white while text stays black.
+        """
+        if img.mode == "1":
+            return img
+        gray = img if img.mode == "L" else img.convert("L")
+        local_mean = gray.filter(ImageFilter.BoxBlur(THRESHOLD_RADIUS))
+        contrast = ImageChops.subtract(local_mean, gray)
+        ink = ImageChops.lighter(
+            contrast.point(lambda v: 255 if v > THRESHOLD_OFFSET else 0),
+            gray.point(lambda v: 255 if v < THRESHOLD_DARK_LEVEL else 0),
+        )
+        return ink.point(lambda v: 0 if v else 255, "1")
+
+    def _to_png(self, img: Image.Image) -> bytes:
+        """Encode pixels as PNG at the configured zlib level, without optimize."""
+        if img.mode == "CMYK":
+            # PNG has no CMYK
+            img = to_rgb(img)
+        output = io.BytesIO()
+        img.save(output, format="PNG", compress_level=self.compress_level)
+        return output.getvalue()
+
+    @staticmethod
+    def _fit_size(size: tuple[int, int], box: tuple[int, int]) -> tuple[int, int]:
+        """Largest size with the same aspect ratio that fits inside box."""
+        width, height = size
+        if width <= box[0] and height <= box[1]:
+            return size
+        scale = min(box[0] / width, box[1] / height)
+        return max(1, round(width * scale)), max(1, round(height * scale))
+
+    @staticmethod
+    def _downscale(
+        img: Image.Image, size: tuple[int, int], resampling: str = "lanczos"
+    ) -> Image.Image:
+        """Resize to size, using cheap integer reduction for large factors."""
+        if img.size == size:
+            return img
+
+        # Pillow resamples palette images with nearest neighbour only
+        if img.mode == "P":
+            img = img.convert("RGBA" if img.has_transparency_data else "RGB")
+
+        # Keep at least reducing_gap times the target size for the final
+        # resample
+        resample, reducing_gap = RESAMPLING_STRATEGIES[resampling]
+        if reducing_gap is not None:
+            factor = min(img.width // size[0], img.height // size[1]) // reducing_gap
+            if factor > 1:
+                img = img.reduce(factor)
+        return img.resize(size, resample)
+
+    def _passthrough_kind(self, handle: ImageHandle) -> str:
+        """How a page's encoded data can be embedded as-is, judged from its header.
+
+        Returns "jpeg" (also the first image of an MPO), "png", "ccitt"
+        (Group 4 fax TIFF) or "tiff-jpeg" (JPEG-compressed TIFF), or None
+        when the pixels must be decoded.
+        """
+        img = handle.image
+        if self._converts_to_srgb(img):
+            return None
+
+        if img.format in ("JPEG", "MPO"):
+            if not self.jpeg_passthrough or img.mode not in PASSTHROUGH_JPEG_MODES:
+                return None
+            # Progressive JPEGs still go through preprocessing
+            if img.info.get("progressive") or img.info.get("progression"):
+                return None
+            return "jpeg"
+
+        if not self.native_passthrough:
+            return None
+
+        if img.format == "PNG":
+            # Bit depth, color type and interlace method from the IHDR chunk,
+            # which always comes first
+            depth, color_type, _, _, interlace = handle.head(29)[24:29]
+            if depth > 8 or color_type not in PASSTHROUGH_PNG_COLOR_TYPES or interlace:
+                return None
+            # Transparent and animated PNGs need decoding
+            if "transparency" in img.info or getattr(img, "is_animated", False):
+                return None
+            return "png"
+
+        if img.format == "TIFF":
+            tags = img.tag_v2
+            compression = img.info.get("compression")
+            if compression not in PASSTHROUGH_TIFF_PHOTOMETRICS:
+                return None
+            # One strip of interleaved 1- or 8-bit samples
+            if len(tags.get(TiffImagePlugin.STRIPOFFSETS, ())) != 1:
+                return None
+            if tags.get(TiffImagePlugin.PLANAR_CONFIGURATION, 1) != 1:
+                return None
+            photometric = tags.get(TiffImagePlugin.PHOTOMETRIC_INTERPRETATION)
+            if photometric not in PASSTHROUGH_TIFF_PHOTOMETRICS[compression]:
+                return None
+            if compression == "group4":
+                if tags.get(TiffImagePlugin.FILLORDER, 1) not in (1, 2):
+                    return None
+                return "ccitt"
+            if img.mode not in PASSTHROUGH_JPEG_MODES:
+                return None
+            if set(tags.get(TiffImagePlugin.BITSPERSAMPLE, (8,))) != {8}:
+                return None
+            return "tiff-jpeg"
+
+        return None
+
+    def can_passthrough(
+        self,
+        image_data: Union[bytes, ImageHandle],
+        resize: bool = True,
+        target_width: int = None,
+        target_height: int = None,
+        orientation: str = None,
+        crop_pixels: bool = False,
+        layout: PageLayout = None,
+    ) -> bool:
+        """Check whether a page can be embedded as-is, judged from its header.
+
+        JPEGs, PNGs without alpha or interlacing, Group 4 fax TIFFs and
+        JPEG-compressed TIFFs qualify, see _passthrough_kind(). Rotations,
+        from EXIF, rotate ops or the requested orientation, do not prevent
+        it; they are set on the page. Neither do crops, which become the
+        page's crop box, unless crop_pixels asks for the cropped-away pixels
+        to be removed. Resizing does, unless the image already fits the
+        target box or, with a page layout, prints at no more than its
+        max_dpi.
+        """
         try:
+            handle = as_handle(image_data)
+            img = handle.image
+            if self._passthrough_kind(handle) is None:
+                return False
+        except Exception:
+            return False
+
+        # Mirrored EXIF orientations and pixel crops need the pixels
+        mirrored, box, rotation = self._orient(handle, orientation)
+        if mirrored or (crop_pixels and box is not None):
+            return False
+
+        if resize and layout is not None:
+            size = self._displayed_size(img.size, box, 0)
+            if self._layout_size(handle, box, rotation, layout) != size:
+                return False
+        elif resize:
             if target_width is None:
                 target_width = self.target_width
             if target_height is None:
                 target_height = self.target_height
+            width, height = self._displayed_size(img.size, None, rotation)
+            if width > target_width or height > target_height:
+                return False
 
-            img = Image.open(io.BytesIO(image_data))
+        return True
 
-            # Convert RGBA to RGB
-            if img.mode == "RGBA":
-                rgb_img = Image.new("RGB", img.size, (255, 255, 255))
-                rgb_img.paste(img, mask=img.split()[3])
-                img = rgb_img
-            elif img.mode != "RGB":
-                img = img.convert("RGB")
+    def prepare_page(
+        self,
+        image_data: Union[bytes, ImageHandle],
+        resize: bool = True,
+        compression: bool = True,
+        resampling: str = None,
+        bilevel: bool = False,
+        orientation: str = None,
+        crop_pixels: bool = False,
+        layout: PageLayout = None,
+        palette: bool = False,
+    ) -> PageImage:
+        """Return the encoded image stream for one page.
 
-            # Resize if needed
-            if resize:
-                img.thumbnail((target_width, target_height), Image.Resampling.LANCZOS)
+        Processed pixels are Flate-compressed straight into the page stream
+        at PDF_COMPRESSION_LEVEL, or stored uncompressed when compression is
+        off. Palette images stay Indexed; with palette, so do RGB pages of
+        at most PALETTE_MAX_COLORS colors. CMYK pages stay CMYK and ICC
+        profiles are embedded, unless COLOR_OUTPUT is "srgb". Bilevel pages
+        are thresholded to 1 bit and stored as CCITT Group 4; fax TIFFs
+        already are. Pages that can_passthrough() copy the source's encoded
+        data instead, falling back to decoding if it
+        turns out to be unusable. Rotations are set as the page's /Rotate,
+        never applied to the pixels. Crops of embedded pages are set as the
+        page's crop box; pages that are decoded anyway drop the
+        cropped-away pixels.
 
-            # Save to bytes
-            output = io.BytesIO()
-            img.save(output, format="PNG", quality=self.config.PNG_QUALITY, optimize=True)
-            output.seek(0)
-            return output.getvalue()
-        except Exception as e:
-            logger.error(f"Error preprocessing image: {e}")
-            raise
+        With a page layout, resampled pages keep the physical size of their
+        source by scaling its DPI along with the pixels. Without one, every
+        page is sized from its pixels at img2pdf's default DPI, whether it
+        was embedded as-is or decoded.
+        """
+        handle = as_handle(image_data)
+        _, box, rotation = self._orient(handle, orientation)
+        if self.can_passthrough(
+            handle, resize, orientation=orientation, crop_pixels=crop_pixels, layout=layout
+        ):
+            kind = self._passthrough_kind(handle)
+            # Thresholding needs the pixels unless the page already is a
+            # fax, and palette reduction those of RGB PNGs
+            needs_pixels = (bilevel and kind != "ccitt") or (
+                palette and kind == "png" and handle.mode == "RGB"
+            )
+            if not needs_pixels:
+                try:
+                    page = PASSTHROUGH_BUILDERS[kind](handle.image, handle.data)
+                except Exception as e:
+                    logger.debug(f"{handle.label}: cannot embed {kind} data as-is: {e}")
+                else:
+                    page.passthrough = True
+                    if layout is None:
+                        page.dpi = (img2pdf.default_dpi, img2pdf.default_dpi)
+                    page.rotation = rotation
+                    page.crop = box
+                    return page
+
+        level = self.compress_level if compression and self.config.PDF_COMPRESSION_ENABLED else 0
+        img = self._preprocess(
+            handle,
+            resize,
+            resampling=resampling,
+            orientation=orientation,
+            layout=layout,
+            palette=palette and not bilevel,
+        )
+        page = None
+        if bilevel:
+            img = self._threshold(img)
+            try:
+                page = PageImage.from_bilevel(img)
+            except Exception as e:
+                # Group 4 needs Pillow built with libtiff
+                logger.debug(f"CCITT Group 4 encoding failed, using Flate: {e}")
+        if page is None:
+            page = PageImage.from_pixels(img, level)
+        if layout is not None:
+            width, height = self._displayed_size(handle.size, box, 0)
+            dpi = self._source_dpi(handle)
+            page.dpi = (dpi[0] * img.width / width, dpi[1] * img.height / height)
+        page.rotation = rotation
+        return page
 
     def convert_single(
         self,
-        image_data: bytes,
-        filename: str,
+        image_data: Union[bytes, ImageHandle],
+        filename: str = None,
         metadata: dict = None,
         resize: bool = True,
         compression: bool = True,
+        resampling: str = None,
+        preset: str = None,
+        orientation: str = None,
+        crop_pixels: bool = False,
+        layout: PageLayout = None,
+        password: str = None,
+        linearize: bool = False,
+        report: list = None,
     ) -> tuple[bytes, str]:
-        """Convert single image to PDF."""
+        """Convert single image to PDF, encrypted if a password is given.
+
+        Per-page encoding paths are appended to report if given, see
+        _write_pdf().
+        """
         try:
+            handle = as_handle(image_data, filename)
+
             # Validate
-            valid, msg = self.validate_image(image_data, filename)
+            valid, msg = self.validate_image(handle)
             if not valid:
                 raise ValueError(msg)
 
-            # Preprocess
-            processed = self.preprocess_image(image_data, resize)
-            img = Image.open(io.BytesIO(processed))
-
-            # Convert to PDF
-            pdf_bytes = img2pdf.convert(processed)
-
-            # Add metadata if provided
-            if metadata:
-                pdf_bytes = self._add_metadata(pdf_bytes, metadata)
-
-            return pdf_bytes, "Success"
+            # Preprocess and convert to PDF
+            output = io.BytesIO()
+            options = self._page_options(
+                resize, compression, resampling, preset, orientation, crop_pixels, layout
+            )
+            self._write_pdf([handle], output, options, metadata, report)
+            output_options = self._output_options(
+                output.getbuffer().nbytes, preset, password, linearize
+            )
+            return self._finalize_in_memory(output, output_options), "Success"
         except Exception as e:
             logger.error(f"Error converting single image: {e}")
             raise
 
     def convert_multiple(
         self,
-        image_files: List[tuple[bytes, str]],
+        image_files: List[Union[tuple[bytes, str], ImageHandle]],
         metadata: dict = None,
         resize: bool = True,
         compression: bool = True,
+        resampling: str = None,
+        preset: str = None,
+        orientation: str = None,
+        crop_pixels: bool = False,
+        layout: PageLayout = None,
+        password: str = None,
+        linearize: bool = False,
+        report: list = None,
     ) -> tuple[bytes, str]:
-        """Convert multiple images to single PDF."""
+        """Convert multiple images to single PDF, encrypted if a password is given.
+
+        Per-page encoding paths are appended to report if given, see
+        _write_pdf().
+        """
         try:
-            processed_images = []
+            output = io.BytesIO()
+            options = self._page_options(
+                resize, compression, resampling, preset, orientation, crop_pixels, layout
+            )
+            self._write_pdf(self._handles(image_files), output, options, metadata, report)
+            output_options = self._output_options(
+                output.getbuffer().nbytes, preset, password, linearize
+            )
+            return self._finalize_in_memory(output, output_options), "Success"
+        except Exception as e:
+            logger.error(f"Error converting multiple images: {e}")
+            raise
 
-            for image_data, filename in image_files:
-                # Validate
-                valid, msg = self.validate_image(image_data, filename)
-                if not valid:
-                    raise ValueError(f"{filename}: {msg}")
+    def convert_multiple_to_file(
+        self,
+        image_files: List[Union[tuple[bytes, str], ImageHandle]],
+        output_path: Path,
+        metadata: dict = None,
+        resize: bool = True,
+        compression: bool = True,
+        resampling: str = None,
+        preset: str = None,
+        orientation: str = None,
+        crop_pixels: bool = False,
+        layout: PageLayout = None,
+        password: str = None,
+        linearize: bool = False,
+        report: list = None,
+    ) -> tuple[Path, str]:
+        """Convert multiple images to a PDF file, streaming pages to disk.
 
-                # Preprocess
-                processed = self.preprocess_image(image_data, resize)
-                processed_images.append(processed)
+        Each page is written as soon as it is processed, so memory use is
+        bounded by the pages in flight rather than the page count. With a
+        password, optimization or linearization, the finished file is
+        finalized into output_path in one further pass. Per-page encoding
+        paths are appended to report if given, see _write_pdf().
+        """
+        partial_path = output_path.with_name(output_path.name + ".part")
+        try:
+            options = self._page_options(
+                resize, compression, resampling, preset, orientation, crop_pixels, layout
+            )
+            with open(partial_path, "wb") as f:
+                self._write_pdf(self._handles(image_files), f, options, metadata, report)
+            output_options = self._output_options(
+                partial_path.stat().st_size, preset, password, linearize
+            )
+            if output_options.needed:
+                try:
+                    self.finalize_pdf(partial_path, output_path, output_options)
+                except Exception:
+                    self.cleanup_file(output_path)
+                    raise
+                self.cleanup_file(partial_path)
+            else:
+                partial_path.replace(output_path)
+            return output_path, "Success"
+        except Exception as e:
+            logger.error(f"Error streaming images to PDF: {e}")
+            self.cleanup_file(partial_path)
+            raise
 
-            # Convert all to PDF
-            pdf_bytes = img2pdf.convert(processed_images)
+    def _page_options(
+        self,
+        resize: bool,
+        compression: bool,
+        resampling: str = None,
+        preset: str = None,
+        orientation: str = None,
+        crop_pixels: bool = False,
+        layout: PageLayout = None,
+    ) -> PageOptions:
+        """Page options for a request.
 
-            # Add metadata if provided
-            if metadata:
-                pdf_bytes = self._add_metadata(pdf_bytes, metadata)
+        Options not given fall back to the preset, then to the configured
+        defaults.
+        """
+        defaults = resolve_preset(preset) if preset else {}
+        return PageOptions(
+            resize,
+            compression,
+            resampling or defaults.get("resampling") or self.resampling,
+            defaults.get("bilevel", False),
+            orientation,
+            crop_pixels,
+            layout or self.layout,
+            defaults.get("palette", self.palette_reduction),
+        )
 
-            return pdf_bytes, "Success"
-        except Exception as e:
-            logger.error(f"Error converting multiple images: {e}")
+    def _output_options(
+        self, size: int, preset: str = None, password: str = None, linearize: bool = False
+    ) -> OutputOptions:
+        """Finalization options for a written PDF of size bytes.
+
+        Optimization falls back to the preset, then to the configured
+        default. PDFs of at least LINEARIZE_THRESHOLD_BYTES are linearized
+        even when not requested.
+        """
+        defaults = resolve_preset(preset) if preset else {}
+        if self.linearize_threshold and size >= self.linearize_threshold:
+            linearize = True
+        return OutputOptions(password, defaults.get("optimize", self.optimize), linearize)
+
+    @staticmethod
+    def _handles(image_files) -> List[ImageHandle]:
+        """Accept ImageHandles or (bytes, filename) tuples."""
+        return [
+            image_file if isinstance(image_file, ImageHandle) else ImageHandle(*image_file)
+            for image_file in image_files
+        ]
+
+    def _write_pdf(
+        self,
+        handles: List[ImageHandle],
+        stream: BinaryIO,
+        options: PageOptions,
+        metadata: dict = None,
+        report: list = None,
+    ) -> int:
+        """Write the pages of handles as a PDF to stream, one page at a time.
+
+        If a report list is given, one entry per page is appended to it:
+        the page number, whether the source data was embedded as-is
+        ("passthrough") or decoded ("reencode"), and the stream's filter.
+        """
+        self.check_pixel_budget(handles)
+        start = time.perf_counter()
+        writer = PDFStreamWriter(stream, options.layout)
+        passthrough = 0
+        for page in self._iter_pages(handles, options):
+            writer.add_page(page)
+            passthrough += page.passthrough
+            if report is not None:
+                report.append({
+                    "page": writer.page_count,
+                    "path": "passthrough" if page.passthrough else "reencode",
+                    "filter": page.filter,
+                })
+
+        info = {}
+        if metadata:
+            if metadata.get("title"):
+                info["Title"] = metadata["title"]
+            if metadata.get("author"):
+                info["Author"] = metadata["author"]
+        writer.close(info)
+        logger.info(
+            f"Wrote {writer.page_count} pages ({passthrough} passed through, "
+            f"{writer.size} bytes) in {time.perf_counter() - start:.3f}s"
+        )
+        return writer.page_count
+
+    def _process_page(self, handle: ImageHandle, options: PageOptions) -> PageImage:
+        """Validate and prepare one page, then drop its decoded pixels.
+
+        Errors are raised as ValueError naming the file and, for frames of
+        multi-frame images, the frame index.
+        """
+        try:
+            valid, msg = self.validate_image(handle)
+            if not valid:
+                raise ValueError(f"{handle.label}: {msg}")
+            try:
+                return self.prepare_page(
+                    handle,
+                    options.resize,
+                    options.compression,
+                    options.resampling,
+                    options.bilevel,
+                    options.orientation,
+                    options.crop_pixels,
+                    options.layout,
+                    options.palette,
+                )
+            except Exception as e:
+                raise ValueError(f"{handle.label}: {e}") from e
+        finally:
+            handle.release()
+
+    @staticmethod
+    def _single_page(handles: List[ImageHandle]) -> bool:
+        """Whether handles make up at most one page."""
+        if len(handles) != 1:
+            return not handles
+        try:
+            return handles[0].n_pages == 1
+        except Exception:
+            return True
+
+    def _iter_frames(
+        self, handles: List[ImageHandle], shared: bool, spill: bool = False
+    ) -> Iterator[ImageHandle]:
+        """Expand multi-frame images into one handle per frame, lazily."""
+        for handle in handles:
+            if not self.validate_image(handle)[0]:
+                # Fails with its validation error in _process_page
+                yield handle
+                continue
+            yield from handle.frames(shared, spill)
+
+    def _timed_process_page(
+        self, handle: ImageHandle, options: PageOptions
+    ) -> tuple[PageImage, float]:
+        """Process one page and measure how long it took."""
+        start = time.perf_counter()
+        page = self._process_page(handle, options)
+        return page, time.perf_counter() - start
+
+    def _reserve_pixels(self, handle: ImageHandle) -> int:
+        """Reserve a page's decoded size in the pixel budget, returning it.
+
+        Pages whose header cannot be read reserve nothing; they fail when
+        processed.
+        """
+        try:
+            nbytes = handle.pixel_bytes
+        except Exception:
+            return 0
+        try:
+            self.pixel_budget.acquire(nbytes)
+        except PixelBudgetExceeded as e:
+            raise PixelBudgetExceeded(f"{handle.label}: {e}") from e
+        return nbytes
+
+    def output_settings(self) -> dict:
+        """Server settings that change the output for the same images and options.
+
+        Hashed into page and conversion cache keys, so entries made under
+        other settings are not served after a configuration change.
+        """
+        return {
+            "target": (self.target_width, self.target_height),
+            "layout": self.layout,
+            "resampling": self.resampling,
+            "compress_level": self.compress_level,
+            "compression_enabled": self.config.PDF_COMPRESSION_ENABLED,
+            "jpeg_passthrough": self.jpeg_passthrough,
+            "native_passthrough": self.native_passthrough,
+            "grayscale_tolerance": self.grayscale_tolerance if self.grayscale_detection else None,
+            "palette_reduction": self.palette_reduction,
+            "color_output": self.color_output,
+            "optimize": self.optimize,
+            "optimize_decode_level": self.optimize_decode_level,
+            "linearize_threshold": self.linearize_threshold,
+        }
+
+    def _page_key(self, handle: ImageHandle, options: PageOptions) -> str:
+        """Page cache key: the image hash plus every preprocessing parameter."""
+        return PageCache.make_key(
+            handle.digest,
+            settings=self.output_settings(),
+            ops=handle.ops,
+            **vars(options),
+        )
+
+    def _lookup_page(
+        self, handle: ImageHandle, options: PageOptions
+    ) -> tuple[str, PageImage]:
+        """Look a page up in the page cache.
+
+        Returns the cache key and the cached page, or None for the page on a
+        miss. Invalid images are never looked up, so their error is raised
+        by _process_page in page order.
+        """
+        if self.page_cache is None:
+            return None, None
+        valid, _ = self.validate_image(handle)
+        if not valid:
+            return None, None
+        key = self._page_key(handle, options)
+        page = self.page_cache.get(key)
+        if page is not None:
+            handle.release()
+        return key, page
+
+    def _store_page(self, key: str, result: tuple[PageImage, float]) -> PageImage:
+        """Add a freshly processed page to the page cache and return it.
+
+        Passthrough pages are not cached; they were never preprocessed.
+        """
+        page, elapsed = result
+        if key is not None and not page.passthrough:
+            self.page_cache.put(key, page, elapsed)
+        return page
+
+    def _submit_page(
+        self, executor, handle: ImageHandle, options: PageOptions
+    ) -> tuple[str, Future]:
+        """Submit a page to the executor, or return a finished future on a cache hit."""
+        key, page = self._lookup_page(handle, options)
+        if page is not None:
+            future = Future()
+            future.set_result((page, 0.0))
+            return None, future
+
+        nbytes = self._reserve_pixels(handle)
+        try:
+            future = executor.submit(self._timed_process_page, handle, options)
+        except BaseException:
+            self.pixel_budget.release(nbytes)
             raise
+        future.add_done_callback(lambda _: self.pixel_budget.release(nbytes))
+        return key, future
 
-    def _add_metadata(self, pdf_bytes: bytes, metadata: dict) -> bytes:
-        """Add metadata to PDF using pikepdf."""
+    def _iter_pages(
+        self, handles: List[ImageHandle], options: PageOptions
+    ) -> Iterator[PageImage]:
+        """Yield processed pages in order, using the page executor if enabled.
+
+        At most twice the worker count of pages are in flight at once. Fails
+        fast: when a page fails, the remaining pages are cancelled and the
+        error of the earliest failing page is raised.
+
+        Pages found in the page cache are not processed again. Multi-frame
+        images contribute one page per frame, processed one at a time. Each
+        page reserves its decoded size in the pixel budget until it is done.
+        """
+        if self.page_workers <= 1 or self._single_page(handles):
+            for handle in self._iter_frames(handles, shared=True):
+                key, page = self._lookup_page(handle, options)
+                if page is None:
+                    nbytes = self._reserve_pixels(handle)
+                    try:
+                        result = self._timed_process_page(handle, options)
+                    finally:
+                        self.pixel_budget.release(nbytes)
+                    page = self._store_page(key, result)
+                yield page
+            return
+
+        executor = self._get_page_executor()
+        # Frames going to worker processes open a copy of their file on disk
+        spill = self.page_worker_mode == "process"
+        remaining = self._iter_frames(handles, shared=False, spill=spill)
+        futures = deque()
         try:
-            import pikepdf
+            for handle in islice(remaining, self.page_workers * 2):
+                futures.append(self._submit_page(executor, handle, options))
+            while futures:
+                done, _ = wait([future for _, future in futures], return_when=FIRST_COMPLETED)
+                for _, future in futures:
+                    if future in done and future.exception() is not None:
+                        raise future.exception()
 
-            with pikepdf.open(io.BytesIO(pdf_bytes)) as pdf:
-                # Add title
-                if "title" in metadata:
-                    pdf.docinfo["/Title"] = metadata["title"]
-
-                # Add author
-                if "author" in metadata:
-                    pdf.docinfo["/Author"] = metadata["author"]
-
-                # Encrypt if password provided
-                if "password" in metadata and metadata["password"]:
-                    pdf.save(
-                        io.BytesIO(),
-                        encryption=pikepdf.Encryption(
-                            owner=metadata["password"],
-                            user=metadata["password"],
-                            R=4
-                        )
-                    )
+                while futures and futures[0][1].done():
+                    key, future = futures.popleft()
+                    yield self._store_page(key, future.result())
+                    for handle in islice(remaining, 1):
+                        futures.append(self._submit_page(executor, handle, options))
+        finally:
+            for _, future in futures:
+                future.cancel()
+            for handle in handles:
+                handle.discard_spill()
 
-                # Save with metadata
-                output = io.BytesIO()
-                pdf.save(output)
-                output.seek(0)
-                return output.getvalue()
-        except Exception as e:
-            logger.warning(f"Could not add metadata: {e}")
-            return pdf_bytes
+    def finalize_pdf(
+        self,
+        source: Union[BinaryIO, Path],
+        output: Union[BinaryIO, Path],
+        options: OutputOptions,
+    ):
+        """Apply encryption and save options in a single open and save.
 
-    def encrypt_pdf(self, pdf_bytes: bytes, password: str) -> bytes:
-        """Encrypt PDF with password."""
+        Metadata is written with the pages, so this pass is only needed for
+        encryption, optimization or linearization; callers skip it
+        otherwise. Optimizing packs objects into compressed object streams
+        and compresses any uncompressed stream; linearizing puts the first
+        page and the objects it needs at the start of the file, for viewers
+        that fetch byte ranges. Image streams are copied unchanged.
+        """
         try:
             import pikepdf
 
-            with pikepdf.open(io.BytesIO(pdf_bytes)) as pdf:
-                output = io.BytesIO()
-                pdf.save(
-                    output,
-                    encryption=pikepdf.Encryption(
-                        owner=password,
-                        user=password,
-                        R=4
-                    )
+            start = time.perf_counter()
+            save_options = {}
+            if options.optimize:
+                save_options["compress_streams"] = True
+                save_options["object_stream_mode"] = pikepdf.ObjectStreamMode.generate
+            if options.linearize:
+                save_options["linearize"] = True
+            if options.password:
+                save_options["encryption"] = pikepdf.Encryption(
+                    owner=options.password, user=options.password, R=4
+                )
+            elif options.optimize:
+                # Not combinable with encryption, which encodes every stream
+                save_options["stream_decode_level"] = pikepdf.StreamDecodeLevel[
+                    self.optimize_decode_level
+                ]
+            with pikepdf.open(source) as pdf:
+                pdf.save(output, **save_options)
+
+            steps = [
+                step
+                for step, enabled in (
+                    ("optimized", options.optimize),
+                    ("linearized", options.linearize),
+                    ("encrypted", options.password),
                 )
-                output.seek(0)
-                return output.getvalue()
+                if enabled
+            ]
+            logger.info(
+                f"Finalized PDF ({', '.join(steps)}): {self._pdf_size(source)} -> "
+                f"{self._pdf_size(output)} bytes in {time.perf_counter() - start:.3f}s"
+            )
         except Exception as e:
-            logger.error(f"Error encrypting PDF: {e}")
+            logger.error(f"Error finalizing PDF: {e}")
             raise
 
+    @staticmethod
+    def _pdf_size(target: Union[BinaryIO, Path]) -> int:
+        if isinstance(target, (str, Path)):
+            return os.path.getsize(target)
+        return target.getbuffer().nbytes
+
+    def _finalize_in_memory(self, stream: io.BytesIO, options: OutputOptions) -> bytes:
+        """Finalize a PDF written to memory, returning its bytes."""
+        if not options.needed:
+            return stream.getvalue()
+        stream.seek(0)
+        output = io.BytesIO()
+        self.finalize_pdf(stream, output, options)
+        return output.getvalue()
+
     def save_pdf(self, pdf_bytes: bytes, filename: str) -> Path:
         """Save PDF to output directory."""
         try:
@@ -0,0 +1,78 @@
+import asyncio
+import functools
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+
+class ConversionQueueFull(RuntimeError):
+    """More conversions are running and waiting than the queue allows."""
+
+
+class ConversionExecutor:
+    """Bounded thread pool that runs conversions off the event loop.
+
+    At most max_workers conversions run at once and up to queue_depth more
+    wait for a worker; submissions beyond that are rejected with
+    ConversionQueueFull rather than piling up behind a slow batch. A slot
+    is freed when its conversion finishes, even if the request awaiting it
+    was cancelled.
+    """
+
+    def __init__(self, max_workers: int, queue_depth: int):
+        if max_workers < 1:
+            raise ValueError("At least one conversion worker is needed")
+        if queue_depth < 0:
+            raise ValueError("Conversion queue depth must not be negative")
+        self.max_workers = max_workers
+        self.queue_depth = queue_depth
+        self._executor = ThreadPoolExecutor(max_workers, thread_name_prefix="convert")
+        self._lock = threading.Lock()
+        # Conversions submitted and not yet finished, running or queued
+        self._pending = 0
+        self._stats = {"completed": 0, "failed": 0, "rejected": 0}
+
+    @classmethod
+    def from_settings(cls, settings) -> "ConversionExecutor":
+        return cls(settings.CONVERSION_WORKERS, settings.CONVERSION_QUEUE_DEPTH)
+
+    async def run(self, fn, *args, **kwargs):
+        """Run fn(*args, **kwargs) on a worker thread and return its result."""
+        with self._lock:
+            if self._pending >= self.max_workers + self.queue_depth:
+                self._stats["rejected"] += 1
+                raise ConversionQueueFull(
+                    f"Server busy: {self._pending} conversions running or queued, "
+                    f"try again shortly"
+                )
+            self._pending += 1
+
+        try:
+            future = self._executor.submit(functools.partial(fn, *args, **kwargs))
+        except RuntimeError:
+            # Shut down
+            with self._lock:
+                self._pending -= 1
+            raise
+        future.add_done_callback(self._finished)
+        return await asyncio.wrap_future(future)
+
+    def _finished(self, future: Future):
+        with self._lock:
+            self._pending -= 1
+            failed = future.cancelled() or future.exception() is not None
+            self._stats["failed" if failed else "completed"] += 1
+
+    def shutdown(self):
+        """Stop the workers, dropping conversions still queued."""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> dict:
+        """Running and queued conversions and completion counters."""
+        with self._lock:
+            return dict(
+                self._stats,
+                running=min(self._pending, self.max_workers),
+                queued=max(0, self._pending - self.max_workers),
+                max_workers=self.max_workers,
+                queue_depth=self.queue_depth,
+            )
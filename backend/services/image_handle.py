@@ -0,0 +1,266 @@
+import hashlib
+import io
+import os
+import tempfile
+from typing import BinaryIO, Iterator, Union
+from PIL import Image
+
+# Formats whose frames are pages. Other multi-frame files, such as MPO
+# JPEGs from phone cameras carrying a preview or depth map as a second
+# image, are read as their first frame.
+MULTI_PAGE_FORMATS = {"TIFF", "PNG"}
+
+
+def _pixel_bytes(img: Image.Image) -> int:
+    return img.width * img.height * len(img.getbands())
+
+
+class ImageHandle:
+    """An uploaded image parsed at most once per request.
+
+    The header is parsed on first access to ``image`` and the pixels are
+    decoded on first call to ``decode()``. The validation result is cached
+    so the route and the converter share it. Callers must not modify the
+    decoded image in place.
+
+    The source is either the image bytes or a seekable binary file, such
+    as a spooled upload, so large batches need not be held in memory.
+
+    Multi-page images (multi-page TIFF, animated PNG) are split into one
+    handle per frame by ``frames()``.
+    """
+
+    def __init__(self, source: Union[bytes, BinaryIO], filename: str = ""):
+        if isinstance(source, (bytes, bytearray)):
+            self._data = bytes(source)
+            self._file = None
+        else:
+            self._data = None
+            self._file = source
+        self.filename = filename
+        self.validation = None
+        # Rotate/crop ops applied when the image is converted
+        self.ops = []
+        self.frame = 0
+        self.is_frame = False
+        self._parent = None
+        self._shared = False
+        # Temporary copy of a multi-frame image's bytes that frames sent to
+        # worker processes open (on the image), and its path (on the frames)
+        self._spill_path = None
+        self._path = None
+        self._digest = None
+        self._pixel_bytes = None
+        self._image = None
+        self._decoded = False
+
+    def __getstate__(self):
+        # Worker processes get the raw bytes, or the path of their copy on
+        # disk, and parse them on their side
+        state = self.__dict__.copy()
+        state["_data"] = None if self._path is not None else self.data
+        state["_file"] = None
+        state["_spill_path"] = None
+        state["_parent"] = None
+        state["_shared"] = False
+        state["_image"] = None
+        state["_decoded"] = False
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if self._path is not None:
+            self._file = open(self._path, "rb")
+
+    @property
+    def label(self) -> str:
+        """Name for messages: the filename, plus the frame index for frames."""
+        if not self.is_frame:
+            return self.filename
+        return f"{self.filename} (frame {self.frame})"
+
+    @property
+    def data(self) -> bytes:
+        """The encoded image bytes, read from the file on every access."""
+        if self._shared:
+            return self._parent.data
+        if self._data is not None:
+            return self._data
+        self._file.seek(0)
+        return self._file.read()
+
+    def head(self, nbytes: int) -> bytes:
+        """The first nbytes of the encoded image, without reading the rest."""
+        if self._shared:
+            return self._parent.head(nbytes)
+        if self._data is not None:
+            return self._data[:nbytes]
+        position = self._file.tell()
+        self._file.seek(0)
+        try:
+            return self._file.read(nbytes)
+        finally:
+            self._file.seek(position)
+
+    @property
+    def nbytes(self) -> int:
+        """Size of the encoded image in bytes."""
+        if self._shared:
+            return self._parent.nbytes
+        if self._data is not None:
+            return len(self._data)
+        return self._file.seek(0, os.SEEK_END)
+
+    @property
+    def digest(self) -> str:
+        """SHA-256 of the encoded image bytes, computed once.
+
+        Frame handles use the image digest with the frame index appended.
+        """
+        if self._digest is None:
+            if self._parent is not None:
+                self._digest = f"{self._parent.digest}:{self.frame}"
+            elif self._data is not None:
+                self._digest = hashlib.sha256(self._data).hexdigest()
+            else:
+                sha = hashlib.sha256()
+                self._file.seek(0)
+                for chunk in iter(lambda: self._file.read(1024 * 1024), b""):
+                    sha.update(chunk)
+                self._digest = sha.hexdigest()
+        return self._digest
+
+    @property
+    def image(self) -> Image.Image:
+        """PIL image with only the header parsed, at this handle's frame."""
+        if self._image is None:
+            if self._shared:
+                img = self._parent.image
+            elif self._data is not None:
+                img = Image.open(io.BytesIO(self._data))
+            else:
+                self._file.seek(0)
+                img = Image.open(self._file)
+            if self.is_frame:
+                img.seek(self.frame)
+            self._image = img
+        return self._image
+
+    @property
+    def format(self) -> str:
+        return self.image.format
+
+    @property
+    def mode(self) -> str:
+        return self.image.mode
+
+    @property
+    def size(self) -> tuple[int, int]:
+        return self.image.size
+
+    @property
+    def n_pages(self) -> int:
+        """Number of pages: the frame count of multi-page formats, else 1."""
+        if self.is_frame or self.format not in MULTI_PAGE_FORMATS:
+            return 1
+        return getattr(self.image, "n_frames", 1)
+
+    @property
+    def pixel_bytes(self) -> int:
+        """Decoded size estimate from the header: width x height x bands."""
+        if self._pixel_bytes is None:
+            self._pixel_bytes = _pixel_bytes(self.image)
+        return self._pixel_bytes
+
+    def frames(self, shared: bool = False, spill: bool = False) -> Iterator["ImageHandle"]:
+        """Yield one handle per frame, or just this handle for single-page images.
+
+        Frames are found by seeking the parsed image one frame at a time, so
+        only headers are read ahead. Shared frame handles seek this handle's
+        image instead of parsing their own, so they must be processed one at
+        a time and in order. Unshared frame handles can be processed
+        concurrently; they share one copy of the encoded bytes. With spill,
+        that copy is also written to a temporary file, which unshared frames
+        pickled for worker processes open instead of each carrying all of
+        the bytes; discard_spill() deletes it once the frames are done.
+
+        Raises ValueError naming the frame index if a frame header is corrupt.
+        """
+        if self.format not in MULTI_PAGE_FORMATS or not self._seek(1):
+            yield self
+            return
+
+        data = None if shared else self.data
+        path = self._spill(data) if spill and not shared else None
+        frame = 0
+        # Back to the first frame after the probe above
+        while self._seek(frame):
+            handle = ImageHandle(data or b"", self.filename)
+            handle.frame = frame
+            handle.is_frame = True
+            handle._parent = self
+            handle._shared = shared
+            handle._path = path
+            handle.ops = self.ops
+            # The parsed image is at this frame, so its header is current
+            handle._pixel_bytes = _pixel_bytes(self.image)
+            yield handle
+            frame += 1
+        self.release()
+
+    def _spill(self, data: bytes) -> str:
+        """Write the encoded bytes to a temporary file once, returning its path."""
+        if self._spill_path is None:
+            fd, self._spill_path = tempfile.mkstemp(suffix=os.path.splitext(self.filename)[1])
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+        return self._spill_path
+
+    def discard_spill(self):
+        """Delete the temporary file written for frames by frames(spill=True)."""
+        if self._spill_path is not None:
+            try:
+                os.remove(self._spill_path)
+            except OSError:
+                pass
+            self._spill_path = None
+
+    def _seek(self, frame: int) -> bool:
+        """Seek the parsed image to frame; False if there is no such frame."""
+        try:
+            self.image.seek(frame)
+        except EOFError:
+            return False
+        except Exception as e:
+            raise ValueError(f"{self.filename} (frame {frame}): {e}") from e
+        return True
+
+    def decode(self, draft_size: tuple[int, int] = None) -> Image.Image:
+        """Decode the pixel data once and return the loaded image.
+
+        If draft_size is given and the pixels are not decoded yet, formats
+        that support it (JPEG) are decoded at the smallest DCT scale that is
+        still at least draft_size.
+        """
+        img = self.image
+        if not self._decoded:
+            if draft_size is not None:
+                img.draft(img.mode, draft_size)
+            img.load()
+            self._decoded = True
+        return img
+
+    def release(self):
+        """Drop the parsed image so its pixel memory can be reclaimed.
+
+        The image is not closed, since that would close a file source too.
+        """
+        self._image = None
+        self._decoded = False
+
+
+def as_handle(image, filename: str = None) -> ImageHandle:
+    """Wrap raw bytes or a file in an ImageHandle, passing handles through."""
+    if isinstance(image, ImageHandle):
+        return image
+    return ImageHandle(image, filename or "")
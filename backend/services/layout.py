@@ -0,0 +1,155 @@
+import re
+from typing import Optional
+
+import img2pdf
+
+# Points per unit of length
+UNITS = {
+    "pt": 1.0,
+    "mm": 72 / 25.4,
+    "cm": 72 / 2.54,
+    "in": 72.0,
+}
+
+# Lengths without a unit are millimetres
+DEFAULT_UNIT = "mm"
+
+# Named page sizes in millimetres, portrait
+PAGE_SIZES = {
+    "a3": (297, 420),
+    "a4": (210, 297),
+    "a5": (148, 210),
+    "letter": (215.9, 279.4),
+    "legal": (215.9, 355.6),
+}
+
+# How images are scaled into the area inside the margins:
+#   into     as large as possible while fitting entirely
+#   fill     as small as possible while covering it entirely
+#   exact    stretched to it, ignoring the aspect ratio
+#   shrink   like into, but only images larger than it are scaled
+#   enlarge  like into, but only images smaller than it are scaled
+# Images that are not scaled keep their physical size from their DPI.
+FIT_MODES = tuple(img2pdf.FitMode.__members__)
+
+_NUMBER = r"(\d+(?:\.\d*)?|\.\d+)"
+_LENGTH = re.compile(rf"^{_NUMBER}\s*([a-z]*)$")
+_PAGE_SIZE = re.compile(rf"^{_NUMBER}\s*x\s*{_NUMBER}\s*([a-z]*)$")
+
+
+def _points(value: str, unit: str, text: str) -> float:
+    unit = unit or DEFAULT_UNIT
+    if unit not in UNITS:
+        raise ValueError(f"Unknown unit in {text} (choose from {', '.join(UNITS)})")
+    return float(value) * UNITS[unit]
+
+
+def parse_length(text: str) -> float:
+    """Parse a length such as "10mm", "0.5in" or "12pt" into points."""
+    match = _LENGTH.match(str(text).strip().lower())
+    if match is None:
+        raise ValueError(f"Invalid length: {text} (a number with unit {', '.join(UNITS)})")
+    return _points(match.group(1), match.group(2), text)
+
+
+def parse_page_size(text: str) -> tuple[float, float]:
+    """Parse a page size name or "WIDTHxHEIGHT[unit]" into points."""
+    name = text.strip().lower()
+    if name in PAGE_SIZES:
+        return tuple(length * UNITS["mm"] for length in PAGE_SIZES[name])
+
+    match = _PAGE_SIZE.match(name)
+    if match is None:
+        raise ValueError(
+            f"Unknown page size: {text} (choose from {', '.join(PAGE_SIZES)} "
+            f"or give WIDTHxHEIGHT with a unit, e.g. 210x297mm)"
+        )
+    width, height, unit = match.groups()
+    size = _points(width, unit, text), _points(height, unit, text)
+    if not all(size):
+        raise ValueError(f"Page size must not be empty: {text}")
+    return size
+
+
+class PageLayout:
+    """Physical page geometry: page size, margins, fit mode and a DPI cap.
+
+    Callable as an img2pdf layout function, so the PDF writer places each
+    image on the page geometrically. Pixels are only resampled by
+    max_pixels(), for images that would print above max_dpi.
+    """
+
+    def __init__(
+        self,
+        page_size: tuple[float, float],
+        margin: float = 0.0,
+        fit: str = "into",
+        max_dpi: int = 0,
+    ):
+        if fit not in FIT_MODES:
+            raise ValueError(f"Unknown fit mode: {fit} (choose from {', '.join(FIT_MODES)})")
+        if max_dpi < 0:
+            raise ValueError("max_dpi must not be negative")
+        if 2 * margin >= min(page_size):
+            raise ValueError("Margins leave no room on the page")
+        self.page_size = page_size
+        self.margin = margin
+        self.fit = fit
+        self.max_dpi = max_dpi
+        self._layout_fun = None
+
+    @classmethod
+    def parse(
+        cls, page_size: str, margin: str = "0", fit: str = "into", max_dpi: int = 0
+    ) -> "PageLayout":
+        """Build a layout from request or settings strings."""
+        return cls(parse_page_size(page_size), parse_length(margin), fit.lower(), max_dpi)
+
+    def __getstate__(self):
+        # The img2pdf layout function is a closure; workers rebuild it
+        state = self.__dict__.copy()
+        state["_layout_fun"] = None
+        return state
+
+    def __repr__(self):
+        width, height = self.page_size
+        return (
+            f"PageLayout({width:.2f}x{height:.2f}pt, margin={self.margin:.2f}pt, "
+            f"fit={self.fit}, max_dpi={self.max_dpi})"
+        )
+
+    def __call__(self, width: int, height: int, dpi: tuple[float, float]):
+        """Page and image size in points for an image of width x height pixels."""
+        if self._layout_fun is None:
+            self._layout_fun = img2pdf.get_layout_fun(
+                pagesize=self.page_size,
+                border=(self.margin, self.margin),
+                fit=img2pdf.FitMode[self.fit],
+            )
+        return self._layout_fun(width, height, dpi)
+
+    def max_pixels(
+        self, size: tuple[int, int], dpi: tuple[float, float]
+    ) -> tuple[int, int]:
+        """Pixel size at which an image prints at no more than max_dpi.
+
+        Images already at or below the cap, and every image when there is
+        no cap, keep their size.
+        """
+        if not self.max_dpi:
+            return size
+        _, _, image_width, image_height = self(size[0], size[1], dpi)
+        limit = (image_width / 72 * self.max_dpi, image_height / 72 * self.max_dpi)
+        if size[0] <= limit[0] and size[1] <= limit[1]:
+            return size
+        scale = min(limit[0] / size[0], limit[1] / size[1])
+        return max(1, round(size[0] * scale)), max(1, round(size[1] * scale))
+
+
+def page_layout(
+    page_size: Optional[str], margin: str = "0", fit: str = "into", max_dpi: int = 0
+) -> Optional[PageLayout]:
+    """A page layout, or None when no page size is given."""
+    if not page_size:
+        return None
+    return PageLayout.parse(page_size, margin or "0", fit or "into", max_dpi or 0)
@@ -0,0 +1,510 @@
+import zlib
+from datetime import datetime, timezone
+from typing import BinaryIO, Callable
+from xml.sax.saxutils import escape
+
+import img2pdf
+from img2pdf import Colorspace, ImageFormat
+from PIL import TiffImagePlugin
+
+from services.color import profile_matches
+
+# JPEG end-of-image marker, and bytes some encoders pad the file with after it
+JPEG_EOI = b"\xff\xd9"
+JPEG_PADDING = b"\x00\xff"
+# Bytes at the end of a JPEG searched for the end-of-image marker
+JPEG_TAIL = 4096
+
+
+class Ref:
+    """Reference to an indirect PDF object."""
+
+    def __init__(self, number: int):
+        self.number = number
+
+
+class PageImage:
+    """Encoded image stream for one PDF page.
+
+    Fields follow the tuples returned by ``img2pdf.read_images``, so any
+    image img2pdf can embed (JPEG as-is, PNG IDAT data, CCITT, ...) can be
+    written without decoding it again.
+    """
+
+    def __init__(
+        self,
+        color,
+        dpi,
+        format,
+        data,
+        smask,
+        width,
+        height,
+        palette,
+        inverted,
+        depth,
+        rotation,
+        iccp,
+    ):
+        self.color = color
+        self.dpi = dpi
+        self.format = format
+        self.data = data
+        self.smask = smask
+        self.width = width
+        self.height = height
+        self.palette = palette
+        self.inverted = inverted
+        self.depth = depth
+        self.rotation = rotation
+        self.iccp = iccp
+        # Embedded from the source file as-is, without decoding it
+        self.passthrough = False
+        # Part of the image shown on the page, as a (left, top, right,
+        # bottom) pixel box; None shows all of it
+        self.crop = None
+        # DCT color transform for JPEG data whose three components are not
+        # YCbCr (0); None leaves the decoder default
+        self.color_transform = None
+
+    @property
+    def filter(self) -> str:
+        """Name of the PDF filter the page stream is stored with."""
+        if self.format == ImageFormat.JPEG:
+            return "DCTDecode"
+        if self.format == ImageFormat.CCITTGroup4:
+            return "CCITTFaxDecode"
+        return "FlateDecode"
+
+    @staticmethod
+    def _metadata(img, format, image_data: bytes):
+        """Colorspace, DPI, size, rotation and ICC profile read by img2pdf."""
+        return img2pdf.get_imgmetadata(
+            img, format, img2pdf.default_dpi, None, image_data, img2pdf.Rotation.none
+        )
+
+    @classmethod
+    def from_bytes(cls, image_data: bytes) -> "PageImage":
+        """Read the page stream of the first frame of an encoded image."""
+        (entry,) = img2pdf.read_images(
+            image_data, None, first_frame_only=True, rot=img2pdf.Rotation.none
+        )
+        return cls(*entry)
+
+    @classmethod
+    def from_jpeg(cls, img, image_data: bytes) -> "PageImage":
+        """Page stream embedding a JPEG as-is, using its already parsed header.
+
+        Of an MPO file (a JPEG followed by further images, such as a phone
+        camera's preview or depth map) only the first image is embedded.
+        Raises ValueError for data that is cut short, which needs decoding.
+        """
+        if img.format == "MPO":
+            size = img.mpinfo[0xB002][0]["Size"]
+            if size > len(image_data):
+                raise ValueError(f"MPO first image of {size} bytes exceeds the file")
+            image_data = image_data[:size]
+        # A truncated file would embed a broken DCT stream
+        if not image_data[-JPEG_TAIL:].rstrip(JPEG_PADDING).endswith(JPEG_EOI):
+            raise ValueError("JPEG data does not end with an end-of-image marker")
+        color, dpi, width, height, rotation, iccp = cls._metadata(img, ImageFormat.JPEG, image_data)
+        return cls(
+            color, dpi, ImageFormat.JPEG, image_data, None, width, height, [], False, 8, rotation, iccp
+        )
+
+    @classmethod
+    def from_png(cls, img, image_data: bytes) -> "PageImage":
+        """Page stream copying a PNG's IDAT data, decoded by Flate with PNG predictors."""
+        color, dpi, width, height, rotation, iccp = cls._metadata(img, ImageFormat.PNG, image_data)
+        idat, palette = img2pdf.parse_png(image_data)
+        # Bit depth from the IHDR chunk, which always comes first
+        depth = image_data[24]
+        return cls(
+            color, dpi, ImageFormat.PNG, idat, None, width, height, palette, False, depth, rotation, iccp
+        )
+
+    @classmethod
+    def from_ccitt_tiff(cls, img, image_data: bytes) -> "PageImage":
+        """Page stream copying the Group 4 strip of a single-strip fax TIFF."""
+        color, dpi, width, height, rotation, iccp = cls._metadata(img, ImageFormat.TIFF, image_data)
+        offset, length = img2pdf.ccitt_payload_location_from_pil(img)
+        data = image_data[offset:offset + length]
+        if img.tag_v2.get(TiffImagePlugin.FILLORDER) == 2:
+            # Least significant bit first: PDF wants the most significant
+            data = data.translate(bytes(img2pdf.TIFFBitRevTable))
+        inverted = img.tag_v2[TiffImagePlugin.PHOTOMETRIC_INTERPRETATION] == 0
+        return cls(
+            color, dpi, ImageFormat.CCITTGroup4, data, None, width, height, [], inverted, 1, rotation, iccp
+        )
+
+    @classmethod
+    def from_tiff_jpeg(cls, img, image_data: bytes) -> "PageImage":
+        """Page stream copying the JPEG strip of a single-strip JPEG-compressed TIFF.
+
+        TIFF keeps the quantization and Huffman tables shared by all strips
+        in the JPEGTables tag; they are merged back in front of the strip to
+        make a complete JPEG stream.
+        """
+        color, dpi, width, height, rotation, iccp = cls._metadata(img, ImageFormat.TIFF, image_data)
+        (offset,) = img.tag_v2[TiffImagePlugin.STRIPOFFSETS]
+        (length,) = img.tag_v2[TiffImagePlugin.STRIPBYTECOUNTS]
+        data = image_data[offset:offset + length]
+        tables = img.tag_v2.get(TiffImagePlugin.JPEGTABLES)
+        if tables:
+            # Tables without their EOI, strip without its SOI
+            data = bytes(tables[:-2]) + data[2:]
+        page = cls(
+            color, dpi, ImageFormat.JPEG, data, None, width, height, [], False, 8, rotation, iccp
+        )
+        if img.tag_v2[TiffImagePlugin.PHOTOMETRIC_INTERPRETATION] == 2:
+            # RGB samples, stored without the YCbCr transform
+            page.color_transform = 0
+        return page
+
+    @classmethod
+    def from_bilevel(cls, img) -> "PageImage":
+        """Encode a 1-bit image as a CCITT Group 4 page stream."""
+        data = img2pdf.transcode_monochrome(img)
+        dpi = (img2pdf.default_dpi, img2pdf.default_dpi)
+        return cls(
+            Colorspace["1"], dpi, ImageFormat.CCITTGroup4, data, None, img.width, img.height,
+            [], False, 1, 0, None
+        )
+
+    @classmethod
+    def from_pixels(cls, img, compress_level: int = 6) -> "PageImage":
+        """Flate-compress decoded pixels directly into a page stream.
+
+        Palette images are packed to 1, 2 or 4 bits per pixel when their
+        palette is small enough. The image's ICC profile is kept when it
+        describes the image's colorspace.
+        """
+        color = Colorspace[img.mode]
+        depth = 1 if img.mode == "1" else 8
+        palette = []
+        raw_mode = img.mode
+        if img.mode == "P":
+            palette = img.getpalette() or []
+            # Every index in use needs a palette entry
+            colors = max(len(palette) // 3, img.getextrema()[1] + 1)
+            palette += [0] * (colors * 3 - len(palette))
+            depth = next(bits for bits in (1, 2, 4, 8) if colors <= 1 << bits)
+            if depth < 8:
+                raw_mode = f"P;{depth}"
+        iccp = img.info.get("icc_profile")
+        if iccp and not profile_matches(iccp, img.mode):
+            iccp = None
+        dpi = (img2pdf.default_dpi, img2pdf.default_dpi)
+        data = zlib.compress(img.tobytes("raw", raw_mode), compress_level)
+        return cls(
+            color, dpi, ImageFormat.other, data, None, img.width, img.height,
+            palette, False, depth, 0, iccp or None
+        )
+
+
+def _serialize(value) -> bytes:
+    """Serialize a Python value as PDF syntax.
+
+    Strings are names and must start with "/"; bytes become hex strings.
+    """
+    if isinstance(value, bool):
+        return b"true" if value else b"false"
+    if isinstance(value, int):
+        return str(value).encode()
+    if isinstance(value, float):
+        return (b"%.4f" % value).rstrip(b"0").rstrip(b".")
+    if isinstance(value, str):
+        return value.encode()
+    if isinstance(value, bytes):
+        return b"<" + value.hex().encode() + b">"
+    if isinstance(value, Ref):
+        return b"%d 0 R" % value.number
+    if isinstance(value, (list, tuple)):
+        return b"[" + b" ".join(_serialize(item) for item in value) + b"]"
+    if isinstance(value, dict):
+        items = b" ".join(
+            key.encode() + b" " + _serialize(item) for key, item in value.items()
+        )
+        return b"<< " + items + b" >>"
+    raise TypeError(f"Cannot serialize {type(value).__name__} as PDF")
+
+
+def text_string(text: str) -> bytes:
+    """Encode text for a PDF text string (UTF-16BE with BOM)."""
+    return b"\xfe\xff" + text.encode("utf-16-be")
+
+
+def xmp_packet(info: dict, created: datetime) -> bytes:
+    """XMP metadata matching the info dictionary's Title and Author."""
+    properties = []
+    if info.get("Title"):
+        properties.append(
+            "<dc:title><rdf:Alt><rdf:li xml:lang=\"x-default\">"
+            f"{escape(info['Title'])}</rdf:li></rdf:Alt></dc:title>"
+        )
+    if info.get("Author"):
+        properties.append(
+            f"<dc:creator><rdf:Seq><rdf:li>{escape(info['Author'])}</rdf:li></rdf:Seq></dc:creator>"
+        )
+    properties.append(f"<xmp:CreateDate>{created.strftime('%Y-%m-%dT%H:%M:%SZ')}</xmp:CreateDate>")
+    return (
+        '<?xpacket begin="\ufeff" id="W5M0MpCehiHzreSzNTczkc9d"?>\n'
+        '<x:xmpmeta xmlns:x="adobe:ns:meta/">\n'
+        '<rdf:RDF xmlns:rdf="http://www.w3.org/1999/02/22-rdf-syntax-ns#">\n'
+        '<rdf:Description rdf:about="" xmlns:dc="http://purl.org/dc/elements/1.1/" '
+        'xmlns:xmp="http://ns.adobe.com/xap/1.0/">\n'
+        + "\n".join(properties)
+        + "\n</rdf:Description>\n</rdf:RDF>\n</x:xmpmeta>\n"
+        '<?xpacket end="w"?>'
+    ).encode("utf-8")
+
+
+class PDFStreamWriter:
+    """Write an image PDF page by page to a binary stream.
+
+    Each page's objects are written as soon as the page is added, so only
+    object offsets and page references are kept in memory. The page tree,
+    catalog, info dictionary, cross-reference table and trailer are
+    written by close().
+    """
+
+    CATALOG = 1
+    PAGES = 2
+
+    def __init__(self, stream: BinaryIO, layout_fun: Callable = None):
+        self.stream = stream
+        self.layout_fun = layout_fun or img2pdf.default_layout_fun
+        self.offsets = {}
+        self.page_refs = []
+        self._next_number = 3
+        self._position = 0
+        self._write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+
+    @property
+    def page_count(self) -> int:
+        return len(self.page_refs)
+
+    @property
+    def size(self) -> int:
+        """Bytes written so far."""
+        return self._position
+
+    def _write(self, data: bytes):
+        self.stream.write(data)
+        self._position += len(data)
+
+    def _allocate(self) -> int:
+        number = self._next_number
+        self._next_number += 1
+        return number
+
+    def _write_object(self, number: int, value):
+        self.offsets[number] = self._position
+        self._write(b"%d 0 obj\n" % number + _serialize(value) + b"\nendobj\n")
+
+    def _write_stream(self, number: int, attrs: dict, data: bytes):
+        self.offsets[number] = self._position
+        attrs = dict(attrs, **{"/Length": len(data)})
+        self._write(b"%d 0 obj\n" % number + _serialize(attrs) + b"\nstream\n")
+        self._write(data)
+        self._write(b"\nendstream\nendobj\n")
+
+    def _colorspace(self, page: PageImage):
+        """PDF colorspace for a page image, writing its ICC profile if any."""
+        if page.color in (Colorspace["1"], Colorspace.L, Colorspace.LA):
+            colorspace, components = "/DeviceGray", 1
+        elif page.color in (Colorspace.RGB, Colorspace.RGBA, Colorspace.P):
+            colorspace, components = "/DeviceRGB", 3
+        elif page.color in (Colorspace.CMYK, Colorspace["CMYK;I"]):
+            colorspace, components = "/DeviceCMYK", 4
+        else:
+            raise ValueError(f"Unsupported colorspace: {page.color.name}")
+
+        if page.iccp is not None:
+            number = self._allocate()
+            self._write_stream(
+                number, {"/N": components, "/Alternate": colorspace}, page.iccp
+            )
+            colorspace = ["/ICCBased", Ref(number)]
+        if page.color == Colorspace.P:
+            # Palette entries are in the base colorspace
+            return ["/Indexed", colorspace, len(page.palette) // 3 - 1, bytes(page.palette)]
+        return colorspace
+
+    def _image_attrs(self, page: PageImage) -> dict:
+        """Image XObject dictionary for a page image."""
+        attrs = {
+            "/Type": "/XObject",
+            "/Subtype": "/Image",
+            "/Width": page.width,
+            "/Height": page.height,
+            "/ColorSpace": self._colorspace(page),
+            "/BitsPerComponent": page.depth,
+        }
+
+        if page.format == ImageFormat.JPEG:
+            attrs["/Filter"] = "/DCTDecode"
+            if page.color_transform is not None:
+                attrs["/DecodeParms"] = {"/ColorTransform": page.color_transform}
+        elif page.format == ImageFormat.CCITTGroup4:
+            attrs["/Filter"] = ["/CCITTFaxDecode"]
+            attrs["/DecodeParms"] = [
+                {
+                    "/K": -1,
+                    "/BlackIs1": not page.inverted,
+                    "/Columns": page.width,
+                    "/Rows": page.height,
+                }
+            ]
+        else:
+            attrs["/Filter"] = "/FlateDecode"
+
+        if page.color == Colorspace["CMYK;I"]:
+            attrs["/Decode"] = [1, 0, 1, 0, 1, 0, 1, 0]
+
+        if page.format == ImageFormat.PNG:
+            colors = 1 if page.color in (
+                Colorspace.P, Colorspace["1"], Colorspace.L, Colorspace.LA
+            ) else 3
+            attrs["/DecodeParms"] = {
+                "/Predictor": 15,
+                "/Colors": colors,
+                "/Columns": page.width,
+                "/BitsPerComponent": page.depth,
+            }
+            if page.smask is not None:
+                number = self._allocate()
+                self._write_stream(
+                    number,
+                    {
+                        "/Type": "/XObject",
+                        "/Subtype": "/Image",
+                        "/Width": page.width,
+                        "/Height": page.height,
+                        "/ColorSpace": "/DeviceGray",
+                        "/BitsPerComponent": page.depth,
+                        "/Filter": "/FlateDecode",
+                        "/DecodeParms": {
+                            "/Predictor": 15,
+                            "/Colors": 1,
+                            "/Columns": page.width,
+                            "/BitsPerComponent": page.depth,
+                        },
+                    },
+                    page.smask,
+                )
+                attrs["/SMask"] = Ref(number)
+
+        return attrs
+
+    def add_page(self, page: PageImage):
+        """Write one page and its image stream.
+
+        Pages with a rotation are laid out as displayed, then written
+        unrotated with /Rotate, and cropped pages draw the whole image with
+        the page's /CropBox around the shown part, so the image stream is
+        never transformed.
+        """
+        if page.crop is None:
+            width, height = page.width, page.height
+        else:
+            left, top, right, bottom = page.crop
+            width, height = right - left, bottom - top
+
+        if page.rotation in (90, 270):
+            page_width, page_height, image_width, image_height = self.layout_fun(
+                height, width, page.dpi[::-1]
+            )
+            page_width, page_height = page_height, page_width
+            image_width, image_height = image_height, image_width
+        else:
+            page_width, page_height, image_width, image_height = self.layout_fun(
+                width, height, page.dpi
+            )
+        image_x = (page_width - image_width) / 2
+        image_y = (page_height - image_height) / 2
+        page_box = [0, 0, float(page_width), float(page_height)]
+
+        image_number = self._allocate()
+        self._write_stream(image_number, self._image_attrs(page), page.data)
+
+        clip = b""
+        media_box = page_box
+        if page.crop is not None:
+            # Place the whole image so the shown part lands on the image area
+            scale_x = image_width / width
+            scale_y = image_height / height
+            shown = (image_x, image_y, image_width, image_height)
+            image_x -= left * scale_x
+            image_y -= (page.height - bottom) * scale_y
+            image_width = page.width * scale_x
+            image_height = page.height * scale_y
+            media_box = [
+                min(0.0, image_x),
+                min(0.0, image_y),
+                max(float(page_width), image_x + image_width),
+                max(float(page_height), image_y + image_height),
+            ]
+            # Page margins would show the cropped-away parts
+            if shown != (0, 0, page_width, page_height):
+                clip = b"%.4f %.4f %.4f %.4f re W n\n" % shown
+
+        content_number = self._allocate()
+        content = b"q\n%s%.4f 0 0 %.4f %.4f %.4f cm\n/Im0 Do\nQ" % (
+            clip, image_width, image_height, image_x, image_y
+        )
+        self._write_stream(content_number, {}, content)
+
+        page_number = self._allocate()
+        page_dict = {
+            "/Type": "/Page",
+            "/Parent": Ref(self.PAGES),
+            "/MediaBox": media_box,
+            "/Resources": {"/XObject": {"/Im0": Ref(image_number)}},
+            "/Contents": Ref(content_number),
+        }
+        if page.crop is not None:
+            page_dict["/CropBox"] = page_box
+        if page.rotation:
+            page_dict["/Rotate"] = page.rotation
+        self._write_object(page_number, page_dict)
+        self.page_refs.append(Ref(page_number))
+
+    def close(self, info: dict = None):
+        """Write the page tree, catalog, metadata, xref table and trailer.
+
+        info is written both as the info dictionary and as XMP metadata, so
+        the document needs no second pass to add either.
+        """
+        if not self.page_refs:
+            raise ValueError("Unable to write a PDF without pages")
+        info = info or {}
+        created = datetime.now(timezone.utc)
+
+        self._write_object(
+            self.PAGES,
+            {"/Type": "/Pages", "/Kids": self.page_refs, "/Count": len(self.page_refs)},
+        )
+        metadata_number = self._allocate()
+        self._write_stream(
+            metadata_number, {"/Type": "/Metadata", "/Subtype": "/XML"}, xmp_packet(info, created)
+        )
+        self._write_object(
+            self.CATALOG,
+            {"/Type": "/Catalog", "/Pages": Ref(self.PAGES), "/Metadata": Ref(metadata_number)},
+        )
+
+        info_dict = {"/CreationDate": created.strftime("D:%Y%m%d%H%M%SZ").encode()}
+        for key, value in info.items():
+            info_dict[f"/{key}"] = text_string(value)
+        info_number = self._allocate()
+        self._write_object(info_number, info_dict)
+
+        xref_offset = self._position
+        size = self._next_number
+        self._write(b"xref\n0 %d\n0000000000 65535 f \n" % size)
+        for number in range(1, size):
+            self._write(b"%010d 00000 n \n" % self.offsets[number])
+        trailer = {"/Size": size, "/Root": Ref(self.CATALOG), "/Info": Ref(info_number)}
+        self._write(b"trailer\n" + _serialize(trailer) + b"\nstartxref\n")
+        self._write(b"%d\n%%%%EOF\n" % xref_offset)
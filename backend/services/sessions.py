@@ -0,0 +1,103 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Optional
+
+from services.image_handle import ImageHandle
+
+
+class ImageSession:
+    """An uploaded image and the transform ops recorded against it.
+
+    Ops are tuples such as ("rotate", 90) or ("crop", left, top, right,
+    bottom), applied in order when the image is converted.
+    """
+
+    def __init__(self, image_id: str, data: bytes, filename: str):
+        self.image_id = image_id
+        self.data = data
+        self.filename = filename
+        self.ops = []
+        self.touched_at = time.time()
+
+    def record(self, op: tuple):
+        """Record a transform op; nothing is decoded until conversion."""
+        self.ops.append(op)
+
+    def handle(self) -> ImageHandle:
+        """A fresh handle on the image for one conversion, carrying the ops."""
+        handle = ImageHandle(self.data, self.filename)
+        handle.ops = list(self.ops)
+        return handle
+
+
+class ImageSessionStore:
+    """Uploaded images kept between requests, by image id.
+
+    Bounded in bytes, evicting the least recently used session first;
+    sessions not used for ttl_seconds expire.
+    """
+
+    def __init__(self, max_bytes: int, ttl_seconds: int):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._sessions = OrderedDict()
+        self._bytes = 0
+        self._stats = {"evictions": 0, "expirations": 0}
+
+    @classmethod
+    def from_settings(cls, settings) -> "ImageSessionStore":
+        return cls(settings.SESSION_STORE_BYTES, settings.SESSION_TTL_SECONDS)
+
+    def add(self, data: bytes, filename: str) -> ImageSession:
+        """Store an uploaded image under a new image id."""
+        if len(data) > self.max_bytes:
+            raise ValueError("Image is larger than the session store")
+
+        session = ImageSession(uuid.uuid4().hex, data, filename)
+        with self._lock:
+            self._expire()
+            self._sessions[session.image_id] = session
+            self._bytes += len(data)
+            while self._bytes > self.max_bytes:
+                _, evicted = self._sessions.popitem(last=False)
+                self._bytes -= len(evicted.data)
+                self._stats["evictions"] += 1
+        return session
+
+    def get(self, image_id: str) -> Optional[ImageSession]:
+        """Return the session for image_id, or None if unknown or expired."""
+        with self._lock:
+            self._expire()
+            session = self._sessions.get(image_id)
+            if session is not None:
+                session.touched_at = time.time()
+                self._sessions.move_to_end(image_id)
+            return session
+
+    def delete(self, image_id: str) -> bool:
+        """Remove a session; False if it did not exist."""
+        with self._lock:
+            session = self._sessions.pop(image_id, None)
+            if session is None:
+                return False
+            self._bytes -= len(session.data)
+            return True
+
+    def _expire(self):
+        # Least recently used first, so stop at the first live session
+        cutoff = time.time() - self.ttl_seconds
+        while self._sessions:
+            image_id, session = next(iter(self._sessions.items()))
+            if session.touched_at > cutoff:
+                break
+            del self._sessions[image_id]
+            self._bytes -= len(session.data)
+            self._stats["expirations"] += 1
+
+    def stats(self) -> dict:
+        """Session count, stored bytes and eviction counters."""
+        with self._lock:
+            return dict(self._stats, sessions=len(self._sessions), bytes=self._bytes)
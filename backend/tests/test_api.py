@@ -124,6 +124,98 @@ class TestMultipleConversion:
         data = response.json()
         assert data["success"] is True
 
+    def test_convert_multiple_streamed(self, multiple_image_files, monkeypatch):
+        """Test that large batches are streamed to disk."""
+        from config import settings
+
+        monkeypatch.setattr(settings, "STREAMING_PAGE_THRESHOLD", 2)
+        files = [
+            ("files", (name, obj, ctype))
+            for name, obj, ctype in multiple_image_files
+        ]
+        response = client.post("/convert", files=files, data={"encrypt": "true"})
+        assert response.status_code == 200
+        data = response.json()
+        assert data["success"] is True
+        assert Path(data["file_path"]).stat().st_size == data["file_size"]
+
+    @pytest.mark.parametrize(
+        "endpoint, field, data",
+        [
+            ("/convert-single", "file", {}),
+            ("/convert", "files", {"individual_files": "true"}),
+        ],
+    )
+    def test_multi_frame_image_streamed(self, endpoint, field, data, monkeypatch):
+        """Test that streaming counts the frames of multi-frame images as pages."""
+        import routes_enhanced
+        from config import settings
+
+        monkeypatch.setattr(settings, "STREAMING_PAGE_THRESHOLD", 3)
+        monkeypatch.setattr(routes_enhanced, "conversion_cache", None)
+        streamed = []
+        convert_multiple_to_file = routes_enhanced.converter.convert_multiple_to_file
+
+        def spy(*args, **kwargs):
+            streamed.append(args[1])
+            return convert_multiple_to_file(*args, **kwargs)
+
+        monkeypatch.setattr(routes_enhanced.converter, "convert_multiple_to_file", spy)
+        frames = [Image.new("RGB", (100, 100), color) for color in ("red", "green", "blue")]
+        img_bytes = io.BytesIO()
+        frames[0].save(img_bytes, format="TIFF", save_all=True, append_images=frames[1:])
+
+        response = client.post(
+            endpoint,
+            files={field: ("scan.tiff", img_bytes.getvalue(), "image/tiff")},
+            data=data,
+        )
+        result = response.json()
+        assert result["success"] is True
+        assert len(streamed) == 1
+        assert len(result["pages"]) == 3
+
+    def test_large_input_streamed(self, sample_image_file, monkeypatch):
+        """Test that a single image with a lot of encoded data is streamed."""
+        import routes_enhanced
+        from config import settings
+
+        monkeypatch.setattr(settings, "STREAMING_BYTES_THRESHOLD", 1)
+        monkeypatch.setattr(routes_enhanced, "conversion_cache", None)
+        streamed = []
+        convert_multiple_to_file = routes_enhanced.converter.convert_multiple_to_file
+
+        def spy(*args, **kwargs):
+            streamed.append(args[1])
+            return convert_multiple_to_file(*args, **kwargs)
+
+        monkeypatch.setattr(routes_enhanced.converter, "convert_multiple_to_file", spy)
+        response = client.post("/convert-single", files={"file": sample_image_file})
+        data = response.json()
+        assert data["success"] is True
+        assert streamed == [Path(data["file_path"])]
+        assert Path(data["file_path"]).stat().st_size == data["file_size"]
+
+    def test_individual_files_named(self, multiple_image_files):
+        """Test that individual PDFs get the custom name with each image's name appended."""
+        files = [
+            ("files", (name, obj, ctype))
+            for name, obj, ctype in multiple_image_files
+        ]
+        response = client.post(
+            "/convert",
+            files=files,
+            data={"individual_files": "true", "filename": "report", "title": "Scans"},
+        )
+        data = response.json()
+        assert data["success"] is True
+        assert [Path(path).name for path in data["file_paths"]] == [
+            "report_test0.pdf", "report_test1.pdf", "report_test2.pdf"
+        ]
+        assert [entry["file"] for entry in data["pages"]] == [
+            "report_test0.pdf", "report_test1.pdf", "report_test2.pdf"
+        ]
+
     def test_convert_multiple_no_files(self):
         """Test multiple conversion without files."""
         response = client.post("/convert")
@@ -139,6 +231,215 @@ class TestMultipleConversion:
         assert response.status_code != 200
 
 
+class TestConversionCache:
+    def test_repeated_conversion_served_from_cache(
+        self, sample_image_file, monkeypatch, tmp_path
+    ):
+        """Test that resubmitting the same image hits the cache."""
+        import routes_enhanced
+        from services.cache import ConversionCache
+
+        cache = ConversionCache(tmp_path, 1024 * 1024, 1024 * 1024, 60)
+        monkeypatch.setattr(routes_enhanced, "conversion_cache", cache)
+
+        filename, file_obj, content_type = sample_image_file
+        content = file_obj.getvalue()
+        for _ in range(2):
+            response = client.post(
+                "/convert-single",
+                files={"file": (filename, content, content_type)},
+            )
+            assert response.json()["success"] is True
+
+        stats = client.get("/cache/stats").json()["stats"]
+        assert stats["misses"] == 1
+        assert stats["hits"] == 1
+
+
+    def test_settings_change_misses_cache(self, sample_image_file, monkeypatch, tmp_path):
+        """Test that a changed server setting is not served an older cached PDF."""
+        import routes_enhanced
+        from services.cache import ConversionCache
+
+        cache = ConversionCache(tmp_path, 1024 * 1024, 1024 * 1024, 60)
+        monkeypatch.setattr(routes_enhanced, "conversion_cache", cache)
+
+        filename, file_obj, content_type = sample_image_file
+        content = file_obj.getvalue()
+        for color_output in ("preserve", "srgb", "preserve"):
+            monkeypatch.setattr(routes_enhanced.converter, "color_output", color_output)
+            response = client.post(
+                "/convert-single",
+                files={"file": (filename, content, content_type)},
+            )
+            assert response.json()["success"] is True
+
+        stats = cache.stats()
+        assert stats["misses"] == 2
+        assert stats["hits"] == 1
+
+
+class TestConversionExecutor:
+    @staticmethod
+    def _blocked(executor, release):
+        """Occupy an executor slot until release is set, from another thread."""
+        import asyncio
+        import threading
+
+        thread = threading.Thread(
+            target=lambda: asyncio.run(executor.run(release.wait, 10)), daemon=True
+        )
+        thread.start()
+        return thread
+
+    @staticmethod
+    def _wait_for(condition):
+        import time
+
+        deadline = time.monotonic() + 5
+        while not condition():
+            assert time.monotonic() < deadline
+            time.sleep(0.01)
+
+    def test_queue_bounds(self):
+        """Test that submissions beyond the workers and queue depth are rejected."""
+        import asyncio
+        import threading
+
+        from services.executor import ConversionExecutor, ConversionQueueFull
+
+        executor = ConversionExecutor(1, 1)
+        release = threading.Event()
+        threads = [self._blocked(executor, release) for _ in range(2)]
+        self._wait_for(lambda: executor.stats()["queued"] == 1)
+        assert executor.stats()["running"] == 1
+
+        with pytest.raises(ConversionQueueFull):
+            asyncio.run(executor.run(sum, [1, 2]))
+
+        release.set()
+        for thread in threads:
+            thread.join(5)
+        assert asyncio.run(executor.run(sum, [1, 2])) == 3
+        stats = executor.stats()
+        assert stats["completed"] == 3
+        assert stats["rejected"] == 1
+        assert stats["running"] == stats["queued"] == 0
+        executor.shutdown()
+
+    def test_failure_frees_slot(self):
+        """Test that a failing conversion raises to the caller and frees its slot."""
+        import asyncio
+
+        from services.executor import ConversionExecutor
+
+        executor = ConversionExecutor(1, 0)
+        with pytest.raises(ZeroDivisionError):
+            asyncio.run(executor.run(lambda: 1 / 0))
+        assert asyncio.run(executor.run(sum, [1])) == 1
+        assert executor.stats()["failed"] == 1
+        executor.shutdown()
+
+    def test_busy_returns_503(self, sample_image_file, monkeypatch):
+        """Test that conversions beyond the queue get 503 instead of waiting."""
+        import threading
+
+        import routes_enhanced
+        from services.executor import ConversionExecutor
+
+        executor = ConversionExecutor(1, 0)
+        monkeypatch.setattr(routes_enhanced, "conversions", executor)
+        release = threading.Event()
+        thread = self._blocked(executor, release)
+        self._wait_for(lambda: executor.stats()["running"] == 1)
+        try:
+            filename, file_obj, content_type = sample_image_file
+            response = client.post(
+                "/convert-single", files={"file": (filename, file_obj, content_type)}
+            )
+            assert response.status_code == 503
+        finally:
+            release.set()
+            thread.join(5)
+            executor.shutdown()
+
+    def test_health_responsive_during_conversion(self, sample_image_file, monkeypatch):
+        """Test that health checks are served while a conversion is running."""
+        import threading
+
+        import main
+        import routes_enhanced
+        from services.executor import ConversionExecutor
+
+        # A fresh executor, as the shared client's shutdown stops it
+        executor = ConversionExecutor(1, 0)
+        monkeypatch.setattr(routes_enhanced, "conversions", executor)
+        monkeypatch.setattr(main, "conversions", executor)
+        started = threading.Event()
+        release = threading.Event()
+        write_pdf = routes_enhanced._write_pdf
+
+        def slow_write_pdf(*args, **kwargs):
+            started.set()
+            release.wait(10)
+            return write_pdf(*args, **kwargs)
+
+        monkeypatch.setattr(routes_enhanced, "_write_pdf", slow_write_pdf)
+        filename, file_obj, content_type = sample_image_file
+        responses = []
+        # One client, so both requests share the app's event loop
+        with TestClient(app) as shared_client:
+            thread = threading.Thread(
+                target=lambda: responses.append(
+                    shared_client.post(
+                        "/convert-single", files={"file": (filename, file_obj, content_type)}
+                    )
+                )
+            )
+            thread.start()
+            try:
+                assert started.wait(5)
+                assert shared_client.get("/health").status_code == 200
+                # Answered while the conversion is still blocked
+                assert thread.is_alive()
+            finally:
+                release.set()
+                thread.join(10)
+        assert responses[0].json()["success"] is True
+
+
+class TestImageSessions:
+    def test_upload_transform_convert(self):
+        """Test uploading once, recording transforms and converting."""
+        img_bytes = io.BytesIO()
+        Image.new("RGB", (300, 200), "green").save(img_bytes, format="PNG")
+        response = client.post(
+            "/images", files={"file": ("a.png", img_bytes.getvalue(), "image/png")}
+        )
+        assert response.status_code == 200
+        image_id = response.json()["image_id"]
+
+        response = client.post(f"/images/{image_id}/rotate", data={"angle": 90})
+        assert response.json()["width"] == 200
+        response = client.post(f"/images/{image_id}/crop", data={"left": 50})
+        data = response.json()
+        assert (data["width"], data["height"]) == (150, 300)
+        assert data["ops"] == [["rotate", 90], ["crop", 50, 0, 0, 0]]
+
+        response = client.post("/images/convert", data={"image_ids": [image_id, image_id]})
+        assert response.status_code == 200
+        assert response.json()["success"] is True
+
+        assert client.delete(f"/images/{image_id}").status_code == 200
+        assert client.get(f"/images/{image_id}").status_code == 404
+
+    def test_unknown_image(self):
+        """Test that unknown image ids give 404."""
+        assert client.post("/images/missing/rotate", data={"angle": 90}).status_code == 404
+        response = client.post("/images/convert", data={"image_ids": ["missing"]})
+        assert response.status_code == 404
+
+
 class TestDownloadEndpoint:
     def test_download_nonexistent_file(self):
         """Test downloading non-existent file."""
@@ -161,6 +462,29 @@ class TestDownloadEndpoint:
         assert download_response.status_code == 200
         assert download_response.headers["content-type"] == "application/pdf"
 
+    def test_linearized_download_by_range(self, sample_image_file):
+        """Test that a linearized PDF can be fetched inline in byte ranges."""
+        import pikepdf
+
+        filename, file_obj, content_type = sample_image_file
+        create_response = client.post(
+            "/convert-single",
+            files={"file": (filename, file_obj, content_type)},
+            data={"linearize": "true"},
+        )
+        pdf_filename = create_response.json()["file_path"].split("/")[-1]
+
+        response = client.get(f"/download/{pdf_filename}", params={"inline": "true"})
+        assert response.headers["content-disposition"].startswith("inline")
+        assert response.headers["accept-ranges"] == "bytes"
+        with pikepdf.open(io.BytesIO(response.content)) as pdf:
+            assert pdf.is_linearized
+
+        response = client.get(f"/download/{pdf_filename}", headers={"Range": "bytes=0-1023"})
+        assert response.status_code == 206
+        assert len(response.content) == 1024
+        assert b"/Linearized" in response.content
+
 
 class TestErrorHandling:
     def test_corrupted_image(self):
@@ -171,6 +495,72 @@ class TestErrorHandling:
         )
         assert response.status_code == 400
 
+    def test_oversized_image_rejected(self):
+        """Test that images over the dimension limit get 413."""
+        img = Image.new("1", (30000, 2))
+        img_bytes = io.BytesIO()
+        img.save(img_bytes, format="PNG")
+        response = client.post(
+            "/convert-single",
+            files={"file": ("wide.png", img_bytes.getvalue(), "image/png")},
+        )
+        assert response.status_code == 413
+        assert "30000x2" in response.json()["detail"]
+
+    def test_unknown_resampling(self, sample_image_file):
+        """Test that an unknown resampling strategy is rejected."""
+        filename, file_obj, content_type = sample_image_file
+        response = client.post(
+            "/convert-single",
+            files={"file": (filename, file_obj, content_type)},
+            data={"resampling": "cubic"},
+        )
+        assert response.status_code == 400
+
+    def test_unknown_orientation(self, sample_image_file):
+        """Test that an unknown page orientation is rejected."""
+        filename, file_obj, content_type = sample_image_file
+        response = client.post(
+            "/convert-single",
+            files={"file": (filename, file_obj, content_type)},
+            data={"orientation": "diagonal"},
+        )
+        assert response.status_code == 400
+
+    def test_page_report(self, sample_image_file):
+        """Test that the response reports the path each page took."""
+        filename, file_obj, content_type = sample_image_file
+        response = client.post(
+            "/convert-single",
+            files={"file": (filename, file_obj, content_type)},
+        )
+        assert response.status_code == 200
+        assert response.json()["pages"] == [
+            {"page": 1, "path": "passthrough", "filter": "FlateDecode"}
+        ]
+
+    def test_page_layout(self, sample_image_file):
+        """Test that a page size lays the image out on that page."""
+        import pikepdf
+
+        filename, file_obj, content_type = sample_image_file
+        response = client.post(
+            "/convert-single",
+            files={"file": (filename, file_obj, content_type)},
+            data={"page_size": "letter", "margin": "0.5in", "fit": "into"},
+        )
+        assert response.status_code == 200
+        assert response.json()["success"] is True
+        with pikepdf.open(response.json()["file_path"]) as pdf:
+            assert [float(value) for value in pdf.pages[0].MediaBox] == [0, 0, 612, 792]
+
+        response = client.post(
+            "/convert-single",
+            files={"file": (filename, file_obj, content_type)},
+            data={"page_size": "a4", "margin": "lots"},
+        )
+        assert response.status_code == 400
+
     def test_invalid_file_extension(self):
         """Test invalid file extension."""
         response = client.post(
@@ -0,0 +1,164 @@
+import pytest
+import time
+from pathlib import Path
+import sys
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from services.cache import ConversionCache, PageCache
+from services.sessions import ImageSessionStore
+from services.pdf_writer import PageImage
+from services.image_handle import ImageHandle
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ConversionCache(
+        tmp_path / "cache", max_memory_bytes=100, max_disk_bytes=200, ttl_seconds=60
+    )
+
+
+@pytest.fixture
+def pdf_file(tmp_path):
+    """Create a fake finished PDF."""
+    def make(name, data):
+        path = tmp_path / name
+        path.write_bytes(data)
+        return path
+    return make
+
+
+class TestKeys:
+    def test_key_depends_on_order_and_options(self):
+        """Test that keys change with input order and options."""
+        a = ImageHandle(b"image a", "a.png")
+        b = ImageHandle(b"image b", "b.png")
+        key = ConversionCache.make_key([a, b], resize=True)
+        assert key == ConversionCache.make_key([a, b], resize=True)
+        assert key != ConversionCache.make_key([b, a], resize=True)
+        assert key != ConversionCache.make_key([a, b], resize=False)
+
+
+class TestLookup:
+    def test_miss_then_memory_hit(self, cache, pdf_file, tmp_path):
+        """Test that a stored PDF is served from memory."""
+        output = tmp_path / "out.pdf"
+        assert cache.lookup("k1", output) is None
+
+        cache.store("k1", pdf_file("a.pdf", b"%PDF-a"), b"%PDF-a")
+        assert cache.lookup("k1", output) == 6
+        assert output.read_bytes() == b"%PDF-a"
+
+        stats = cache.stats()
+        assert stats["misses"] == 1
+        assert stats["memory_hits"] == 1
+
+    def test_disk_hit_after_memory_eviction(self, cache, pdf_file, tmp_path):
+        """Test that entries evicted from memory are still served from disk."""
+        cache.store("k1", pdf_file("a.pdf", b"a" * 60), b"a" * 60)
+        cache.store("k2", pdf_file("b.pdf", b"b" * 60), b"b" * 60)
+
+        output = tmp_path / "out.pdf"
+        assert cache.lookup("k1", output) == 60
+        assert cache.stats()["disk_hits"] == 1
+
+    def test_disk_lru_eviction(self, cache, pdf_file, tmp_path):
+        """Test that the least recently used entry leaves the disk tier."""
+        output = tmp_path / "out.pdf"
+        cache.store("k1", pdf_file("a.pdf", b"a" * 90))
+        cache.store("k2", pdf_file("b.pdf", b"b" * 90))
+        cache.lookup("k1", output)
+        cache.store("k3", pdf_file("c.pdf", b"c" * 90))
+
+        assert cache.lookup("k2", output) is None
+        assert cache.lookup("k1", output) == 90
+        assert cache.lookup("k3", output) == 90
+
+    def test_ttl_expiry(self, cache, pdf_file, tmp_path):
+        """Test that expired entries are misses."""
+        cache.store("k1", pdf_file("a.pdf", b"%PDF-a"), b"%PDF-a")
+        cache.ttl_seconds = 0
+        time.sleep(0.01)
+        assert cache.lookup("k1", tmp_path / "out.pdf") is None
+        assert cache.stats()["disk_entries"] == 0
+
+    def test_disk_index_survives_restart(self, cache, pdf_file, tmp_path):
+        """Test that a new cache instance finds files from a previous one."""
+        cache.store("k1", pdf_file("a.pdf", b"%PDF-a"))
+        reopened = ConversionCache(cache.cache_dir, 100, 200, 60)
+        assert reopened.lookup("k1", tmp_path / "out.pdf") == 6
+
+
+class TestPageCache:
+    @staticmethod
+    def _page(size):
+        from PIL import Image
+        return PageImage.from_pixels(Image.frombytes("L", (size, 1), bytes(size)), 0)
+
+    def test_hit_records_time_saved(self):
+        """Test that hits add the original preprocessing time."""
+        cache = PageCache(max_bytes=1000)
+        page = self._page(10)
+        assert cache.get("k1") is None
+        cache.put("k1", page, 0.5)
+        assert cache.get("k1") is page
+        assert cache.get("k1") is page
+
+        stats = cache.stats()
+        assert stats["misses"] == 1
+        assert stats["hits"] == 2
+        assert stats["time_saved_seconds"] == 1.0
+
+    def test_lru_eviction_by_size(self):
+        """Test that the least recently used page is evicted first."""
+        page_size = PageCache._page_size(self._page(100))
+        cache = PageCache(max_bytes=page_size * 2)
+        cache.put("k1", self._page(100), 0.1)
+        cache.put("k2", self._page(100), 0.1)
+        cache.get("k1")
+        cache.put("k3", self._page(100), 0.1)
+
+        assert cache.get("k2") is None
+        assert cache.get("k1") is not None
+        assert cache.stats()["evictions"] == 1
+        assert cache.stats()["bytes"] <= page_size * 2
+
+    def test_key_includes_params(self):
+        """Test that page keys change with preprocessing parameters."""
+        key = PageCache.make_key("abc", resize=True)
+        assert key == PageCache.make_key("abc", resize=True)
+        assert key != PageCache.make_key("abc", resize=False)
+        assert key != PageCache.make_key("abd", resize=True)
+
+
+class TestImageSessions:
+    def test_ops_recorded_on_handles(self):
+        """Test that handles carry a copy of the session's ops."""
+        store = ImageSessionStore(max_bytes=100, ttl_seconds=60)
+        session = store.add(b"image", "a.png")
+        session.record(("rotate", 90))
+        handle = session.handle()
+        session.record(("crop", 1, 2, 3, 4))
+        assert handle.ops == [("rotate", 90)]
+        assert store.get(session.image_id) is session
+
+    def test_evicts_least_recently_used(self):
+        """Test that the store stays within its byte bound."""
+        store = ImageSessionStore(max_bytes=10, ttl_seconds=60)
+        a = store.add(b"aaaa", "a.png")
+        b = store.add(b"bbbb", "b.png")
+        store.get(a.image_id)
+        store.add(b"cccc", "c.png")
+        assert store.get(b.image_id) is None
+        assert store.get(a.image_id) is a
+        assert store.stats()["evictions"] == 1
+        with pytest.raises(ValueError):
+            store.add(b"x" * 11, "big.png")
+
+    def test_expired_sessions_dropped(self):
+        """Test that sessions unused for the TTL expire."""
+        store = ImageSessionStore(max_bytes=100, ttl_seconds=60)
+        session = store.add(b"image", "a.png")
+        session.touched_at -= 61
+        assert store.get(session.image_id) is None
+        assert store.stats() == {"evictions": 0, "expirations": 1, "sessions": 0, "bytes": 0}
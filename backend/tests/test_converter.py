@@ -7,6 +7,8 @@ import sys
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from services.converter import ImageToPDFConverter
+from services.image_handle import ImageHandle
+from services.pdf_writer import PageImage
 
 
 @pytest.fixture
@@ -44,6 +46,16 @@ def sample_rgba_image():
     return img_bytes.getvalue()
 
 
+@pytest.fixture
+def sample_jpeg_image():
+    """Create a sample baseline JPEG image."""
+    img = Image.new("RGB", (300, 400), color="green")
+    img_bytes = io.BytesIO()
+    img.save(img_bytes, format="JPEG", quality=90)
+    img_bytes.seek(0)
+    return img_bytes.getvalue()
+
+
 class TestImageValidation:
     def test_valid_image(self, converter, sample_image):
         """Test validation of valid image."""
@@ -91,6 +103,230 @@ class TestPreprocessing:
         assert img.width <= 100 or img.height <= 100
 
 
+class TestModeNormalization:
+    def test_native_modes_not_converted(self, converter):
+        """Test that PDF-native modes are passed through without a copy."""
+        for mode in ("1", "L", "RGB", "CMYK", "P"):
+            img = Image.new(mode, (10, 10))
+            assert converter._normalize_mode(img) is img
+
+    def test_gray_alpha_flattened_to_gray(self, converter):
+        """Test that LA images are flattened onto white and stay gray."""
+        img = Image.new("LA", (10, 10), (0, 0))
+        flat = converter._normalize_mode(img)
+        assert flat.mode == "L"
+        assert flat.getpixel((0, 0)) == 255
+
+    def test_palette_transparency_flattened_to_white(self, converter):
+        """Test that transparent palette entries become white, not black."""
+        img = Image.new("P", (10, 10), 0)
+        img.putpalette([0, 0, 0, 255, 0, 0])
+        img.info["transparency"] = 0
+        flat = converter._normalize_mode(img)
+        assert flat.mode == "P"
+        assert flat.convert("RGB").getpixel((0, 0)) == (255, 255, 255)
+        assert "transparency" in img.info
+
+    def test_palette_alpha_blended_with_white(self, converter):
+        """Test that partially transparent palette entries are blended in the palette."""
+        img = Image.new("P", (10, 10), 1)
+        img.putpalette([0, 0, 0, 0, 0, 255])
+        img.info["transparency"] = bytes([255, 128])
+        flat = converter._normalize_mode(img)
+        assert flat.mode == "P"
+        assert flat.convert("RGB").getpixel((0, 0)) == (127, 127, 255)
+
+
+class TestPaletteImages:
+    @staticmethod
+    def _encode(img, format="PNG", **params):
+        img_bytes = io.BytesIO()
+        img.save(img_bytes, format=format, **params)
+        return img_bytes.getvalue()
+
+    @staticmethod
+    def _chart(size=(400, 300)):
+        """A chart-like RGB image with a handful of flat colors."""
+        from PIL import ImageDraw
+
+        img = Image.new("RGB", size, "white")
+        draw = ImageDraw.Draw(img)
+        for index, color in enumerate([(200, 30, 40), (30, 120, 200), (60, 170, 60)]):
+            draw.rectangle((40 + index * 110, 250 - index * 70, 120 + index * 110, 280), fill=color)
+        draw.line((20, 20, 20, 280), fill=(0, 0, 0), width=2)
+        return img
+
+    @staticmethod
+    def _decoded(pdf_bytes):
+        import pikepdf
+
+        with pikepdf.open(io.BytesIO(pdf_bytes)) as pdf:
+            image = pdf.pages[0].Resources.XObject["/Im0"]
+            return image.ColorSpace[0], int(image.BitsPerComponent), pikepdf.PdfImage(image).as_pil_image()
+
+    def test_palette_bmp_stays_indexed(self, converter):
+        """Test that 8-bit palette images are not expanded to RGB."""
+        img = self._chart().quantize(200)
+        pdf_bytes, _ = converter.convert_single(self._encode(img, "BMP"), "a.bmp")
+        colorspace, depth, decoded = self._decoded(pdf_bytes)
+        assert colorspace == "/Indexed"
+        assert decoded.convert("RGB").tobytes() == img.convert("RGB").tobytes()
+
+    def test_small_palette_packed(self, converter):
+        """Test that palettes of up to 16 colors are stored at 4 bits."""
+        img = self._chart().quantize(5)
+        page = converter.prepare_page(ImageHandle(self._encode(img, "BMP"), "a.bmp"))
+        assert page.depth == 4
+        assert len(page.palette) == 5 * 3
+
+        pdf_bytes, _ = converter.convert_single(self._encode(img, "BMP"), "a.bmp")
+        _, depth, decoded = self._decoded(pdf_bytes)
+        assert depth == 4
+        assert decoded.convert("RGB").tobytes() == img.convert("RGB").tobytes()
+
+    def test_transparent_palette_png_stays_indexed(self, converter):
+        """Test that palette transparency is flattened without leaving Indexed."""
+        img = self._chart().quantize(8)
+        page = converter.prepare_page(
+            ImageHandle(self._encode(img, transparency=0), "a.png")
+        )
+        assert page.color.name == "P"
+        assert not page.passthrough
+
+    def test_downscaled_palette_resampled_in_rgb(self, converter):
+        """Test that palette images are not downscaled with nearest neighbour."""
+        img = self._chart((converter.target_width * 2, 300)).quantize(8)
+        page = converter.prepare_page(ImageHandle(self._encode(img, "BMP"), "a.bmp"))
+        assert page.width == converter.target_width
+        assert page.color.name == "RGB"
+
+    def test_palette_reduction(self, converter):
+        """Test that RGB graphics become smaller, lossless palette pages."""
+        png = self._encode(self._chart())
+        handle = ImageHandle(png, "chart.png")
+        rgb = converter.prepare_page(handle, resize=False)
+        reduced = converter.prepare_page(ImageHandle(png, "chart.png"), resize=False, palette=True)
+        assert rgb.passthrough and not reduced.passthrough
+        assert reduced.color.name == "P"
+        assert reduced.depth == 4
+        assert len(reduced.data) < len(rgb.data)
+
+        pdf_bytes, _ = converter.convert_single(png, "chart.png", preset="compact")
+        colorspace, _, decoded = self._decoded(pdf_bytes)
+        assert colorspace == "/Indexed"
+        assert decoded.convert("RGB").tobytes() == self._chart().tobytes()
+
+    @pytest.mark.parametrize("step", [1, 2])
+    def test_close_colors_kept_apart(self, converter, step):
+        """Test that colors a level or two apart keep their own palette entries."""
+        img = Image.new("RGB", (240 // step, 40))
+        img.putdata([(x * step, 40, 200) for _ in range(40) for x in range(240 // step)])
+        # Neighbouring shades of a few UI colors, differing in every channel
+        for index, color in enumerate([(120, 120, 120), (121, 121, 122), (122, 123, 121)]):
+            img.paste(color, (index * 20, 0, index * 20 + 20, 10))
+
+        reduced = converter._reduce_palette(img)
+        assert reduced.mode == "P"
+        assert reduced.convert("RGB").tobytes() == img.tobytes()
+
+        png = self._encode(img)
+        pdf_bytes, _ = converter.convert_single(png, "gradient.png", preset="compact")
+        colorspace, _, decoded = self._decoded(pdf_bytes)
+        assert colorspace == "/Indexed"
+        assert decoded.convert("RGB").tobytes() == img.tobytes()
+
+    def test_photos_not_reduced(self, converter):
+        """Test that images with more than 256 colors stay RGB."""
+        img = Image.merge("RGB", [Image.effect_noise((300, 300), 64) for _ in range(3)])
+        page = converter.prepare_page(
+            ImageHandle(self._encode(img), "photo.png"), palette=True
+        )
+        assert page.color.name == "RGB"
+
+
+class TestGrayscaleDetection:
+    @staticmethod
+    def _jpeg(img):
+        img_bytes = io.BytesIO()
+        img.save(img_bytes, format="JPEG", quality=75)
+        return img_bytes.getvalue()
+
+    def test_gray_scan_emitted_as_gray(self, converter):
+        """Test that an RGB scan without chroma becomes a single-channel page."""
+        converter.jpeg_passthrough = False
+        scan = Image.effect_noise((600, 800), 40).convert("RGB")
+        page = converter.prepare_page(ImageHandle(self._jpeg(scan), "scan.jpg"), resize=False)
+        assert page.color.name == "L"
+
+    def test_colored_mark_keeps_rgb(self, converter):
+        """Test that a small colored mark keeps the page in RGB."""
+        scan = Image.effect_noise((600, 800), 40).convert("RGB")
+        scan.paste((200, 30, 30), (50, 50, 110, 110))
+        img = converter._preprocess(ImageHandle(self._jpeg(scan)), resize=False)
+        assert img.mode == "RGB"
+
+    def test_detection_disabled(self, converter):
+        """Test that detection can be turned off."""
+        converter.grayscale_detection = False
+        scan = Image.new("RGB", (100, 100), (90, 90, 90))
+        assert converter._preprocess(ImageHandle(self._jpeg(scan)), resize=False).mode == "RGB"
+
+
+class TestDocumentPreset:
+    @staticmethod
+    def _scan():
+        from PIL import ImageDraw
+
+        img = Image.new("RGB", (400, 300), (225, 220, 215))
+        draw = ImageDraw.Draw(img)
+        draw.rectangle((50, 50, 60, 250), fill=(30, 30, 30))
+        img_bytes = io.BytesIO()
+        img.save(img_bytes, format="JPEG", quality=90)
+        return img_bytes.getvalue()
+
+    def test_threshold_keeps_ink_and_whitens_paper(self, converter):
+        """Test that the adaptive threshold separates ink from paper."""
+        img = converter._threshold(Image.open(io.BytesIO(self._scan())))
+        assert img.mode == "1"
+        assert img.getpixel((55, 150)) == 0
+        assert img.getpixel((300, 150)) == 255
+
+    def test_document_pages_are_ccitt(self, converter):
+        """Test that the document preset stores CCITT Group 4 pages."""
+        import pikepdf
+
+        pdf_bytes, _ = converter.convert_single(self._scan(), "scan.jpg", preset="document")
+        with pikepdf.open(io.BytesIO(pdf_bytes)) as pdf:
+            image = pdf.pages[0].Resources.XObject["/Im0"]
+            assert list(image.Filter) == ["/CCITTFaxDecode"]
+            assert int(image.BitsPerComponent) == 1
+
+    def test_unknown_preset(self, converter, sample_image):
+        """Test that an unknown preset is rejected."""
+        with pytest.raises(ValueError, match="Unknown preset"):
+            converter.convert_single(sample_image, "a.png", preset="poster")
+
+
+class TestPageEncoding:
+    def test_pixels_flate_encoded_directly(self, converter, sample_png_image):
+        """Test that processed pages skip the PNG intermediate."""
+        import zlib
+
+        # Decode the PNG rather than copying its data
+        converter.native_passthrough = False
+        page = converter.prepare_page(sample_png_image, resize=False)
+        assert (page.width, page.height) == (300, 400)
+        raw = zlib.decompress(page.data)
+        assert raw == Image.open(io.BytesIO(sample_png_image)).convert("RGB").tobytes()
+
+    def test_compression_disabled(self, converter, sample_png_image):
+        """Test that compression=False stores the page stream uncompressed."""
+        converter.native_passthrough = False
+        compressed = converter.prepare_page(sample_png_image, resize=False)
+        stored = converter.prepare_page(sample_png_image, resize=False, compression=False)
+        assert len(stored.data) > len(compressed.data)
+
+
 class TestConversion:
     def test_single_image_conversion(self, converter, sample_image):
         """Test conversion of single image."""
@@ -129,6 +365,1120 @@ class TestConversion:
         assert pdf_bytes.startswith(b"%PDF")
 
 
+class TestReduceOnDecode:
+    def test_large_jpeg_decoded_at_reduced_scale(self, converter):
+        """Test that JPEG downscaling decodes at a DCT scale."""
+        img = Image.new("RGB", (4000, 3000), color="green")
+        img_bytes = io.BytesIO()
+        img.save(img_bytes, format="JPEG")
+        handle = ImageHandle(img_bytes.getvalue(), "big.jpg")
+
+        processed = converter.preprocess_image(
+            handle, resize=True, target_width=500, target_height=500
+        )
+        assert handle.decode().width < 4000
+        assert Image.open(io.BytesIO(processed)).size == (500, 375)
+
+    def test_png_downscale_exact_size(self, converter):
+        """Test that integer reduction still yields the fitted size."""
+        img = Image.new("RGB", (3000, 1000), color="blue")
+        img_bytes = io.BytesIO()
+        img.save(img_bytes, format="PNG")
+
+        processed = converter.preprocess_image(
+            img_bytes.getvalue(), resize=True, target_width=300, target_height=300
+        )
+        assert Image.open(io.BytesIO(processed)).size == (300, 100)
+
+
+class TestResampling:
+    @pytest.mark.parametrize("resampling", ["nearest", "bilinear", "box", "lanczos", "fast"])
+    def test_strategies_yield_fitted_size(self, converter, resampling):
+        """Test that every strategy and preset produces the fitted size."""
+        img = Image.new("RGB", (3000, 1000), color="blue")
+        img_bytes = io.BytesIO()
+        img.save(img_bytes, format="PNG")
+
+        processed = converter.preprocess_image(
+            img_bytes.getvalue(), True, 300, 300, resampling=resampling
+        )
+        assert Image.open(io.BytesIO(processed)).size == (300, 100)
+
+    def test_presets_resolve_to_strategies(self):
+        """Test that presets map to strategies and unknown names are rejected."""
+        from services.converter import resolve_resampling
+
+        assert resolve_resampling("fast") == "box"
+        assert resolve_resampling("Photo") == "lanczos"
+        with pytest.raises(ValueError, match="Unknown resampling"):
+            resolve_resampling("cubic")
+
+
+class TestParallelPages:
+    @pytest.fixture(params=["thread", "process"])
+    def parallel_converter(self, request):
+        converter = ImageToPDFConverter()
+        converter.page_workers = 2
+        converter.page_worker_mode = request.param
+        yield converter
+        converter.close()
+
+    @staticmethod
+    def _png(width, height):
+        img = Image.new("RGB", (width, height), color="blue")
+        img_bytes = io.BytesIO()
+        img.save(img_bytes, format="PNG")
+        return img_bytes.getvalue()
+
+    def test_page_order_preserved(self, parallel_converter):
+        """Test that pages come out in input order."""
+        import pikepdf
+
+        widths = [100, 120, 140, 160, 180]
+        images = [(self._png(w, 50), f"page{w}.png") for w in widths]
+        pdf_bytes, msg = parallel_converter.convert_multiple(images, resize=False)
+        assert msg == "Success"
+
+        with pikepdf.open(io.BytesIO(pdf_bytes)) as pdf:
+            page_widths = [int(page.Resources.XObject["/Im0"].Width) for page in pdf.pages]
+        assert page_widths == widths
+
+    def test_executor_created_once(self, converter, monkeypatch):
+        """Test that concurrent conversions share one page executor."""
+        import threading
+        import time
+        from concurrent.futures import ThreadPoolExecutor
+
+        import services.converter as converter_module
+
+        created = []
+
+        def slow_executor(*args, **kwargs):
+            time.sleep(0.01)
+            created.append(ThreadPoolExecutor(*args, **kwargs))
+            return created[-1]
+
+        monkeypatch.setattr(converter_module, "ThreadPoolExecutor", slow_executor)
+        converter.page_workers = 2
+        barrier = threading.Barrier(8)
+        executors = []
+
+        def get_executor():
+            barrier.wait()
+            executors.append(converter._get_page_executor())
+
+        threads = [threading.Thread(target=get_executor) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        converter.close()
+        assert len(created) == 1
+        assert all(executor is created[0] for executor in executors)
+
+    def test_invalid_page_fails(self, parallel_converter):
+        """Test that an invalid page aborts the conversion with its name."""
+        images = [(self._png(100, 100), "ok.png"), (b"not an image", "bad.png")]
+        with pytest.raises(ValueError, match="bad.png"):
+            parallel_converter.convert_multiple(images)
+
+
+class TestPageCache:
+    @pytest.fixture
+    def cached_converter(self):
+        from services.cache import PageCache
+
+        converter = ImageToPDFConverter()
+        converter.page_cache = PageCache(10 * 1024 * 1024)
+        # Only decoded pages are cached
+        converter.native_passthrough = False
+        return converter
+
+    def test_repeated_page_is_reused(self, cached_converter, sample_image, monkeypatch):
+        """Test that a page seen before is not preprocessed again."""
+        cached_converter.convert_single(sample_image, "a.png")
+
+        calls = []
+        original = cached_converter._preprocess
+        monkeypatch.setattr(
+            cached_converter, "_preprocess", lambda *args: calls.append(args) or original(*args)
+        )
+        pdf_bytes, _ = cached_converter.convert_multiple(
+            [(sample_image, "b.png"), (sample_image, "c.png")]
+        )
+        assert pdf_bytes.startswith(b"%PDF")
+        assert calls == []
+
+        stats = cached_converter.page_cache.stats()
+        assert stats["misses"] == 1
+        assert stats["hits"] == 2
+        assert stats["entries"] == 1
+
+    def test_options_are_part_of_key(self, cached_converter, sample_png_image):
+        """Test that different preprocessing options miss the cache."""
+        cached_converter.convert_single(sample_png_image, "a.png", resize=True)
+        cached_converter.convert_single(sample_png_image, "a.png", compression=False)
+        assert cached_converter.page_cache.stats()["hits"] == 0
+
+    def test_passthrough_pages_not_cached(self, cached_converter, sample_jpeg_image):
+        """Test that JPEGs embedded as-is are not cached."""
+        cached_converter.convert_single(sample_jpeg_image, "a.jpg")
+        assert cached_converter.page_cache.stats()["entries"] == 0
+
+    def test_invalid_page_still_fails(self, cached_converter, sample_image):
+        """Test that a cached image with an unsupported name is still rejected."""
+        cached_converter.convert_single(sample_image, "a.png")
+        with pytest.raises(ValueError, match="a.xyz"):
+            cached_converter.convert_multiple([(sample_image, "a.xyz")])
+
+
+class TestMultiFrame:
+    @staticmethod
+    def _tiff(levels):
+        frames = [Image.new("L", (300, 400), level) for level in levels]
+        img_bytes = io.BytesIO()
+        frames[0].save(
+            img_bytes, format="TIFF", save_all=True, append_images=frames[1:],
+            compression="tiff_deflate",
+        )
+        return img_bytes.getvalue()
+
+    @pytest.mark.parametrize("page_workers, mode", [(1, "thread"), (2, "thread"), (2, "process")])
+    def test_one_page_per_frame(self, converter, page_workers, mode):
+        """Test that every TIFF frame becomes a page, in order."""
+        import pikepdf
+
+        converter.page_workers = page_workers
+        converter.page_worker_mode = mode
+        levels = [0, 60, 120, 180]
+        handle = ImageHandle(self._tiff(levels), "fax.tif")
+        pdf_bytes, _ = converter.convert_single(handle)
+        converter.close()
+        assert handle._spill_path is None
+
+        with pikepdf.open(io.BytesIO(pdf_bytes)) as pdf:
+            pages = [
+                pikepdf.PdfImage(page.Resources.XObject["/Im0"]).as_pil_image()
+                for page in pdf.pages
+            ]
+        assert [page.getpixel((0, 0)) for page in pages] == levels
+
+    def test_frames_seeked_one_at_a_time(self):
+        """Test that shared frame handles reuse one parsed image."""
+        handle = ImageHandle(self._tiff([0, 255]), "fax.tif")
+        frames = handle.frames(shared=True)
+        first = next(frames)
+        assert first.decode().getpixel((0, 0)) == 0
+        second = next(frames)
+        assert second.decode() is first.decode()
+        assert second.decode().getpixel((0, 0)) == 255
+
+    def test_spilled_frames_pickle_without_bytes(self):
+        """Test that frames for worker processes open one copy on disk."""
+        import os
+        import pickle
+
+        data = self._tiff([0, 60, 120, 180])
+        handle = ImageHandle(data, "fax.tif")
+        pickled = [pickle.dumps(frame) for frame in handle.frames(spill=True)]
+        assert all(len(frame) < len(data) // 4 for frame in pickled)
+
+        frames = [pickle.loads(frame) for frame in pickled]
+        assert [frame.decode().getpixel((0, 0)) for frame in frames] == [0, 60, 120, 180]
+        path = handle._spill_path
+        assert os.path.exists(path)
+        for frame in frames:
+            frame._file.close()
+        handle.discard_spill()
+        assert not os.path.exists(path)
+
+    def test_single_frame_yields_handle(self, sample_image):
+        """Test that single-frame images are not split."""
+        handle = ImageHandle(sample_image, "a.png")
+        assert list(handle.frames()) == [handle]
+
+    def test_mpo_is_one_page(self, converter):
+        """Test that a JPEG carrying a second MPO image stays one page."""
+        img = Image.new("RGB", (800, 600), "white")
+        img_bytes = io.BytesIO()
+        img.save(img_bytes, format="MPO", save_all=True, append_images=[Image.new("RGB", (160, 120))])
+        handle = ImageHandle(img_bytes.getvalue(), "photo.jpg")
+        assert handle.format == "MPO"
+        assert list(handle.frames()) == [handle]
+
+        report = []
+        converter.convert_single(img_bytes.getvalue(), "photo.jpg", report=report)
+        assert len(report) == 1
+
+    def test_corrupt_frame_reports_index(self, converter):
+        """Test that a broken frame names its index."""
+        data = self._tiff([0, 60, 120, 180])
+        with pytest.raises(ValueError, match=r"fax.tif \(frame \d\)"):
+            converter.convert_single(data[: len(data) * 4 // 5], "fax.tif")
+
+
+class TestImageOps:
+    def test_ops_fused_into_one_decode(self, converter):
+        """Test that recorded rotate and crop ops match the eager transforms."""
+        img = Image.new("RGB", (300, 200), "white")
+        img.paste((255, 0, 0), (0, 0, 30, 30))
+        img_bytes = io.BytesIO()
+        img.save(img_bytes, format="PNG")
+        data = img_bytes.getvalue()
+
+        handle = ImageHandle(data, "a.png")
+        handle.ops = [("rotate", 90), ("crop", 10, 0, 0, 20)]
+        assert converter.output_size(handle) == (190, 280)
+
+        fused = Image.open(io.BytesIO(converter.preprocess_image(handle, resize=False)))
+        eager = converter.crop_image(converter.rotate_image(data, 90), left=10, bottom=20)
+        eager = Image.open(io.BytesIO(eager))
+        assert fused.size == eager.size == (190, 280)
+        assert fused.getpixel((0, 279)) == eager.getpixel((0, 279)) == (255, 0, 0)
+
+    def test_ops_scaled_with_draft(self, converter):
+        """Test that crop margins follow a reduced JPEG decode."""
+        img = Image.new("RGB", (4000, 3000), "white")
+        img_bytes = io.BytesIO()
+        img.save(img_bytes, format="JPEG")
+
+        handle = ImageHandle(img_bytes.getvalue(), "a.jpg")
+        handle.ops = [("crop", 0, 1000, 0, 1000), ("rotate", 270)]
+        assert converter.output_size(handle) == (1000, 4000)
+        # Pixels stay in source orientation; the page turns them
+        result = converter._preprocess(handle, True, 500, 2000)
+        assert result.size == (2000, 500)
+
+    def test_pixel_crop_disables_passthrough(self, converter, sample_jpeg_image):
+        """Test that only crops that remove pixels re-encode a JPEG."""
+        handle = ImageHandle(sample_jpeg_image, "a.jpg")
+        handle.ops = [("rotate", 90), ("crop", 1, 0, 0, 0)]
+        assert converter.can_passthrough(handle)
+        assert not converter.can_passthrough(handle, crop_pixels=True)
+
+
+class TestCropBox:
+    @staticmethod
+    def _jpeg():
+        img = Image.new("RGB", (400, 300), "white")
+        img_bytes = io.BytesIO()
+        img.save(img_bytes, format="JPEG", dpi=(72, 72))
+        return img_bytes.getvalue()
+
+    @staticmethod
+    def _page(pdf_bytes):
+        import pikepdf
+
+        pdf = pikepdf.open(io.BytesIO(pdf_bytes))
+        return pdf, pdf.pages[0]
+
+    def test_crop_set_as_crop_box(self, converter):
+        """Test that a JPEG crop keeps the stream and sets the CropBox."""
+        handle = ImageHandle(self._jpeg(), "a.jpg")
+        handle.ops = [("crop", 10, 20, 30, 40)]
+        pdf_bytes, _ = converter.convert_multiple([handle])
+
+        pdf, page = self._page(pdf_bytes)
+        image = page.Resources.XObject["/Im0"]
+        assert image.Filter == "/DCTDecode"
+        assert (int(image.Width), int(image.Height)) == (400, 300)
+        crop_box = [float(value) for value in page.CropBox]
+        media_box = [float(value) for value in page.MediaBox]
+        # Sized from the pixels at 96 dpi, 0.75 points per pixel
+        assert crop_box == [0, 0, 270, 180]
+        # The whole image, placed so the crop box shows the kept part
+        assert media_box == [-7.5, -30, 292.5, 195]
+
+    def test_rotated_crop(self, converter):
+        """Test that crops after a rotation map back onto the stream."""
+        handle = ImageHandle(self._jpeg(), "a.jpg")
+        handle.ops = [("rotate", 90), ("crop", 0, 50, 0, 0)]
+        page = converter.prepare_page(handle)
+        # The top of the rotated view is the right side of the stream
+        assert page.crop == (0, 0, 350, 300)
+        assert page.rotation == 270
+        assert converter.output_size(handle) == (300, 350)
+
+    def test_crop_clipped_inside_page_margins(self):
+        """Test that cropped-away parts are clipped when the page has margins."""
+        from services.pdf_writer import PDFStreamWriter, PageImage
+
+        page = PageImage.from_jpeg(Image.open(io.BytesIO(self._jpeg())), self._jpeg())
+        page.crop = (10, 20, 370, 260)
+        output = io.BytesIO()
+        writer = PDFStreamWriter(output, layout_fun=lambda w, h, dpi: (w + 20, h + 20, w, h))
+        writer.add_page(page)
+        writer.close()
+
+        pdf, page = self._page(output.getvalue())
+        assert [float(value) for value in page.CropBox] == [0, 0, 380, 260]
+        assert b"10.0000 10.0000 360.0000 240.0000 re W n" in page.Contents.read_bytes()
+
+    def test_crop_pixels(self, converter):
+        """Test that crop_pixels re-encodes only the kept pixels."""
+        handle = ImageHandle(self._jpeg(), "a.jpg")
+        handle.ops = [("crop", 10, 20, 30, 40)]
+        pdf_bytes, _ = converter.convert_multiple([handle], crop_pixels=True)
+
+        pdf, page = self._page(pdf_bytes)
+        image = page.Resources.XObject["/Im0"]
+        assert (int(image.Width), int(image.Height)) == (360, 240)
+        assert "/CropBox" not in page.obj
+
+
+class TestPageRotation:
+    @staticmethod
+    def _photo(orientation=1):
+        """Landscape JPEG with a red top-left corner and an EXIF orientation."""
+        img = Image.new("RGB", (400, 300), "white")
+        img.paste((255, 0, 0), (0, 0, 40, 40))
+        exif = Image.Exif()
+        exif[0x0112] = orientation
+        img_bytes = io.BytesIO()
+        img.save(img_bytes, format="JPEG", exif=exif)
+        return img_bytes.getvalue()
+
+    @staticmethod
+    def _pages(pdf_bytes):
+        import pikepdf
+
+        with pikepdf.open(io.BytesIO(pdf_bytes)) as pdf:
+            return [
+                (
+                    int(page.obj.get("/Rotate", 0)),
+                    [float(value) for value in page.MediaBox],
+                    list(page.Resources.XObject["/Im0"].read_raw_bytes()[:2]),
+                )
+                for page in pdf.pages
+            ]
+
+    @pytest.mark.parametrize("orientation,rotation", [(3, 180), (6, 90), (8, 270)])
+    def test_exif_rotation_set_on_page(self, converter, orientation, rotation):
+        """Test that EXIF-rotated JPEGs are embedded as-is with /Rotate."""
+        data = self._photo(orientation)
+        pdf_bytes, _ = converter.convert_single(data, "photo.jpg")
+        ((page_rotation, media_box, stream_start),) = self._pages(pdf_bytes)
+        assert page_rotation == rotation
+        # MediaBox stays in stream orientation; the viewer turns the page
+        assert media_box[2] > media_box[3]
+        assert stream_start == [0xFF, 0xD8]
+
+    def test_rotate_ops_set_on_page(self, converter):
+        """Test that counter-clockwise rotate ops become a clockwise /Rotate."""
+        handle = ImageHandle(self._photo(), "photo.jpg")
+        handle.ops = [("rotate", 90), ("rotate", 180)]
+        page = converter.prepare_page(handle)
+        assert page.passthrough
+        assert page.rotation == 90
+        assert converter.output_size(handle) == (300, 400)
+
+    def test_mirrored_exif_transposes_pixels(self, converter):
+        """Test that mirrored orientations flip pixels and rotate the page."""
+        handle = ImageHandle(self._photo(5), "photo.jpg")
+        page = converter.prepare_page(handle)
+        assert not page.passthrough
+        assert page.rotation == 270
+        img = converter._preprocess(handle)
+        # Mirrored left to right: the red corner is now top right
+        assert img.getpixel((img.width - 5, 5))[1] < 64
+        # As displayed, it is the same as Pillow's exif_transpose
+        from PIL import ImageOps
+        expected = ImageOps.exif_transpose(Image.open(io.BytesIO(self._photo(5))))
+        assert converter.output_size(handle) == expected.size
+
+    def test_sideways_page_fits_turned_target(self, converter):
+        """Test that a rotated page is fitted to the target as displayed."""
+        img = Image.new("RGB", (4000, 3000), "white")
+        img_bytes = io.BytesIO()
+        img.save(img_bytes, format="PNG")
+        handle = ImageHandle(img_bytes.getvalue(), "a.png")
+        handle.ops = [("rotate", 90)]
+        page = converter.prepare_page(handle)
+        assert (page.width, page.height) == (2800, 2100)
+        assert page.rotation == 270
+
+    @pytest.mark.parametrize("orientation,rotation", [("portrait", 270), ("landscape", 0)])
+    def test_requested_orientation(self, converter, orientation, rotation):
+        """Test that pages are turned to the requested orientation."""
+        pdf_bytes, _ = converter.convert_single(
+            self._photo(), "photo.jpg", orientation=orientation
+        )
+        assert self._pages(pdf_bytes)[0][0] == rotation
+
+    def test_unknown_orientation(self, converter):
+        """Test that unknown orientations are rejected."""
+        with pytest.raises(ValueError, match="orientation"):
+            converter.convert_single(self._photo(), "photo.jpg", orientation="diagonal")
+
+
+class TestPageLayout:
+    @staticmethod
+    def _image(size, format="PNG"):
+        img = Image.new("RGB", size, "white")
+        img_bytes = io.BytesIO()
+        img.save(img_bytes, format=format)
+        return img_bytes.getvalue()
+
+    @staticmethod
+    def _page(pdf_bytes):
+        import pikepdf
+
+        pdf = pikepdf.open(io.BytesIO(pdf_bytes))
+        page = pdf.pages[0]
+        image = page.Resources.XObject["/Im0"]
+        media_box = [round(float(value), 2) for value in page.MediaBox]
+        return pdf, page, image, media_box
+
+    def test_parse_page_sizes(self):
+        """Test named and custom page sizes and lengths."""
+        from services.layout import parse_length, parse_page_size
+
+        assert [round(v, 2) for v in parse_page_size("A4")] == [595.28, 841.89]
+        assert parse_page_size("8.5x11in") == (612, 792)
+        assert parse_length("1in") == 72
+        assert round(parse_length("10"), 2) == 28.35
+        for bad in ("A9", "210x", "210x297furlong", "0x297mm"):
+            with pytest.raises(ValueError):
+                parse_page_size(bad)
+
+    def test_invalid_layout(self, converter):
+        """Test that unknown fit modes and oversized margins are rejected."""
+        with pytest.raises(ValueError):
+            converter.page_layout("a4", fit="stretch")
+        with pytest.raises(ValueError):
+            converter.page_layout("a5", margin="80mm")
+        assert converter.page_layout(None) is None
+
+    def test_fit_without_resampling(self, converter):
+        """Test that pages take the page size while the pixels are kept."""
+        layout = converter.page_layout("a4", margin="10mm")
+        pdf_bytes, _ = converter.convert_multiple(
+            [(self._image((3000, 2000)), "a.png")], layout=layout
+        )
+        pdf, page, image, media_box = self._page(pdf_bytes)
+        assert media_box == [0, 0, 595.28, 841.89]
+        assert (int(image.Width), int(image.Height)) == (3000, 2000)
+        # Fitted to the width inside the margins, centered
+        assert b"538.5827 0 0 359.0551 28.3465" in page.Contents.read_bytes()
+
+    def test_max_dpi_caps_pixels(self, converter):
+        """Test that pixels are only resampled above the DPI cap."""
+        layout = converter.page_layout("a4", max_dpi=100)
+        pdf_bytes, _ = converter.convert_multiple(
+            [(self._image((3000, 2000)), "a.png")], layout=layout
+        )
+        pdf, _, image, media_box = self._page(pdf_bytes)
+        assert media_box == [0, 0, 595.28, 841.89]
+        # 8.27in across at 100 DPI
+        assert (int(image.Width), int(image.Height)) == (827, 551)
+
+        small = converter.prepare_page(ImageHandle(self._image((600, 400)), "b.png"), layout=layout)
+        assert (small.width, small.height) == (600, 400)
+
+    def test_jpeg_passthrough_under_cap(self, converter):
+        """Test that JPEGs below the DPI cap keep their stream on any page size."""
+        layout = converter.page_layout("letter", max_dpi=300)
+        page = converter.prepare_page(ImageHandle(self._image((2000, 2500), "JPEG"), "a.jpg"), layout=layout)
+        assert page.passthrough
+        page = converter.prepare_page(ImageHandle(self._image((4000, 5000), "JPEG"), "a.jpg"), layout=layout)
+        assert not page.passthrough
+        assert (page.width, page.height) == (2550, 3188)
+
+    def test_sideways_page(self, converter):
+        """Test that turned pages are laid out and capped as displayed."""
+        layout = converter.page_layout("a4", max_dpi=100)
+        pdf_bytes, _ = converter.convert_multiple(
+            [(self._image((3000, 2000)), "a.png")], orientation="portrait", layout=layout
+        )
+        pdf, page, image, media_box = self._page(pdf_bytes)
+        assert int(page.Rotate) == 270
+        assert media_box == [0, 0, 841.89, 595.28]
+        assert (int(image.Width), int(image.Height)) == (1169, 780)
+
+    def test_layout_in_process_workers(self, tmp_path):
+        """Test that layouts survive the trip to worker processes."""
+        import pickle
+
+        converter = ImageToPDFConverter()
+        layout = converter.page_layout("a4")
+        layout(100, 100, (96, 96))
+        copy = pickle.loads(pickle.dumps(layout))
+        assert copy(100, 100, (96, 96)) == layout(100, 100, (96, 96))
+        assert repr(copy) == repr(layout)
+
+
+class TestPixelBudget:
+    def test_oversized_dimensions_rejected_before_decode(self, converter, monkeypatch):
+        """Test that images over MAX_IMAGE_DIMENSION fail from the header alone."""
+        from services.budget import PixelBudgetExceeded
+
+        img = Image.new("L", (3000, 10))
+        img_bytes = io.BytesIO()
+        img.save(img_bytes, format="PNG")
+        converter.MAX_IMAGE_SIZE = 2000
+        monkeypatch.setattr(ImageHandle, "decode", lambda *args, **kwargs: pytest.fail("decoded"))
+
+        with pytest.raises(PixelBudgetExceeded, match="3000x10"):
+            converter.convert_single(img_bytes.getvalue(), "wide.png")
+
+    @staticmethod
+    def _tiff(sizes):
+        frames = [Image.new("RGB", size, "white") for size in sizes]
+        img_bytes = io.BytesIO()
+        frames[0].save(
+            img_bytes, format="TIFF", compression="tiff_lzw", save_all=True, append_images=frames[1:]
+        )
+        return img_bytes.getvalue()
+
+    def test_frames_measured_at_their_own_size(self):
+        """Test that each frame handle reserves its own decoded size."""
+        handle = ImageHandle(self._tiff([(2000, 1500), (10, 10), (10, 10)]), "scan.tif")
+        assert [frame.pixel_bytes for frame in handle.frames()] == [2000 * 1500 * 3, 300, 300]
+
+    def test_every_frame_checked(self, converter):
+        """Test that later frames are checked against the limits by their own headers."""
+        from services.budget import PixelBudgetExceeded
+
+        converter.MAX_IMAGE_SIZE = 500
+        with pytest.raises(PixelBudgetExceeded, match=r"scan.tif \(frame 1\): .*600x10"):
+            converter.check_pixel_budget([ImageHandle(self._tiff([(10, 10), (600, 10)]), "scan.tif")])
+
+        # The request total adds up each frame, not the first frame times the count
+        converter.max_request_pixel_bytes = 400 * 300 * 3
+        converter.check_pixel_budget([ImageHandle(self._tiff([(10, 10)] * 3 + [(400, 290)]), "a.tif")])
+        with pytest.raises(PixelBudgetExceeded, match="per-request"):
+            converter.check_pixel_budget([ImageHandle(self._tiff([(400, 300), (10, 10)]), "b.tif")])
+
+    def test_request_budget(self, converter, sample_image, sample_png_image):
+        """Test that the pages of one request share a pixel budget."""
+        from services.budget import PixelBudgetExceeded
+
+        converter.max_request_pixel_bytes = 300 * 400 * 3
+        converter.convert_single(sample_png_image, "one.png")
+        with pytest.raises(PixelBudgetExceeded, match="per-request"):
+            converter.convert_multiple([(sample_png_image, "a.png"), (sample_image, "b.png")])
+
+    def test_in_flight_pixels_released(self, converter, sample_image):
+        """Test that reservations are returned after conversion."""
+        converter.convert_multiple([(sample_image, "a.png"), (sample_image, "b.png")])
+        assert converter.pixel_budget.in_flight == 0
+
+    @pytest.mark.parametrize(
+        "transform",
+        [
+            lambda c, data: c.rotate_image(data, 90),
+            lambda c, data: c.crop_image(data, 10, 10, 10, 10),
+            lambda c, data: c.preprocess_image(data),
+        ],
+    )
+    def test_transforms_reserve_pixels(self, converter, sample_image, monkeypatch, transform):
+        """Test that image transforms hold their decoded size in the budget while decoding."""
+        decode = ImageHandle.decode
+        in_flight = []
+
+        def tracking_decode(handle, *args, **kwargs):
+            in_flight.append(converter.pixel_budget.in_flight)
+            return decode(handle, *args, **kwargs)
+
+        monkeypatch.setattr(ImageHandle, "decode", tracking_decode)
+        transform(converter, sample_image)
+        assert in_flight == [ImageHandle(sample_image).pixel_bytes]
+        assert converter.pixel_budget.in_flight == 0
+
+    def test_acquire_waits_for_release(self):
+        """Test that a reservation waits until other pages release theirs."""
+        import threading
+        from services.budget import PixelBudget, PixelBudgetExceeded
+
+        budget = PixelBudget(100)
+        budget.acquire(80)
+        acquired = threading.Event()
+        waiter = threading.Thread(target=lambda: (budget.acquire(50), acquired.set()))
+        waiter.start()
+        assert not acquired.wait(0.05)
+        budget.release(80)
+        assert acquired.wait(1)
+        waiter.join()
+        assert budget.in_flight == 50
+
+        with pytest.raises(PixelBudgetExceeded):
+            budget.acquire(101)
+
+
+class TestStreamingAssembly:
+    def test_writer_output_is_valid(self, converter, sample_image, sample_jpeg_image):
+        """Test that the incremental writer produces a well-formed PDF."""
+        import pikepdf
+
+        images = [(sample_image, "a.png"), (sample_jpeg_image, "b.jpg")]
+        metadata = {"title": "Streamed", "author": "Test"}
+        pdf_bytes, _ = converter.convert_multiple(images, metadata=metadata)
+
+        with pikepdf.open(io.BytesIO(pdf_bytes)) as pdf:
+            assert len(pdf.pages) == 2
+            assert str(pdf.docinfo["/Title"]) == "Streamed"
+            assert pdf.check_pdf_syntax() == []
+            with pdf.open_metadata() as xmp:
+                assert xmp["dc:title"] == "Streamed"
+                assert xmp["dc:creator"] == ["Test"]
+
+    def test_convert_to_file(self, converter, sample_image, sample_png_image, tmp_path):
+        """Test streaming a batch straight to a PDF file."""
+        import pikepdf
+
+        images = [(sample_image, "a.png"), (sample_png_image, "b.png")] * 5
+        output_path = tmp_path / "streamed.pdf"
+        path, msg = converter.convert_multiple_to_file(images, output_path)
+        assert msg == "Success"
+        assert path == output_path
+        assert not (tmp_path / "streamed.pdf.part").exists()
+
+        with pikepdf.open(path) as pdf:
+            assert len(pdf.pages) == 10
+
+    def test_encrypted_in_one_pass(self, converter, sample_image, tmp_path, monkeypatch):
+        """Test that encryption is applied by a single finalization pass."""
+        import pikepdf
+
+        calls = []
+        finalize_pdf = converter.finalize_pdf
+        monkeypatch.setattr(
+            converter, "finalize_pdf", lambda *args: calls.append(args) or finalize_pdf(*args)
+        )
+
+        metadata = {"title": "Secret"}
+        pdf_bytes, _ = converter.convert_multiple([(sample_image, "a.png")], metadata=metadata)
+        assert calls == []
+
+        pdf_bytes, _ = converter.convert_multiple(
+            [(sample_image, "a.png")], metadata=metadata, password="pw"
+        )
+        output_path = tmp_path / "secret.pdf"
+        converter.convert_multiple_to_file(
+            [(sample_image, "a.png")], output_path, metadata=metadata, password="pw"
+        )
+        assert len(calls) == 2
+        assert not (tmp_path / "secret.pdf.part").exists()
+
+        for source in (io.BytesIO(pdf_bytes), output_path):
+            with pytest.raises(pikepdf.PasswordError):
+                pikepdf.open(source)
+            if isinstance(source, io.BytesIO):
+                source.seek(0)
+            with pikepdf.open(source, password="pw") as pdf:
+                assert pdf.is_encrypted
+                assert str(pdf.docinfo["/Title"]) == "Secret"
+
+    def test_compact_preset_optimizes_output(self, converter, sample_image):
+        """Test that the compact preset packs objects into object streams."""
+        import pikepdf
+
+        images = [(sample_image, f"{index}.png") for index in range(20)]
+        default, _ = converter.convert_multiple(images)
+        compact, _ = converter.convert_multiple(images, preset="compact")
+        assert b"/ObjStm" not in default
+        assert b"/ObjStm" in compact
+        assert len(compact) < len(default)
+
+        encrypted, _ = converter.convert_multiple(images, preset="compact", password="pw")
+        with pikepdf.open(io.BytesIO(encrypted), password="pw") as pdf:
+            assert len(pdf.pages) == 20
+
+    def test_linearized_on_request_or_above_threshold(self, converter, sample_image):
+        """Test that PDFs are linearized when asked or when large."""
+        import pikepdf
+
+        images = [(sample_image, "a.png")] * 3
+
+        def linearized(pdf_bytes):
+            with pikepdf.open(io.BytesIO(pdf_bytes), password="pw") as pdf:
+                return pdf.is_linearized
+
+        assert not linearized(converter.convert_multiple(images)[0])
+        assert linearized(converter.convert_multiple(images, linearize=True)[0])
+        assert linearized(
+            converter.convert_multiple(images, preset="compact", password="pw", linearize=True)[0]
+        )
+        converter.linearize_threshold = 1
+        assert linearized(converter.convert_multiple(images)[0])
+
+    def test_unknown_decode_level(self):
+        """Test that decode levels that would decode images are rejected."""
+        from config import settings
+
+        class Config(settings.__class__):
+            PDF_OPTIMIZE_DECODE_LEVEL = "all"
+
+        with pytest.raises(ValueError, match="decode level"):
+            ImageToPDFConverter(Config())
+
+    def test_failed_stream_leaves_no_file(self, converter, sample_image, tmp_path):
+        """Test that a failing page removes the partial output."""
+        images = [(sample_image, "a.png"), (b"not an image", "bad.png")]
+        output_path = tmp_path / "broken.pdf"
+        with pytest.raises(ValueError):
+            converter.convert_multiple_to_file(images, output_path)
+        assert list(tmp_path.iterdir()) == []
+
+
+class TestJpegPassthrough:
+    def test_baseline_jpeg_is_passed_through(self, converter, sample_jpeg_image):
+        """Test that a small baseline JPEG is embedded unchanged."""
+        assert converter.can_passthrough(sample_jpeg_image)
+        assert converter.prepare_page(sample_jpeg_image).data == sample_jpeg_image
+
+        pdf_bytes, _ = converter.convert_single(sample_jpeg_image, "test.jpg")
+        assert b"/DCTDecode" in pdf_bytes
+        assert sample_jpeg_image in pdf_bytes
+
+    def test_mpo_first_image_is_passed_through(self, converter):
+        """Test that phone-camera MPO JPEGs embed their first image unchanged."""
+        img = Image.new("RGB", (800, 600), "green")
+        img_bytes = io.BytesIO()
+        img.save(img_bytes, format="MPO", save_all=True, append_images=[Image.new("RGB", (160, 120))])
+        mpo = img_bytes.getvalue()
+
+        page = converter.prepare_page(ImageHandle(mpo, "photo.jpg"))
+        assert page.passthrough
+        assert mpo.startswith(page.data) and len(page.data) < len(mpo)
+        assert page.data.endswith(b"\xff\xd9")
+        assert Image.open(io.BytesIO(page.data)).size == (800, 600)
+
+    def test_padded_jpeg_is_passed_through(self, converter, sample_jpeg_image):
+        """Test that padding after the end-of-image marker is tolerated."""
+        padded = sample_jpeg_image + b"\x00" * 16
+        assert converter.prepare_page(padded).passthrough
+
+    def test_truncated_jpeg_is_not_passed_through(self, converter):
+        """Test that a JPEG cut short is decoded, and rejected, not embedded broken."""
+        img = Image.effect_noise((400, 300), 40).convert("RGB")
+        img_bytes = io.BytesIO()
+        img.save(img_bytes, format="JPEG")
+        truncated = img_bytes.getvalue()[:-1000]
+
+        with pytest.raises(ValueError, match="truncated"):
+            converter.convert_single(truncated, "cut.jpg")
+
+    def test_truncated_mpo_is_not_passed_through(self, converter):
+        """Test that an MPO whose first image runs past the file is not embedded."""
+        img = Image.effect_noise((400, 300), 40).convert("RGB")
+        img_bytes = io.BytesIO()
+        img.save(img_bytes, format="MPO", save_all=True, append_images=[Image.new("RGB", (160, 120))])
+        mpo = img_bytes.getvalue()
+        size = Image.open(io.BytesIO(mpo)).mpinfo[0xB002][0]["Size"]
+
+        with pytest.raises(ValueError, match="exceeds"):
+            PageImage.from_jpeg(Image.open(io.BytesIO(mpo[:size - 1])), mpo[:size - 1])
+        with pytest.raises(ValueError):
+            converter.convert_single(mpo[:size - 1], "cut.jpg")
+
+    def test_page_size_independent_of_encoding(self, converter):
+        """Test that without a layout, passthrough and decoded pages share one DPI."""
+        import pikepdf
+
+        img = Image.new("RGB", (300, 400), "green")
+        img_bytes = io.BytesIO()
+        img.save(img_bytes, format="JPEG", dpi=(72, 72))
+        jpeg = img_bytes.getvalue()
+
+        boxes = []
+        for passthrough in (True, False):
+            converter.jpeg_passthrough = passthrough
+            pdf_bytes, _ = converter.convert_single(jpeg, "a.jpg")
+            with pikepdf.open(io.BytesIO(pdf_bytes)) as pdf:
+                boxes.append([float(v) for v in pdf.pages[0].MediaBox])
+        assert boxes[0] == boxes[1] == [0, 0, 300 * 72 / 96, 400 * 72 / 96]
+
+    def test_oversized_jpeg_is_preprocessed(self, converter):
+        """Test that a JPEG larger than the target box is resized."""
+        img = Image.new("RGB", (converter.target_width + 10, 100), color="green")
+        img_bytes = io.BytesIO()
+        img.save(img_bytes, format="JPEG")
+        jpeg = img_bytes.getvalue()
+
+        assert not converter.can_passthrough(jpeg, resize=True)
+        assert converter.can_passthrough(jpeg, resize=False)
+
+    def test_progressive_jpeg_is_preprocessed(self, converter):
+        """Test that progressive JPEGs are not passed through."""
+        img = Image.new("RGB", (100, 100), color="green")
+        img_bytes = io.BytesIO()
+        img.save(img_bytes, format="JPEG", progressive=True)
+        assert not converter.can_passthrough(img_bytes.getvalue())
+
+    def test_transparent_png_is_preprocessed(self, converter, sample_rgba_image):
+        """Test that PNGs with alpha are decoded and flattened."""
+        assert not converter.can_passthrough(sample_rgba_image)
+
+    def test_native_passthrough_disabled(self, converter, sample_image):
+        """Test that NATIVE_PASSTHROUGH off decodes PNGs again."""
+        converter.native_passthrough = False
+        assert not converter.can_passthrough(sample_image)
+
+
+class TestNativePassthrough:
+    @staticmethod
+    def _encode(img, format, **params):
+        img_bytes = io.BytesIO()
+        img.save(img_bytes, format=format, **params)
+        return img_bytes.getvalue()
+
+    @staticmethod
+    def _gradient(mode="RGB"):
+        img = Image.linear_gradient("L").resize((120, 80))
+        if mode == "RGB":
+            return Image.merge("RGB", (img, img.transpose(Image.Transpose.FLIP_LEFT_RIGHT), img))
+        return img.convert(mode)
+
+    @staticmethod
+    def _decoded(pdf_bytes):
+        import pikepdf
+
+        with pikepdf.open(io.BytesIO(pdf_bytes)) as pdf:
+            image = pdf.pages[0].Resources.XObject["/Im0"]
+            return image.Filter, pikepdf.PdfImage(image).as_pil_image()
+
+    @pytest.mark.parametrize("mode", ["RGB", "L", "P", "1"])
+    def test_png_data_copied(self, converter, mode):
+        """Test that PNG IDAT data is embedded unchanged and decodes to the same pixels."""
+        img = self._gradient("RGB").convert(mode) if mode == "P" else self._gradient(mode)
+        png = self._encode(img, "PNG")
+        page = converter.prepare_page(ImageHandle(png, "a.png"))
+        assert page.passthrough
+        assert page.data in png
+
+        pdf_bytes, _ = converter.convert_single(png, "a.png")
+        filter, decoded = self._decoded(pdf_bytes)
+        assert filter == "/FlateDecode"
+        assert decoded.convert("RGB").tobytes() == img.convert("RGB").tobytes()
+
+    def test_unsupported_pngs_decoded(self, converter):
+        """Test that interlaced, transparent and 16-bit PNGs are decoded."""
+        import zlib
+
+        img = self._gradient()
+        png = self._encode(img, "PNG")
+        # Pillow cannot write Adam7, so set the IHDR interlace method
+        ihdr = png[12:28] + b"\x01"
+        interlaced = png[:12] + ihdr + zlib.crc32(ihdr).to_bytes(4, "big") + png[33:]
+        for png in (
+            interlaced,
+            self._encode(img.convert("P"), "PNG", transparency=0),
+            self._encode(img.convert("I;16"), "PNG"),
+        ):
+            assert not converter.can_passthrough(png)
+
+    def test_fax_tiff_strip_copied(self, converter):
+        """Test that a Group 4 TIFF strip is embedded without decoding."""
+        img = self._gradient("1")
+        tiff = self._encode(img, "TIFF", compression="group4")
+        handle = ImageHandle(tiff, "fax.tif")
+        page = converter.prepare_page(handle, bilevel=True)
+        assert page.passthrough
+        assert page.data in tiff
+
+        pdf_bytes, _ = converter.convert_single(tiff, "fax.tif")
+        filter, decoded = self._decoded(pdf_bytes)
+        assert list(filter) == ["/CCITTFaxDecode"]
+        assert decoded.convert("L").tobytes() == img.convert("L").tobytes()
+
+    @pytest.mark.parametrize("mode", ["L", "RGB"])
+    def test_jpeg_in_tiff(self, converter, mode):
+        """Test that a JPEG-compressed TIFF strip becomes a complete DCT stream."""
+        img = self._gradient(mode)
+        tiff = self._encode(img, "TIFF", compression="jpeg", tiffinfo={278: img.height})
+        page = converter.prepare_page(ImageHandle(tiff, "scan.tif"))
+        assert page.passthrough
+        assert page.data.startswith(b"\xff\xd8") and page.data.endswith(b"\xff\xd9")
+        # The merged stream is a JPEG of the same image
+        assert Image.open(io.BytesIO(page.data)).size == img.size
+
+        pdf_bytes, _ = converter.convert_single(tiff, "scan.tif")
+        assert b"/DCTDecode" in pdf_bytes
+        if mode == "RGB":
+            # Pillow writes RGB photometric strips, without the YCbCr transform
+            assert b"/ColorTransform 0" in pdf_bytes
+
+    def test_multi_strip_tiff_decoded(self, converter):
+        """Test that TIFFs with several strips are decoded."""
+        img = self._gradient().resize((600, 400))
+        tiff = self._encode(img, "TIFF", compression="jpeg", tiffinfo={278: 128})
+        assert not converter.can_passthrough(tiff)
+        page = converter.prepare_page(ImageHandle(tiff, "scan.tif"))
+        assert not page.passthrough
+
+    def test_page_report(self, converter, sample_jpeg_image, sample_rgba_image):
+        """Test that each page reports the path it took."""
+        png = self._encode(self._gradient(), "PNG")
+        report = []
+        converter.convert_multiple(
+            [(sample_jpeg_image, "a.jpg"), (png, "b.png"), (sample_rgba_image, "c.png")],
+            report=report,
+        )
+        assert report == [
+            {"page": 1, "path": "passthrough", "filter": "DCTDecode"},
+            {"page": 2, "path": "passthrough", "filter": "FlateDecode"},
+            {"page": 3, "path": "reencode", "filter": "FlateDecode"},
+        ]
+
+
+class TestColorManagement:
+    @staticmethod
+    def _encode(img, format, **params):
+        img_bytes = io.BytesIO()
+        img.save(img_bytes, format=format, **params)
+        return img_bytes.getvalue()
+
+    @staticmethod
+    def _srgb_profile():
+        from PIL import ImageCms
+
+        return ImageCms.ImageCmsProfile(ImageCms.createProfile("sRGB")).tobytes()
+
+    @staticmethod
+    def _cmyk():
+        gradient = Image.linear_gradient("L").resize((120, 80))
+        return Image.merge("CMYK", [gradient.rotate(angle) for angle in (0, 90, 180, 270)])
+
+    @staticmethod
+    def _image(pdf_bytes):
+        import pikepdf
+
+        pdf = pikepdf.open(io.BytesIO(pdf_bytes))
+        return pdf, pdf.pages[0].Resources.XObject["/Im0"]
+
+    def test_cmyk_jpeg_passed_through(self, converter):
+        """Test that Adobe CMYK JPEGs are embedded as-is with an inverting /Decode."""
+        jpeg = self._encode(self._cmyk(), "JPEG")
+        page = converter.prepare_page(ImageHandle(jpeg, "print.jpg"))
+        assert page.passthrough
+        assert page.data == jpeg
+
+        pdf_bytes, _ = converter.convert_single(jpeg, "print.jpg")
+        _pdf, image = self._image(pdf_bytes)
+        assert image.ColorSpace == "/DeviceCMYK"
+        assert list(image.Decode) == [1, 0] * 4
+
+    def test_cmyk_stays_cmyk_when_decoded(self, converter):
+        """Test that decoded CMYK pages are stored as DeviceCMYK, not converted."""
+        img = self._cmyk()
+        tiff = self._encode(img, "TIFF", compression="tiff_lzw")
+        page = converter.prepare_page(ImageHandle(tiff, "print.tif"))
+        assert not page.passthrough
+        assert page.color.name == "CMYK"
+
+        pdf_bytes, _ = converter.convert_single(tiff, "print.tif")
+        _pdf, image = self._image(pdf_bytes)
+        assert image.ColorSpace == "/DeviceCMYK"
+        assert image.read_bytes() == img.tobytes()
+
+    def test_icc_profile_kept_when_reencoded(self, converter):
+        """Test that decoded pages keep their ICC profile as ICCBased."""
+        icc = self._srgb_profile()
+        png = self._encode(Image.new("RGBA", (40, 30), (200, 30, 40, 128)), "PNG", icc_profile=icc)
+        page = converter.prepare_page(ImageHandle(png, "a.png"))
+        assert not page.passthrough
+        assert page.iccp == icc
+
+        pdf_bytes, _ = converter.convert_single(png, "a.png")
+        _pdf, image = self._image(pdf_bytes)
+        assert image.ColorSpace[0] == "/ICCBased"
+        assert image.ColorSpace[1].read_bytes() == icc
+
+    def test_palette_profile_is_indexed_base(self, converter):
+        """Test that a palette image's RGB profile becomes the Indexed base."""
+        img = Image.new("RGB", (40, 30), (200, 30, 40)).quantize(4)
+        png = self._encode(img, "PNG", icc_profile=self._srgb_profile())
+        pdf_bytes, _ = converter.convert_single(png, "a.png")
+        _pdf, image = self._image(pdf_bytes)
+        assert image.ColorSpace[0] == "/Indexed"
+        assert image.ColorSpace[1][0] == "/ICCBased"
+
+    def test_mismatched_profile_dropped(self, converter):
+        """Test that an RGB profile is dropped once the page is stored as gray."""
+        png = self._encode(
+            Image.new("RGBA", (40, 30), (90, 90, 90, 128)), "PNG", icc_profile=self._srgb_profile()
+        )
+        page = converter.prepare_page(ImageHandle(png, "a.png"))
+        assert page.color.name == "L"
+        assert page.iccp is None
+
+    def test_srgb_output(self, converter, monkeypatch):
+        """Test that COLOR_OUTPUT=srgb converts pages, building one transform per profile."""
+        from services import color
+
+        transforms = color.TransformCache(4)
+        monkeypatch.setattr(color, "transforms", transforms)
+        converter.color_output = "srgb"
+
+        jpeg = self._encode(self._cmyk(), "JPEG")
+        assert not converter.can_passthrough(jpeg)
+        assert converter.prepare_page(ImageHandle(jpeg, "print.jpg")).color.name == "RGB"
+
+        icc = self._srgb_profile()
+        tagged = [
+            (self._encode(Image.new("RGB", (40, 30), color), "JPEG", icc_profile=icc), f"{color}.jpg")
+            for color in ("red", "green", "blue")
+        ]
+        converter.convert_multiple(tagged)
+        assert transforms.stats()["misses"] == 1
+        assert transforms.stats()["hits"] == 2
+        page = converter.prepare_page(ImageHandle(*tagged[0]))
+        assert not page.passthrough
+        assert page.iccp is None
+
+    def test_transform_cache_evicts(self):
+        """Test that the transform cache keeps at most max_entries transforms."""
+        from services.color import TransformCache
+
+        transforms = TransformCache(1)
+        icc = self._srgb_profile()
+        first = transforms.get(icc, "RGB")
+        transforms.get(icc, "RGB", "RGBA")
+        assert transforms.get(icc, "RGB") is not first
+        assert transforms.stats() == {"hits": 0, "misses": 3, "evictions": 2, "entries": 1}
+
+    def test_unknown_color_output(self):
+        """Test that unknown COLOR_OUTPUT values are rejected."""
+        from config import settings
+
+        class Config(settings.__class__):
+            COLOR_OUTPUT = "cmyk"
+
+        with pytest.raises(ValueError, match="color output"):
+            ImageToPDFConverter(Config())
+
+
+class TestImageHandle:
+    def test_validation_is_cached(self, converter, sample_image):
+        """Test that the validation result is stored on the handle."""
+        handle = ImageHandle(sample_image, "test.png")
+        assert converter.validate_image(handle) == (True, "Valid")
+        assert handle.validation == (True, "Valid")
+
+    def test_upload_parsed_once(self, converter, sample_image, monkeypatch):
+        """Test that validation and conversion share one parsed image."""
+        calls = []
+        original_open = Image.open
+
+        def counting_open(fp, *args, **kwargs):
+            if isinstance(fp, io.BytesIO) and fp.getvalue() == sample_image:
+                calls.append(fp)
+            return original_open(fp, *args, **kwargs)
+
+        monkeypatch.setattr(Image, "open", counting_open)
+        handle = ImageHandle(sample_image, "test.png")
+        converter.validate_image(handle)
+        converter.convert_multiple([handle])
+        assert len(calls) == 1
+
+    def test_corrupt_pixels_fail_on_decode(self, converter, sample_image):
+        """Test that truncated pixel data is reported during conversion."""
+        handle = ImageHandle(sample_image[:-40], "test.png")
+        with pytest.raises(Exception):
+            converter.convert_single(handle)
+
+
 class TestFileSaving:
     def test_save_pdf(self, converter, sample_image):
         """Test saving PDF to file."""